@@ -1,14 +1,30 @@
 #! /usr/bin/python3
 
+import os
 import sys
+import time
+import glob
+import hashlib
 import logging
+import itertools
+import mmap
+import concurrent.futures
 
 import numpy as np
 import matplotlib.pyplot as plt
 
-from lexer import Lexer
-from parser import Parser
+from lexer import Lexer, PipelinedLexer, ColumnarLexer
+from scanner import Scanner, ScannerMode
+from parser import Parser, ParseDiagnostic
+from tokeniser import Tokeniser, TokenClass
+from loop_filter import parse_loop_filter
+from loop_table import LoopTable
+from regex import LOOP_BOUNDARY_bre
 from ir import *
+import tracing
+from tracing import TraceLevel, get_tracer
+
+COMPILER_TRACE = get_tracer("compiler")
 
 class IccOptReportCompiler:
 
@@ -17,15 +33,51 @@ class IccOptReportCompiler:
     The main driver class, responsible for interaction between all compiler components.    
     """
     
-    def __init__(self, report_filename):
+    def __init__(self, report_filename, scanner_mode=ScannerMode.READLINE, pipelined=False, token_cache_size=0, columnar=False, remark_rules=None, token_stream_filename=None, recover=False, loop_filter=None):
+        self.init_compiler(report_filename, recover, loop_filter)
+        if pipelined == True:
+            # report reading, tokenising and parsing overlap in separate threads
+            self.lexer = PipelinedLexer(self.report_filename, scanner_mode, None, token_cache_size, remark_rules)
+        elif columnar == True or token_stream_filename != None:
+            # the whole report is tokenised block by block into token arrays before parsing
+            # (or the tokens are replayed out of a token stream file dumped for the report)
+            self.lexer = ColumnarLexer(self.report_filename, token_cache_size, None, remark_rules, token_stream_filename)
+        else:
+            self.lexer = Lexer(self.report_filename, scanner_mode, None, token_cache_size, remark_rules)
+        self.parser = Parser(self.lexer, recover, loop_filter)
+        # (recovery mode) problems found in the report, shared with the Parser
+        self.diagnostics = self.parser.get_diagnostics()
+
+    def init_compiler(self, report_filename, recover=False, loop_filter=None):
+        
+        # the state common to all the compilers; the compilers derived from this one call
+        # it instead of __init__() and build their own Lexers and Parsers (if any), when needed
         self.report_filename = report_filename
-        self.lexer = Lexer(self.report_filename)
-        self.parser = Parser(self.lexer)
+        self.recover = recover
+        self.loop_filter = loop_filter
+        self.lexer = None
+        self.parser = None
         self.ir = LoopNestingStructure()
+        self.diagnostics = []
 
     def get_ir(self):
         return self.ir
 
+    def get_loop_table(self):
+        return LoopTable(self.ir)
+
+    def get_loop_index(self):
+        return LoopIndex(self.ir)
+
+    def get_diagnostics(self):
+        return self.diagnostics
+
+    def report_error(self, message, expected, got):
+        
+        if self.recover == False:
+            sys.exit("error: compiler: " + message)
+        self.diagnostics.append(ParseDiagnostic(self.report_filename, None, None, expected, got, message))
+
     def print_compilation_report(self):
         
         src_loops = self.ir.get_loops()
@@ -46,36 +98,18 @@ class IccOptReportCompiler:
         print("loop fusions: " + str(len(fused_loops)))
         print("loop collapses: " + str(len(collapsed_loops)))
 
-        distr_loop_num = 0
-        parallel_loop_num = 0
-        vector_loop_num = 0
-        parallel_dep_num = 0
-        vector_dep_num = 0
-      
-        loop_depth_hist = {}
-
-        for loop_name, loop in src_loops.items():
-            
-            if loop.depth not in loop_depth_hist:
-                loop_depth_hist[loop.depth] = 1
-            else:
-                loop_depth_hist[loop.depth] += 1
-
-            if len(loop.distr_chunks) != 0:
-                distr_loop_num += 1
-            
-            if loop.classification.parallel == Classification.YES:
-                parallel_loop_num += 1
- 
-            if loop.classification.vector == Classification.YES:
-                vector_loop_num += 1
+        # [ script performance optimization ]
+        # statistics are computed over a columnar view of the loops (NumPy expressions
+        # instead of a pass over the Loop objects per statistic)
+        loop_table = self.get_loop_table()
+        distr_loop_num = int(np.count_nonzero(loop_table.distr_chunk_num))
+        parallel_loop_num = loop_table.count("parallel")
+        vector_loop_num = loop_table.count("vector")
+        parallel_dep_num = loop_table.count("parallel_dependence")
+        vector_dep_num = loop_table.count("vector_dependence")
 
-            if loop.classification.parallel_dependence == Classification.YES:
-                parallel_dep_num += 1
+        loop_depths, loop_depth_nums = loop_table.get_depth_histogram()
 
-            if loop.classification.vector_dependence == Classification.YES:
-                vector_dep_num += 1
-      
         print("loop distributions: " + str(distr_loop_num))
         print("\n", end="")
 
@@ -91,13 +125,13 @@ class IccOptReportCompiler:
         print("===== ================== =====")
 
         width = 0.5
-        plt.bar(loop_depth_hist.keys(), loop_depth_hist.values(), width, color='g')
+        plt.bar(loop_depths, loop_depth_nums, width, color='g')
         plt.show()
 
         num = 1
-        for loop_name, loop in src_loops.items():
+        for loop in src_loops.values():
             
-            print("loop [" + str(num) + "]: (depth: " + str(loop.depth) + ") " + loop_name)
+            print("loop [" + str(num) + "]: (depth: " + str(loop.depth) + ") " + loop.name)
             print("{")
             loop_class = loop.classification
             loop_class.print("\t") 
@@ -105,8 +139,8 @@ class IccOptReportCompiler:
 
             print("\tinner loops:")
             inner_num = 1
-            for inner_loop_name, inner_loop in loop.inner_loops.items():
-                print("\t\t [" + str(inner_num) + "]: " + "(depth: " + str(loop.depth+1) + ") " + inner_loop_name)
+            for inner_loop in loop.inner_loops.values():
+                print("\t\t [" + str(inner_num) + "]: " + "(depth: " + str(loop.depth+1) + ") " + inner_loop.name)
                 inner_num += 1
             print("\n", end="")
  
@@ -118,42 +152,654 @@ class IccOptReportCompiler:
             print("\n", end="")
             num += 1
 
-    def compile(self):
+    def parse(self):
         
         # create in-memory loop nesting structure IR out of ICC opt report 
         if self.parser.parse_optimization_report(self.ir) == True:
             pass
         else:
             sys.exit("error: compiler: could not compile the input file")
+
+    def compile(self):
+        
+        self.parse()
+        self.post_process()
+
+    def compile_stream(self):
+        
+        """
+        Compile the report incrementally (e.g. read from a pipe while ICC is still
+        writing it), yielding every top-level Loop as soon as its report is complete.
+        Fusion/collapsing post-processing needs the whole IR and is run at the very end.
+        """
+
+        for loop in self.parser.parse_optimization_report_stream(self.ir):
+            yield loop
+
+        self.post_process()
+
+    def post_process(self, loop_keys=None):
         
+        # (loop_keys) only the fused/collapsed loops of the given keys are post-processed
         src_loops = self.ir.get_loops()
         fused_loops = self.ir.get_fused_loops()
         collapsed_loops = self.ir.get_collapsed_loops()
 
         # loop fusion post-processing
-        for fused_loop_name in fused_loops:
-            loop = fused_loops[fused_loop_name]
+        for fused_loop_key in fused_loops:
+            if loop_keys != None and fused_loop_key not in loop_keys:
+                continue
+            loop = fused_loops[fused_loop_key]
             if loop.classification.fused == Classification.YES:
                 # exclude itself
                 fused_with = loop.classification.fused_with[1:]
                 for fused_loop_line in fused_with:
-                    name = Loop.form_main_loop_name(loop.filename, fused_loop_line)
-                    fused_loop = src_loops[name]
+                    fused_loop = src_loops.get(Loop.form_loop_key(loop.filename, fused_loop_line), None)
+                    if fused_loop == None and self.loop_filter != None:
+                        # filtered out
+                        continue
+                    if fused_loop == None:
+                        name = Loop.form_main_loop_name(loop.filename, fused_loop_line)
+                        self.report_error("fused loop " + name + " has not been found", "loop " + name, "none")
+                        continue
                     fused_loop.classification.copy(loop.classification)
             else:
-                sys.exit("error: compiler: fused_loops list misformation")
+                self.report_error("fused_loops list misformation", "fused loop " + loop.name, loop.classification.fused.name)
 
         # loop collapsing post-processing
-        for collapsed_loop_name in collapsed_loops:
-            loop = collapsed_loops[collapsed_loop_name]
+        for collapsed_loop_key in collapsed_loops:
+            if loop_keys != None and collapsed_loop_key not in loop_keys:
+                continue
+            loop = collapsed_loops[collapsed_loop_key]
             if loop.classification.collapsed == Classification.YES:
                 # exclude itself
                 collapsed_with_line = loop.classification.collapsed_with
-                name = Loop.form_main_loop_name(loop.filename, collapsed_with_line)
-                collapsed_loop = src_loops[name]
+                collapsed_loop = src_loops.get(Loop.form_loop_key(loop.filename, collapsed_with_line), None)
+                if collapsed_loop == None and self.loop_filter != None:
+                    # filtered out
+                    continue
+                if collapsed_loop == None:
+                    name = Loop.form_main_loop_name(loop.filename, collapsed_with_line)
+                    self.report_error("collapsed loop " + name + " has not been found", "loop " + name, "none")
+                    continue
                 collapsed_loop.classification.copy(loop.classification)
             else:
-                sys.exit("error: compiler: fused_loops list misformation")
+                self.report_error("fused_loops list misformation", "collapsed loop " + loop.name, loop.classification.collapsed.name)
+
+def parse_report(report_filename, scanner_mode=ScannerMode.READLINE, recover=False):
+    
+    # worker process entry point of IccOptReportBatchCompiler;
+    # post-processing is left for the merged IR
+    if recover == False:
+        compiler = IccOptReportCompiler(report_filename, scanner_mode)
+        compiler.parse()
+        return compiler.get_ir(), []
+
+    # a report the Parser can not recover from (unreadable, not decodable) still
+    # must not bring the whole batch down -> its partial IR is merged, if any
+    compiler = None
+    try:
+        compiler = IccOptReportCompiler(report_filename, scanner_mode, recover=True)
+        compiler.parse()
+    except (SystemExit, UnicodeDecodeError) as error:
+        diagnostic = ParseDiagnostic(report_filename, None, None, "optimization report", "unrecoverable error", str(error))
+        if compiler == None:
+            return LoopNestingStructure(), [ diagnostic ]
+        compiler.get_diagnostics().append(diagnostic)
+    return compiler.get_ir(), compiler.get_diagnostics()
+
+class IccOptReportBatchCompiler(IccOptReportCompiler):
+
+    """ 
+    Intel C/C++ Compiler (ICC) optimization report batch compiler.
+    Compiles the per translation unit reports found in a directory (or matching a glob 
+    pattern) in a pool of worker processes and merges them into a single IR.
+    """
+
+    # report file extensions produced by ICC (possibly compressed afterwards)
+    REPORT_FILE_EXTS = (".optrpt", ".optrpt.gz", ".optrpt.xz", ".optrpt.bz2")
+
+    def __init__(self, report_path, scanner_mode=ScannerMode.READLINE, max_workers=None, recover=False):
+        self.init_compiler(report_path, recover)
+        self.scanner_mode = scanner_mode
+        self.max_workers = max_workers if max_workers != None else os.cpu_count()
+        self.report_filenames = IccOptReportBatchCompiler.find_report_files(report_path)
+
+        if len(self.report_filenames) == 0:
+            sys.exit("error: compiler: could not find any Intel C/C++ Compiler optimization report files at " + str(report_path))
+
+    def find_report_files(report_path):
+        
+        report_filenames = []
+        if os.path.isdir(report_path):
+            for dirpath, dirnames, filenames in os.walk(report_path):
+                for filename in filenames:
+                    if filename.endswith(IccOptReportBatchCompiler.REPORT_FILE_EXTS):
+                        report_filenames.append(os.path.join(dirpath, filename))
+        else:
+            report_filenames = [filename for filename in glob.glob(report_path, recursive=True) if os.path.isfile(filename)]
+        
+        # the order of merging must not depend on the filesystem
+        return sorted(report_filenames)
+
+    def parse_reports(self):
+
+        # parse reports in worker processes and merge per translation unit IRs 
+        # in the (deterministic) report file order, as they arrive
+        chunksize = max(1, len(self.report_filenames) // (self.max_workers * 4))
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            report_irs = executor.map(parse_report, self.report_filenames, itertools.repeat(self.scanner_mode), itertools.repeat(self.recover), chunksize=chunksize)
+            for report_ir, report_diagnostics in report_irs:
+                self.ir.merge(report_ir)
+                self.diagnostics.extend(report_diagnostics)
+                yield report_ir
+
+    def parse(self):
+
+        for report_ir in self.parse_reports():
+            pass
+
+    def compile_stream(self):
+        
+        """
+        Yield top-level Loop objects of every translation unit as soon as its report is merged.
+        Fusion/collapsing post-processing is run once on the merged IR at the very end.
+        """
+
+        for report_ir in self.parse_reports():
+            for loop_key, loop in report_ir.top_level_loops.items():
+                if self.ir.get_top_level_loop(loop_key) is loop:
+                    yield loop
+
+        self.post_process()
+
+def scan_loop_boundaries(report_map, tokeniser, start=0):
+    
+    """
+    Pre-scan a mapped raw report (from the start offset on) for the lines opening or 
+    closing loop reports, yielding the (start, end) byte offsets and the token of every such line
+    """
+
+    size = len(report_map)
+    line_end = start
+    for match in LOOP_BOUNDARY_bre.finditer(report_map, start):
+        if match.start() < line_end:
+            # the rest of an already classified line
+            continue
+        line_start = report_map.rfind(b"\n", 0, match.start()) + 1
+        line_end = report_map.find(b"\n", match.end())
+        line_end = line_end + 1 if line_end != -1 else size
+        
+        # classify the line exactly the way the Lexer does (remarks may mention loops too)
+        lexeme = str(report_map[line_start:line_end], "utf-8").replace("\r\n", "\n")
+        token = tokeniser.tokenise_lexeme(lexeme)
+        if token.token_class == TokenClass.LOOP_BEGIN or token.token_class == TokenClass.LOOP_END:
+            yield line_start, line_end, token
+
+def parse_report_range(report_filename, report_range):
+    
+    # worker process entry point of IccOptReportParallelCompiler
+    parser = Parser(Lexer(report_filename, ScannerMode.MMAP, report_range))
+    report_range_ir = LoopNestingStructure()
+    parser.parse_optimization_report(report_range_ir)
+    return report_range_ir
+
+class IccOptReportParallelCompiler(IccOptReportCompiler):
+
+    """ 
+    Intel C/C++ Compiler (ICC) optimization report parallel compiler.
+    Splits a single (large) report into byte ranges of whole top-level loop reports
+    and compiles them in a pool of worker processes, merging the results in order.
+    """
+
+    # the least size of a report byte range worth sending to a worker process
+    MIN_REPORT_RANGE_SIZE = 1024 * 1024
+
+    def __init__(self, report_filename, max_workers=None):
+        self.init_compiler(report_filename)
+        self.max_workers = max_workers if max_workers != None else os.cpu_count()
+
+    def split_report(self):
+        
+        """
+        Pre-scan the report for the top-level LOOP BEGIN/LOOP END nesting and cut it into 
+        balanced (start, end) byte ranges. Along with every range return the keys of all 
+        the loops its report refers to, so that a range reopening a loop of some earlier 
+        range can be told apart.
+        """
+
+        tokeniser = Tokeniser()
+        report_ranges = []
+        report_range_loop_keys = []
+
+        with open(self.report_filename, "rb") as report:
+            report_map = mmap.mmap(report.fileno(), 0, access=mmap.ACCESS_READ)
+            size = len(report_map)
+            min_range_size = max(self.MIN_REPORT_RANGE_SIZE, size // (self.max_workers * 4))
+
+            depth = 0
+            range_start = 0
+            loop_keys = set()
+            cut_pending = False
+            for line_start, line_end, token in scan_loop_boundaries(report_map, tokeniser):
+                if token.token_class == TokenClass.LOOP_BEGIN:
+                    loop_key = None
+                    if token.inlined == False:
+                        loop_key = Loop.form_loop_key(token.filename, token.line)
+                    # ICC usually reopens a loop (peels, remainders, etc.) right after its
+                    # report -> cut in front of the next top-level loop report of another loop
+                    if depth == 0 and cut_pending == True and loop_key not in loop_keys:
+                        report_ranges.append((range_start, line_start))
+                        report_range_loop_keys.append(loop_keys)
+                        range_start = line_start
+                        loop_keys = set()
+                        cut_pending = False
+                    if loop_key != None:
+                        loop_keys.add(loop_key)
+                    depth += 1
+                elif token.token_class == TokenClass.LOOP_END:
+                    depth -= 1
+                    if depth == 0 and line_end - range_start >= min_range_size:
+                        cut_pending = True
+
+            if range_start < size:
+                report_ranges.append((range_start, size))
+                report_range_loop_keys.append(loop_keys)
+
+            report_map.close()
+        
+        return report_ranges, report_range_loop_keys
+
+    def parse_report_ranges(self):
+
+        if Scanner.is_mappable(self.report_filename) == False:
+            # the report can not be split (standard input, pipes, compressed or empty reports)
+            # -> it is compiled by the sequential Parser
+            self.lexer = Lexer(self.report_filename, ScannerMode.MMAP)
+            self.parser = Parser(self.lexer)
+            self.diagnostics = self.parser.get_diagnostics()
+            for loop in self.parser.parse_optimization_report_stream(self.ir):
+                yield loop
+            return
+
+        report_ranges, report_range_loop_keys = self.split_report()
+
+        # merge the IRs of report ranges in the report order; a range referring to a loop 
+        # of any earlier range (ICC reopens loops) is reparsed against the merged IR,
+        # exactly as the sequential parser would have done
+        merged_loop_keys = set()
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            report_range_irs = executor.map(parse_report_range, itertools.repeat(self.report_filename), report_ranges)
+            for report_range, loop_keys, report_range_ir in zip(report_ranges, report_range_loop_keys, report_range_irs):
+                if merged_loop_keys.isdisjoint(loop_keys):
+                    self.ir.merge(report_range_ir)
+                    for loop in report_range_ir.top_level_loops.values():
+                        yield loop
+                else:
+                    if COMPILER_TRACE.info:
+                        COMPILER_TRACE.event(TraceLevel.INFO, "reparse_report_range", start=report_range[0], end=report_range[1])
+                    parser = Parser(Lexer(self.report_filename, ScannerMode.MMAP, report_range))
+                    for loop in parser.parse_optimization_report_stream(self.ir):
+                        yield loop
+                merged_loop_keys.update(loop_keys)
+
+    def parse(self):
+
+        for loop in self.parse_report_ranges():
+            pass
+
+    def compile_stream(self):
+        
+        for loop in self.parse_report_ranges():
+            yield loop
+
+        self.post_process()
+
+class LoopRegion:
+
+    """
+    A top-level loop report of the optimization report along with the lines preceding it,
+    as fingerprinted by the incremental compiler
+    """
+
+    __slots__ = ( "start", "end", "digest", "top_level", "closed", "loop_keys", "added", "group" )
+
+    def __init__(self, start=0):
+        self.start = start # byte range of the region
+        self.end = start
+        self.digest = None # content hash
+        self.top_level = False # the region yields a (not inlined) top-level loop
+        self.closed = False # the region ends with a top-level LOOP END (rather than the end of report)
+        self.loop_keys = set() # keys of the loops the region refers to
+        # keys of the entries the region added to the IR dictionaries (IR_DICTS order)
+        self.added = ( [], [], [], [] )
+        self.group = None # id of the group of regions compiled together
+
+class IccOptReportIncrementalCompiler(IccOptReportCompiler):
+
+    """ 
+    Intel C/C++ Compiler (ICC) optimization report incremental compiler.
+    Keeps the IR of the last compile along with the content hashes of the top-level loop
+    regions of its report; a repeated compile() re-parses only the regions whose hash 
+    changed (along with the regions sharing loops with them) and patches the IR in place.
+    """
+
+    # the IR dictionaries patched by the incremental compiler
+    IR_DICTS = ( "loops", "top_level_loops", "fused_loops", "collapsed_loops" )
+
+    def __init__(self, report_filename, remark_rules=None):
+        self.init_compiler(report_filename)
+        # remark rules (compiled once) shared by the lexers of all the regions
+        self.tokeniser = Tokeniser(None, False, 0, remark_rules)
+        self.remark_rules = self.tokeniser.remark_rules
+        self.reset()
+
+    def reset(self):
+        
+        # forget the last compile -> the next one compiles the whole report
+        for dict_name in self.IR_DICTS:
+            getattr(self.ir, dict_name).clear()
+        self.regions = None # regions of the last compiled report, in the report order
+        self.region_digests = {} # content hash -> region
+        # regions referring to the same loops (ICC reopens loops in later regions) or 
+        # to loops linked by fusion/collapsing can only be (re)compiled together
+        self.groups = {} # group id -> regions of the group, in the report order
+        self.group_links = {} # group id -> (fused/collapsed loop, linked loop keys...) lists
+        self.loop_groups = {} # loop key -> group id
+        self.next_group_id = 0
+
+        # statistics of the last compile
+        self.region_num = 0
+        self.reparsed_region_num = 0
+
+    def scan_region(self, report_map, start):
+        
+        # pre-scan a region starting at the offset up to its closing top-level LOOP END
+        region = LoopRegion(start)
+        depth = 0
+        for line_start, line_end, token in scan_loop_boundaries(report_map, self.tokeniser, start):
+            if token.token_class == TokenClass.LOOP_BEGIN:
+                if depth == 0:
+                    region.top_level = token.inlined == False
+                if token.inlined == False:
+                    region.loop_keys.add(Loop.form_loop_key(token.filename, token.line))
+                depth += 1
+            elif depth != 0:
+                depth -= 1
+                if depth == 0:
+                    region.end = line_end
+                    region.closed = True
+                    return region
+        
+        # the lines following the last top-level loop report
+        region.end = len(report_map)
+        return region
+
+    def scan_regions(self):
+        
+        """
+        Cut the report into fingerprinted regions. The regions of the last compile are 
+        looked for first (by hashing the bytes at the expected position), so only the
+        changed parts of the report are pre-scanned line by line.
+        """
+
+        regions = []
+        size = os.path.getsize(self.report_filename)
+        if size == 0:
+            return regions
+
+        previous_regions = self.regions if self.regions != None else []
+        previous_region_indices = {}
+        for region_index, region in enumerate(previous_regions):
+            previous_region_indices[id(region)] = region_index
+        reused_regions = set()
+
+        with open(self.report_filename, "rb") as report:
+            report_map = mmap.mmap(report.fileno(), 0, access=mmap.ACCESS_READ)
+            report_view = memoryview(report_map)
+            position = 0
+            expected_index = 0
+            while position < size:
+                region = None
+                # [1] the region following the last matched one in the last compiled report
+                if expected_index < len(previous_regions):
+                    previous_region = previous_regions[expected_index]
+                    end = position + previous_region.end - previous_region.start
+                    if end <= size and (previous_region.closed == True or end == size) and id(previous_region) not in reused_regions:
+                        if hashlib.sha1(report_view[position:end]).digest() == previous_region.digest:
+                            region = previous_region
+                # [2] a changed (or moved) region
+                if region == None:
+                    region = self.scan_region(report_map, position)
+                    region.digest = hashlib.sha1(report_view[region.start:region.end]).digest()
+                    previous_region = self.region_digests.get(region.digest, None)
+                    if previous_region != None and previous_region.closed == region.closed and id(previous_region) not in reused_regions:
+                        region = previous_region
+                
+                if region.group != None:
+                    reused_regions.add(id(region))
+                    expected_index = previous_region_indices[id(region)] + 1
+                    region.end = position + region.end - region.start
+                    region.start = position
+                regions.append(region)
+                position = region.end
+            
+            report_view.release()
+            report_map.close()
+        
+        return regions
+
+    def group_regions(self, regions, links):
+        
+        # union the regions referring to the same loops or linked by fusion/collapsing
+        region_parents = list(range(len(regions)))
+        
+        def find(region_index):
+            while region_parents[region_index] != region_index:
+                region_parents[region_index] = region_parents[region_parents[region_index]]
+                region_index = region_parents[region_index]
+            return region_index
+
+        loop_regions = {}
+        for region_index, region in enumerate(regions):
+            for loop_key in region.loop_keys:
+                first_region_index = loop_regions.setdefault(loop_key, region_index)
+                if first_region_index != region_index:
+                    region_parents[find(region_index)] = find(first_region_index)
+        for link in links:
+            linked_region_indices = [loop_regions[loop_key] for loop_key in link if loop_key in loop_regions]
+            for region_index in linked_region_indices[1:]:
+                region_parents[find(region_index)] = find(linked_region_indices[0])
+
+        # groups of regions in the report order
+        groups = {}
+        for region_index, region in enumerate(regions):
+            groups.setdefault(find(region_index), []).append(region)
+        return list(groups.values()), loop_regions
+
+    def assign_groups(self, regions):
+        
+        # (re)build the groups of the regions out of the patched IR
+        groups, loop_regions = self.group_regions(regions, self.get_links(self.ir, regions))
+        for group in groups:
+            group_id = self.next_group_id
+            self.next_group_id += 1
+            self.groups[group_id] = group
+            self.group_links[group_id] = self.get_links(self.ir, group)
+            for region in group:
+                region.group = group_id
+                for loop_key in region.loop_keys:
+                    self.loop_groups[loop_key] = group_id
+
+    def parse_regions(self, parser, ir, regions):
+        
+        # attribute the entries added to the IR dictionaries to the regions yielding them
+        sizes = [len(getattr(ir, dict_name)) for dict_name in self.IR_DICTS]
+        for region in regions:
+            region.added = ( [], [], [], [] )
+        top_level_regions = (region for region in regions if region.top_level == True)
+        for loop in parser.parse_optimization_report_stream(ir):
+            region = next(top_level_regions)
+            for dict_index, dict_name in enumerate(self.IR_DICTS):
+                ir_dict = getattr(ir, dict_name)
+                added_num = len(ir_dict) - sizes[dict_index]
+                region.added[dict_index].extend(reversed(list(itertools.islice(reversed(ir_dict), added_num))))
+                sizes[dict_index] = len(ir_dict)
+
+    def get_links(self, ir, regions):
+        
+        links = []
+        for region in regions:
+            for loop_key in region.added[2]:
+                loop = ir.fused_loops[loop_key]
+                if loop.classification.fused == Classification.YES:
+                    links.append([loop_key] + [Loop.form_loop_key(loop.filename, line) for line in loop.classification.fused_with[1:]])
+            for loop_key in region.added[3]:
+                loop = ir.collapsed_loops[loop_key]
+                if loop.classification.collapsed == Classification.YES:
+                    links.append([loop_key, Loop.form_loop_key(loop.filename, loop.classification.collapsed_with)])
+        return links
+
+    def patch_ir_dicts(self, regions, region_irs):
+        
+        # refill the IR dictionaries in the order of the regions, taking the entries of the 
+        # re-parsed regions from their new IRs (region id -> IR)
+        ir_dicts = [{}, {}, {}, {}]
+        for region in regions:
+            source_ir = region_irs.get(id(region), self.ir)
+            for dict_index, dict_name in enumerate(self.IR_DICTS):
+                source_dict = getattr(source_ir, dict_name)
+                ir_dict = ir_dicts[dict_index]
+                for loop_key in region.added[dict_index]:
+                    ir_dict[loop_key] = source_dict[loop_key]
+        for dict_index, dict_name in enumerate(self.IR_DICTS):
+            ir_dict = getattr(self.ir, dict_name)
+            ir_dict.clear()
+            ir_dict.update(ir_dicts[dict_index])
+
+    def reparse_regions(self, regions):
+        
+        # [1] groups of the changed, moved or dropped regions and the groups of the loops new regions refer to
+        affected_group_ids = set()
+        present_regions = set(map(id, regions))
+        for region in self.regions:
+            if id(region) not in present_regions:
+                affected_group_ids.add(region.group)
+                # the loops of a dropped region are forgotten (its group is re-parsed anyway)
+                for loop_key in region.loop_keys:
+                    if self.loop_groups.get(loop_key, None) == region.group:
+                        del self.loop_groups[loop_key]
+        group_positions = {}
+        new_region_num = 0
+        for region in regions:
+            if region.group == None:
+                new_region_num += 1
+                for loop_key in region.loop_keys:
+                    if loop_key in self.loop_groups:
+                        affected_group_ids.add(self.loop_groups[loop_key])
+            else:
+                group_position = group_positions.get(region.group, 0)
+                group = self.groups[region.group]
+                if group_position >= len(group) or group[group_position] is not region:
+                    affected_group_ids.add(region.group)
+                group_positions[region.group] = group_position + 1
+        
+        self.reparsed_region_num = 0
+        if new_region_num == 0 and len(affected_group_ids) == 0:
+            # whole groups may still have been moved -> reorder the IR dictionaries
+            if list(map(id, regions)) != list(map(id, self.regions)):
+                self.patch_ir_dicts(regions, {})
+            return set()
+
+        # [2] re-parse the affected regions, along with every unchanged group linked to them 
+        # by fusion/collapsing now (its loops would otherwise keep stale post-processing)
+        while True:
+            affected_regions = [region for region in regions if region.group == None or region.group in affected_group_ids]
+            links = []
+            for group_id in affected_group_ids:
+                links.extend(self.group_links[group_id])
+            groups, loop_regions = self.group_regions(affected_regions, links)
+            
+            region_irs = {}
+            for group in groups:
+                group_ir = LoopNestingStructure()
+                for region in group:
+                    region_irs[id(region)] = group_ir
+                    parser = Parser(Lexer(self.report_filename, ScannerMode.MMAP, (region.start, region.end), 0, self.remark_rules))
+                    self.parse_regions(parser, group_ir, [ region ])
+            
+            linked_group_ids = set()
+            for group in groups:
+                for link in self.get_links(region_irs[id(group[0])], group):
+                    for loop_key in link:
+                        if loop_key not in loop_regions and loop_key in self.loop_groups:
+                            linked_group_ids.add(self.loop_groups[loop_key])
+            # (a linked loop may be gone from the report along with its group, which is affected already)
+            if len(linked_group_ids - affected_group_ids) == 0:
+                break
+            affected_group_ids.update(linked_group_ids)
+
+        # [3] patch the IR dictionaries in place, keeping the order of a full compile
+        self.patch_ir_dicts(regions, region_irs)
+        
+        # the loops of the re-parsed regions belong to the patched IR now
+        for group_ir in { id(group_ir) : group_ir for group_ir in region_irs.values() }.values():
+            self.ir.adopt(group_ir)
+        
+        loop_keys = set()
+        for region in affected_regions:
+            # the fused/collapsed loops of the re-parsed regions are to be post-processed again
+            loop_keys.update(region.added[2])
+            loop_keys.update(region.added[3])
+
+        # [4] regroup the re-parsed regions
+        for group_id in affected_group_ids:
+            for region in self.groups.pop(group_id):
+                for loop_key in region.loop_keys:
+                    if self.loop_groups.get(loop_key, None) == group_id:
+                        del self.loop_groups[loop_key]
+            del self.group_links[group_id]
+        self.assign_groups(affected_regions)
+        self.reparsed_region_num = len(affected_regions)
+        
+        return loop_keys
+
+    def parse(self):
+        
+        regions = self.scan_regions()
+
+        if self.regions == None:
+            # the first compile parses the whole report in one pass
+            self.parse_regions(Parser(Lexer(self.report_filename, ScannerMode.MMAP, None, 0, self.remark_rules)), self.ir, regions)
+            self.assign_groups(regions)
+            self.reparsed_region_num = len(regions)
+            loop_keys = None
+        else:
+            loop_keys = self.reparse_regions(regions)
+
+        self.regions = regions
+        self.region_num = len(regions)
+        self.region_digests = {}
+        for region in regions:
+            self.region_digests[region.digest] = region
+        
+        return loop_keys
+
+    def compile(self):
+        
+        try:
+            loop_keys = self.parse()
+            self.post_process(loop_keys)
+        except BaseException:
+            # the IR may be half patched
+            self.reset()
+            raise
+
+    def compile_stream(self):
+        
+        self.compile()
+        for loop in self.ir.top_level_loops.values():
+            yield loop
 
 if __name__ == "__main__":
 
@@ -163,20 +809,115 @@ if __name__ == "__main__":
 
     print("=> icc.opt_report.compiler DEBUG mode\n")
 
-    logging.basicConfig(filename='compiler.debug', level=logging.DEBUG)
-
-    logging.debug('Debugging compiler.py')
+    # tracing is off unless enabled through OPT_REPORT_TRACE (e.g. "parser=debug,ir=info");
+    # with OPT_REPORT_TRACE_BUFFER=N the last N events are kept in memory and only
+    # dumped on a compiler error, instead of being logged into compiler.debug
+    tracing.configure_from_environment()
+    if tracing.is_enabled() and tracing.log_events == True:
+        logging.basicConfig(filename='compiler.debug', level=logging.DEBUG)
 
-    if len(sys.argv) != 2:
+    if len(sys.argv) != 2 and len(sys.argv) != 3:
         error_str = "error: "
         error_str += "compiler: "
-        error_str += "incorrect argument list => use ./compiler.py opt-report-filename"
+        error_str += "incorrect argument list => use ./compiler.py opt-report-filename|-|opt-report-dir|opt-report-glob [--stream|--follow[=<idle timeout in seconds>]|--parallel|--pipelined|--columnar|--token-stream|--bytes|--recover|--incremental|--filter=file=<glob>,lines=<first>-<last>,depth=<n>,limit=<n>]"
         sys.exit(error_str)
 
-    compiler = IccOptReportCompiler(sys.argv[1])
-    compiler.compile()
+    option = sys.argv[2] if len(sys.argv) == 3 else ""
+    if option.startswith("--follow="):
+        # the report is treated as complete once nothing is appended to it for the timeout ("inf" -> never)
+        try:
+            follow_idle_timeout = float(option[len("--follow="):])
+        except ValueError:
+            follow_idle_timeout = -1.0
+        if not follow_idle_timeout > 0.0:
+            sys.exit("error: compiler: incorrect follow timeout " + option[len("--follow="):] + " => use a positive number of seconds")
+        Scanner.FOLLOW_IDLE_TIMEOUT = follow_idle_timeout
+        option = "--follow"
+    if option not in ["", "--stream", "--follow", "--parallel", "--pipelined", "--columnar", "--token-stream", "--bytes", "--recover", "--incremental"] and option.startswith("--filter=") == False:
+        sys.exit("error: compiler: unknown option " + option)
+
+    if os.path.isdir(sys.argv[1]) or any(c in sys.argv[1] for c in "*?["):
+        # a directory of (or a glob pattern matching) per translation unit reports
+        compiler = IccOptReportBatchCompiler(sys.argv[1], ScannerMode.READLINE, None, option == "--recover")
+    elif option == "--parallel":
+        compiler = IccOptReportParallelCompiler(sys.argv[1])
+    elif option == "--follow":
+        compiler = IccOptReportCompiler(sys.argv[1], ScannerMode.FOLLOW)
+    elif option == "--pipelined":
+        compiler = IccOptReportCompiler(sys.argv[1], ScannerMode.READLINE, True)
+    elif option == "--columnar":
+        compiler = IccOptReportCompiler(sys.argv[1], ScannerMode.READLINE, False, 0, True)
+    elif option == "--bytes":
+        # raw report lines are tokenised without being decoded
+        compiler = IccOptReportCompiler(sys.argv[1], ScannerMode.BYTES)
+    elif option == "--token-stream":
+        # tokens are replayed out of (or dumped into) the token stream file next to the report
+        compiler = IccOptReportCompiler(sys.argv[1], ScannerMode.READLINE, False, 0, True, None, sys.argv[1] + ".tokens")
+    elif option.startswith("--filter="):
+        # only the selected loop nests are compiled, the rest of the report is skipped (or not read at all)
+        compiler = IccOptReportCompiler(sys.argv[1], loop_filter=parse_loop_filter(option[len("--filter="):]))
+    elif option == "--incremental":
+        # the report is recompiled whenever it changes, re-parsing only its changed regions
+        compiler = IccOptReportIncrementalCompiler(sys.argv[1])
+    elif option == "--recover":
+        # problems in the report are reported along with the partial IR compiled around them
+        compiler = IccOptReportCompiler(sys.argv[1], recover=True)
+    else:
+        compiler = IccOptReportCompiler(sys.argv[1])
+
+    try:
+        if option == "--stream" or option == "--follow":
+            # print top-level loops as soon as they are compiled out of a report being written
+            for loop in compiler.compile_stream():
+                print("loop: (depth: " + str(loop.depth) + ") " + loop.name)
+                print("{")
+                loop.classification.print("\t")
+                print("}")
+                sys.stdout.flush()
+        else:
+            compile_start = time.perf_counter()
+            compiler.compile()
+            compile_time = time.perf_counter() - compile_start
     
-    compiler.print_compilation_report()
+            compiler.print_compilation_report()
+
+            if option in ["", "--pipelined", "--columnar", "--bytes", "--token-stream", "--recover"] and isinstance(compiler, IccOptReportBatchCompiler) == False:
+                print("inlined loop report lines skipped: " + str(compiler.lexer.get_skipped_lexeme_num()))
+
+            if option == "--pipelined":
+                print("pipeline queues: " + str(compiler.lexer.get_pipeline_stats()))
+            elif option == "--columnar":
+                print("tokens: " + str(len(compiler.lexer.token_arrays)) + ", filenames: " + str(len(compiler.lexer.token_arrays.filenames)))
+            elif option == "--token-stream":
+                # with the tokens replayed, the compile time is the Parser time alone
+                print("token stream " + compiler.lexer.token_stream_filename + (" replayed" if compiler.lexer.token_stream_replayed else " written"))
+                print("compile time: " + "{:.3f}".format(compile_time) + "s")
+            elif option.startswith("--filter="):
+                print(str(compiler.loop_filter) + ": " + str(compiler.parser.filtered_loop_num) + " loop nests filtered out, " + str(compiler.lexer.scanner.get_lexeme_num()) + " report lines read")
+            elif option == "--incremental":
+                print("regions: " + str(compiler.region_num) + ", compile time: " + "{:.3f}".format(compile_time) + "s")
+                report_mtime = os.stat(sys.argv[1]).st_mtime_ns
+                try:
+                    while True:
+                        time.sleep(Scanner.FOLLOW_POLL_INTERVAL)
+                        if os.stat(sys.argv[1]).st_mtime_ns == report_mtime:
+                            continue
+                        report_mtime = os.stat(sys.argv[1]).st_mtime_ns
+                        compile_start = time.perf_counter()
+                        compiler.compile()
+                        compile_time = time.perf_counter() - compile_start
+                        print("recompiled: " + str(compiler.reparsed_region_num) + " of " + str(compiler.region_num) + " regions re-parsed, loops total: " + str(len(compiler.get_ir().get_loops())) + ", compile time: " + "{:.3f}".format(compile_time) + "s")
+                        sys.stdout.flush()
+                except KeyboardInterrupt:
+                    pass
+            elif option == "--recover":
+                print("diagnostics: " + str(len(compiler.get_diagnostics())))
+                for diagnostic in compiler.get_diagnostics():
+                    print("\t" + str(diagnostic))
+    except SystemExit:
+        # the last trace events leading to the compiler error
+        tracing.dump_events()
+        raise
 
     print("=> icc.opt_report.compiler DEBUG mode finished!")
     
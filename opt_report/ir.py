@@ -2,8 +2,15 @@
 
 import re
 import sys
-import logging
+import bisect
+import weakref
 from enum import Enum, auto
+from types import MappingProxyType
+
+from tracing import TraceLevel, get_tracer
+
+# IR construction trace events (see tracing.py); guarded by a flag test -> free when disabled
+IR_TRACE = get_tracer("ir")
 
 class Classification(Enum):
     NO = auto()
@@ -23,49 +30,152 @@ class LoopType(Enum):
     OUTER = 8
     UNKNOWN = 9
 
-class LoopClassificationInfo:
-    
-    """ All the information derived out of Intel C/C++ Compiler report """
-    
-    def __init__(self, loop):
-        
-        # pointer to the loop object this classification applies to
-        self.loop = loop
+# [ script performance optimization ]
+# Classification of a loop packed into 2 bits per field of a single integer
+# (UNINITIALIZED is 0, so a fresh classification is the cached small int 0)
+CLASSIFICATIONS = ( Classification.UNINITIALIZED, Classification.NO, Classification.YES, Classification.UNSTATED )
+CLASSIFICATION_CODES = { classification : code for code, classification in enumerate(CLASSIFICATIONS) }
 
-        # loop's parallelisation status
-        self.parallel = Classification.UNINITIALIZED
-        self.parallel_potential = Classification.UNINITIALIZED
+class PackedClassification:
 
-        # loop vectorization status
-        self.vector = Classification.UNINITIALIZED
-        self.vector_potential = Classification.UNINITIALIZED
+    """ A Classification field of LoopClassificationInfo stored in 2 bits of its state """
 
-        # loop was transformed to memset or memcpy
-        self.memset = Classification.UNINITIALIZED
+    __slots__ = ( "shift", "mask" )
 
-        # loop dependence present
-        self.parallel_dependence = Classification.UNINITIALIZED
-        self.parallel_not_candidate = Classification.UNINITIALIZED
-        self.vector_dependence = Classification.UNINITIALIZED
+    def __init__(self, field_num):
+        self.shift = 2 * field_num
+        self.mask = ~(3 << self.shift)
+
+    def __get__(self, classification, owner=None):
+        if classification == None:
+            return self
+        return CLASSIFICATIONS[(classification.state >> self.shift) & 3]
+
+    def __set__(self, classification, value):
+        classification.state = (classification.state & self.mask) | (CLASSIFICATION_CODES[value] << self.shift)
+
+class LazyContainer:
+
+    """ 
+    A child container of an IR object created on the first addition only; until then
+    a shared empty (read-only) container is read out of the attribute
+    """
+
+    __slots__ = ( "slot", "empty" )
+
+    def __init__(self, slot, empty):
+        self.slot = slot
+        self.empty = empty
+
+    def __get__(self, obj, owner=None):
+        if obj == None:
+            return self
+        value = getattr(obj, self.slot)
+        return value if value != None else self.empty
+
+    def __set__(self, obj, value):
+        setattr(obj, self.slot, value)
+
+class WeakReference:
+
+    """
+    A back-reference of an IR object (to its parent, main loop, etc.) held as a weak
+    reference: the IR stays free of reference cycles, so it is freed by reference
+    counting as soon as it is dropped, rather than by the cyclic garbage collector
+    """
+
+    __slots__ = ( "slot", )
+
+    def __init__(self, slot):
+        self.slot = slot
+
+    def __get__(self, obj, owner=None):
+        if obj == None:
+            return self
+        reference = getattr(obj, self.slot)
+        return reference() if reference != None else None
+
+    def __set__(self, obj, value):
+        setattr(obj, self.slot, weakref.ref(value) if value != None else None)
+
+# shared empty child containers
+EMPTY_LOOPS = MappingProxyType({})
+EMPTY_LIST = ()
+
+class LoopClassificationInfo:
+    
+    """ 
+    All the information derived out of Intel C/C++ Compiler report
+
+    [ script performance optimization ]
+    No per-object __dict__: the Classification fields are packed into a single integer,
+    fused_with, collapsed_with and remarks are only stored once reported (a shared empty
+    one is read before). A classification takes 80 bytes (+28 bytes of the state integer
+    once reported) instead of 520 (the object with its __dict__ and three empty lists,
+    CPython 3.11, 64-bit).
+    """
+
+    __slots__ = ( "loop_key", "state", "distr_parts_n", "_fused_with", "_collapsed_with", "_remarks" )
+
+    # all the (public) classification fields (e.g. usable by remark rules)
+    FIELDS = ( "parallel", "parallel_potential", "vector", "vector_potential", "memset",
+               "parallel_dependence", "parallel_not_candidate", "vector_dependence", "openmp",
+               "no_opts", "tiled", "fused", "fused_with", "fused_lost", "distr", "distr_parts_n",
+               "collapsed", "collapsed_with", "collapse_eliminated", "remarks" )
+
+    # loop's parallelisation status
+    parallel = PackedClassification(0)
+    parallel_potential = PackedClassification(1)
+
+    # loop vectorization status
+    vector = PackedClassification(2)
+    vector_potential = PackedClassification(3)
+
+    # loop was transformed to memset or memcpy
+    memset = PackedClassification(4)
+
+    # loop dependence present
+    parallel_dependence = PackedClassification(5)
+    parallel_not_candidate = PackedClassification(6)
+    vector_dependence = PackedClassification(7)
+
+    # #pragma omp presence
+    openmp = PackedClassification(8)
+
+    # no loop optimizations reported
+    no_opts = PackedClassification(9)
+    # loop tiling
+    tiled = PackedClassification(10)
+    # loop fusion
+    fused = PackedClassification(11)
+    fused_with = LazyContainer("_fused_with", EMPTY_LIST)
+    fused_lost = PackedClassification(12)
+    # loop fission (distribution)
+    distr = PackedClassification(13)
+    # loop collapsing
+    collapsed = PackedClassification(14)
+    collapsed_with = LazyContainer("_collapsed_with", EMPTY_LIST)
+    collapse_eliminated = PackedClassification(15)
+    # other remark kinds (recognised by remark rules) reported for the loop
+    remarks = LazyContainer("_remarks", EMPTY_LIST)
 
-        # #pragma omp presence
-        self.openmp = Classification.UNINITIALIZED
+    def __init__(self, loop):
         
-        # no loop optimizations reported
-        self.no_opts = Classification.UNINITIALIZED
-        # loop tiling
-        self.tiled = Classification.UNINITIALIZED
-        # loop fusion
-        self.fused = Classification.UNINITIALIZED
-        self.fused_with = []
-        self.fused_lost = Classification.UNINITIALIZED
-        # loop fission (distribution)
-        self.distr = Classification.UNINITIALIZED
+        # key of the loop this classification applies to (not a reference -> no cycle)
+        self.loop_key = loop.key if loop != None else None
+
+        # all the Classification fields UNINITIALIZED
+        self.state = 0
         self.distr_parts_n = 0
-        # loop collapsing
-        self.collapsed = Classification.UNINITIALIZED
-        self.collapsed_with = []
-        self.collapse_eliminated = Classification.UNINITIALIZED
+        self._fused_with = None
+        self._collapsed_with = None
+        self._remarks = None
+
+    def add_remark(self, remark):
+        if self._remarks == None:
+            self._remarks = [ remark ]
+        elif remark not in self._remarks:
+            self._remarks.append(remark)
     
     def print_raw(self, prefix):
         print(prefix + "parallel: " + self.parallel.name)
@@ -85,8 +195,9 @@ class LoopClassificationInfo:
         print(prefix + "distributed: " + self.distr.name)
         print(prefix + "distributed-num: " + str(self.distr_parts_n))
         print(prefix + "collapsed: " + self.collapsed.name)
-        print(prefix + "collapsed with: " + str(self.collapsed_with))
+        print(prefix + "collapsed with: " + str(self._collapsed_with if self._collapsed_with != None else []))
         print(prefix + "collapse eliminated: " + self.collapse_eliminated.name)
+        print(prefix + "remarks: " + ', '.join(self.remarks))
 
     def print(self, prefix):
         
@@ -136,11 +247,14 @@ class LoopClassificationInfo:
         
         if self.collapsed != Classification.UNINITIALIZED:
             print(prefix + "collapsed: " + self.collapsed.name)
-            print(prefix + "collapsed with: " + str(self.collapsed_with))
+            print(prefix + "collapsed with: " + str(self._collapsed_with if self._collapsed_with != None else []))
         
         if self.collapse_eliminated != Classification.UNINITIALIZED:
             print(prefix + "collapse eliminated: " + self.collapse_eliminated.name)
 
+        if len(self.remarks) != 0:
+            print(prefix + "remarks: " + ', '.join(self.remarks))
+
     def copy(self, classification):
         # loop's parallelisation status
         self.parallel = classification.parallel
@@ -157,82 +271,133 @@ class LoopClassificationInfo:
             self.parallel = classification
         else:
             if self.parallel != classification:
-                logging.debug('LoopClassification: => Loop(' + str(self.loop)  +') attempt to reset PARALLEL classification to the opposite')
+                if IR_TRACE.debug:
+                    IR_TRACE.event(TraceLevel.DEBUG, "classification_reset", loop=get_loop_key_name(self.loop_key), classification="PARALLEL")
 
     def set_parallel_potential(self, classification):
         if self.parallel_potential == Classification.UNINITIALIZED:
             self.parallel_potential = classification
         else:
             if self.parallel_potential != classification:
-                logging.debug('LoopClassification: => Loop(' + str(self.loop)  +') attempt to reset PARALLEL POTENTIAL classification')
+                if IR_TRACE.debug:
+                    IR_TRACE.event(TraceLevel.DEBUG, "classification_reset", loop=get_loop_key_name(self.loop_key), classification="PARALLEL POTENTIAL")
 
     def set_vector(self, classification):
         if self.vector == Classification.UNINITIALIZED:
             self.vector = classification
         else:
             if self.vector != classification:
-                logging.debug('LoopClassification: => Loop(' + str(self.loop)  +') attempt to reset VECTOR classification')
+                if IR_TRACE.debug:
+                    IR_TRACE.event(TraceLevel.DEBUG, "classification_reset", loop=get_loop_key_name(self.loop_key), classification="VECTOR")
 
     def set_vector_potential(self, classification):
         if self.vector_potential == Classification.UNINITIALIZED:
             self.vector_potential = classification
         else:
             if self.vector_potential != classification:
-                logging.debug('LoopClassification: => Loop(' + str(self.loop)  +') attempt to reset VECTOR POTENTIAL classification')
+                if IR_TRACE.debug:
+                    IR_TRACE.event(TraceLevel.DEBUG, "classification_reset", loop=get_loop_key_name(self.loop_key), classification="VECTOR POTENTIAL")
 
     def set_memset(self, classification):
         if self.memset == Classification.UNINITIALIZED:
             self.memset = classification
         else:
             if self.memset != classification:
-                logging.debug('LoopClassification: => Loop(' + str(self.loop)  +') attempt to reset MEMSET classification')
+                if IR_TRACE.debug:
+                    IR_TRACE.event(TraceLevel.DEBUG, "classification_reset", loop=get_loop_key_name(self.loop_key), classification="MEMSET")
 
     def set_parallel_dependence(self, classification):
         if self.parallel_dependence == Classification.UNINITIALIZED:
             self.parallel_dependence = classification
         else:
             if self.parallel_dependence != classification:
-                logging.debug('LoopClassification: => Loop(' + str(self.loop)  +') attempt to reset PARALLEL DEPENDENCE classification')
+                if IR_TRACE.debug:
+                    IR_TRACE.event(TraceLevel.DEBUG, "classification_reset", loop=get_loop_key_name(self.loop_key), classification="PARALLEL DEPENDENCE")
 
     def set_parallel_not_candidate(self, classification):
         if self.parallel_not_candidate == Classification.UNINITIALIZED:
             self.parallel_not_candidate = classification
         else:
             if self.parallel_not_candidate != classification:
-                logging.debug('LoopClassification: => Loop(' + str(self.loop)  +') attempt to reset PARALLEL NOT CANDIDATE classification')
+                if IR_TRACE.debug:
+                    IR_TRACE.event(TraceLevel.DEBUG, "classification_reset", loop=get_loop_key_name(self.loop_key), classification="PARALLEL NOT CANDIDATE")
 
     def set_vector_dependence(self, classification):
         if self.vector_dependence == Classification.UNINITIALIZED:
             self.vector_dependence = classification
         else:
             if self.vector_dependence != classification:
-                logging.debug('LoopClassification: => Loop(' + str(self.loop)  +') attempt to reset VECTOR DEPENDENCE classification')
+                if IR_TRACE.debug:
+                    IR_TRACE.event(TraceLevel.DEBUG, "classification_reset", loop=get_loop_key_name(self.loop_key), classification="VECTOR DEPENDENCE")
+
+# [ script performance optimization ]
+# interned source filenames: loops refer to a single copy of every filename and are
+# keyed by integer loop keys (file_id << LOOP_KEY_LINE_BITS | line) instead of
+# "filename(line)" strings built for every loop and every lookup
+FILENAMES = [] # file_id -> filename
+FILE_IDS = {} # filename -> file_id
+LOOP_KEY_LINE_BITS = 32
+
+def intern_filename(filename):
+    file_id = FILE_IDS.get(filename, None)
+    if file_id == None:
+        file_id = len(FILENAMES)
+        FILE_IDS[filename] = file_id
+        FILENAMES.append(filename)
+    return file_id
+
+def get_loop_key_name(loop_key):
+    return FILENAMES[loop_key >> LOOP_KEY_LINE_BITS] + "(" + str(loop_key & ((1 << LOOP_KEY_LINE_BITS) - 1)) + ")"
 
 class Loop:
 
-    """ Loop, as found in the source code """
+    """ 
+    Loop, as found in the source code
+
+    [ script performance optimization ]
+    No per-object __dict__ and the inner_loops and distr_chunks dictionaries are only
+    created once a child is added (a shared empty read-only mapping is read before;
+    children are added through add_inner_loop() and add_distr_chunk()). Most loops
+    (innermost loops, peels, remainders) never get any. A loop takes 160 bytes instead
+    of 480 (the object with its __dict__ and two empty dictionaries), 240 instead of 1000
+    together with its classification (CPython 3.11, 64-bit).
+    """
+
+    __slots__ = ( "_loop_nest_struct", "_parent", "_main", "filename", "line", "depth", "loop_type", "number", "key",
+                  "_inner_loops", "_distr_chunks", "vector_remainder", "remainder", "peel", "classification", "__weakref__" )
+
+    # back-references (weak -> the IR is free of reference cycles)
+    loop_nest_struct = WeakReference("_loop_nest_struct")
+    parent = WeakReference("_parent")
+    main = WeakReference("_main")
+
+    # loop's composition (created on the first addition)
+    inner_loops = LazyContainer("_inner_loops", EMPTY_LOOPS)
 
     def form_main_loop_name(filename="", line=-1):
         return filename + "(" + str(line) + ")"
 
-    def __init__(self, filename="", line=-1, depth=-1, loop_type=LoopType.UNKNOWN, number=-1):
+    def form_loop_key(filename="", line=-1):
+        return intern_filename(filename) << LOOP_KEY_LINE_BITS | int(line)
+
+    def __init__(self, filename="", line=-1, depth=-1, loop_type=LoopType.UNKNOWN, number=-1, key=None):
 
         # reference to a LoopNestingStructure this loop belongs to
-        self.loop_nest_struct = None
+        self._loop_nest_struct = None
 
         # references linking loop objects into a whole consistent loop nesting structure
         # parent of an inner loop
-        self.parent = None
+        self._parent = None
         # main loop reference for distributed parts of a loop, remainders, peels, etc.
-        self.main = None
+        self._main = None
 
         # loop's location on the host filesystem, depth, type, etc.
-        self.filename = filename
+        self.key = key if key != None else Loop.form_loop_key(filename, line)
+        self.filename = FILENAMES[self.key >> LOOP_KEY_LINE_BITS]
         self.line = line
         self.depth = depth
         self.loop_type = loop_type
         self.number = number
-        self.name = filename + "(" + line + ")"
 
         """
         if self.loop_type.value == LoopType.MAIN.value:
@@ -251,8 +416,8 @@ class Loop:
             sys.exit("A type of the loop " + filename + "(" + str(line) + ")" + "has not been specified")
         """
         # loop's composition
-        self.inner_loops = {}
-        self.distr_chunks = {}
+        self._inner_loops = None
+        self._distr_chunks = None
         self.vector_remainder = None
         self.remainder = None
         self.peel = None
@@ -260,8 +425,35 @@ class Loop:
         # all loop optimization information gathered from ICC report
         self.classification = LoopClassificationInfo(self)
         
-        logging.debug('Loop: => new Loop() obj at ' + str(self))
-        logging.debug('Loop: ' + self.filename + '(' + str(self.line) + '): ' + 'depth(' + str(self.depth) + ') ' + self.loop_type.name)
+        if IR_TRACE.debug:
+            IR_TRACE.event(TraceLevel.DEBUG, "new_loop", filename=self.filename, line=self.line, depth=self.depth, loop_type=self.loop_type.name)
+
+    @property
+    def name(self):
+        # "filename(line)", derived for display only
+        return self.filename + "(" + str(self.line) + ")"
+
+    @property
+    def file_id(self):
+        return self.key >> LOOP_KEY_LINE_BITS
+
+    def __getstate__(self):
+
+        # weak references can not be pickled -> the objects they refer to are pickled instead
+        state = {}
+        for slot in Loop.__slots__:
+            if slot != "__weakref__" and hasattr(self, slot):
+                state[slot] = getattr(self, slot)
+        for slot in ( "_loop_nest_struct", "_parent", "_main" ):
+            if state.get(slot, None) != None:
+                state[slot] = state[slot]()
+        return state
+
+    def __setstate__(self, state):
+        for slot, value in state.items():
+            if slot in ( "_loop_nest_struct", "_parent", "_main" ) and value != None:
+                value = weakref.ref(value)
+            setattr(self, slot, value)
 
     def get_loop_nest_struct(self):
         return self.loop_nest_struct
@@ -281,39 +473,55 @@ class Loop:
     def set_main_loop(self, main):
         self.main = main
 
-    def get_inner_loop(self, inner_loop_name):
-        if inner_loop_name in self.inner_loops:
-            return self.inner_loops[inner_loop_name]
+    def get_inner_loop(self, inner_loop_key):
+        if inner_loop_key in self.inner_loops:
+            return self.inner_loops[inner_loop_key]
         else:
             return None
 
     def add_inner_loop(self, inner_loop):
-        if inner_loop.name not in self.inner_loops:
+        if self._inner_loops == None:
+            self._inner_loops = {}
+        if inner_loop.key not in self._inner_loops:
             inner_loop.set_parent_loop(self)
-            self.inner_loops[inner_loop.name] = inner_loop
+            self._inner_loops[inner_loop.key] = inner_loop
         
-            logging.debug('Loop: => Loop(' + str(self) + ') added a new inner loop Loop(' + str(inner_loop) + ')')
-            logging.debug('Loop: loop at ' + self.filename + '(' + str(self.line) + ')')
-            logging.debug('Loop: inner loop at ' + inner_loop.filename + '(' + str(inner_loop.line) + ')')
+            if IR_TRACE.debug:
+                IR_TRACE.event(TraceLevel.DEBUG, "add_inner_loop", loop=self.name, inner_loop=inner_loop.name)
 
             return True
         else:
             return False
 
+    @property
+    def distr_chunks(self):
+        if self._distr_chunks == None:
+            return EMPTY_LOOPS
+        if None in self._distr_chunks.values():
+            # the loop itself (distributed chunk 1) is not referenced out of its own dictionary (no cycle)
+            return MappingProxyType({ num : distr_chunk if distr_chunk != None else self for num, distr_chunk in self._distr_chunks.items() })
+        return self._distr_chunks
+
+    @distr_chunks.setter
+    def distr_chunks(self, distr_chunks):
+        self._distr_chunks = distr_chunks
+
     def get_distr_chunk(self, num):
-        if num in self.distr_chunks:
-            return self.distr_chunks[num]
+        if self._distr_chunks != None and num in self._distr_chunks:
+            distr_chunk = self._distr_chunks[num]
+            return distr_chunk if distr_chunk != None else self
         else:
             return None 
 
     def add_distr_chunk(self, distr_chunk, num):
-        if num not in self.distr_chunks:
+        if self._distr_chunks == None:
+            self._distr_chunks = {}
+        if num not in self._distr_chunks:
             distr_chunk.set_main_loop(self)
-            self.distr_chunks[num] = distr_chunk
+            self._distr_chunks[num] = distr_chunk if distr_chunk is not self else None
 
-            logging.debug('Loop: => Loop(' + str(self) + ') added a new distributed chunk Loop(' + str(distr_chunk) + ')')
-            logging.debug('Loop: loop at ' + self.filename + '(' + str(self.line) + ')')
-            logging.debug('Loop: distr loop at ' + distr_chunk.filename + '(' + str(distr_chunk.line) + ')')
+            if IR_TRACE.debug:
+                IR_TRACE.event(TraceLevel.DEBUG, "add_distributed_chunk", loop=self.name, distributed_chunk=distr_chunk.name)
 
             return True
         else:
@@ -327,9 +535,8 @@ class Loop:
             peel_loop.set_main_loop(self)
             self.peel = peel_loop
 
-            logging.debug('Loop: => Loop(' + str(self) + '): added peel loop Loop(' + str(peel_loop) + ')')
-            logging.debug('Loop: loop at ' + self.filename + '(' + str(self.line) + ')')
-            logging.debug('Loop: peel loop at ' + peel_loop.filename + '(' + str(peel_loop.line) + ')')
+            if IR_TRACE.debug:
+                IR_TRACE.event(TraceLevel.DEBUG, "add_peel_loop", loop=self.name, peel_loop=peel_loop.name)
 
             return True
         else:
@@ -343,9 +550,8 @@ class Loop:
             remainder_loop.set_main_loop(self)
             self.remainder = remainder_loop
 
-            logging.debug('Loop: => Loop(' + str(self) + '): added remainder loop Loop(' + str(remainder_loop) + ')')
-            logging.debug('Loop: loop at ' + self.filename + '(' + str(self.line) + ')')
-            logging.debug('Loop: remainder loop at ' + remainder_loop.filename + '(' + str(remainder_loop.line) + ')')
+            if IR_TRACE.debug:
+                IR_TRACE.event(TraceLevel.DEBUG, "add_remainder_loop", loop=self.name, remainder_loop=remainder_loop.name)
 
             return True
         else:
@@ -359,9 +565,8 @@ class Loop:
             remainder_loop.set_main_loop(self)
             self.vector_remainder = remainder_loop
 
-            logging.debug('Loop: => Loop(' + str(self) + '): added vector remainder loop Loop(' + str(remainder_loop) + ')')
-            logging.debug('Loop: loop at ' + self.filename + '(' + str(self.line) + ')')
-            logging.debug('Loop: vector remainder loop at ' + remainder_loop.filename + '(' + str(remainder_loop.line) + ')')
+            if IR_TRACE.debug:
+                IR_TRACE.event(TraceLevel.DEBUG, "add_vector_remainder_loop", loop=self.name, vector_remainder_loop=remainder_loop.name)
 
             return True
         else:
@@ -377,6 +582,7 @@ class LoopNestingStructure:
     references to the original loops (present in the source code,
     and not created by the ICC compiler itself (such as loop
     peels, remainders, distributed parts, etc.)).
+    Loops are keyed by their integer loop keys (see Loop.form_loop_key()).
     """
 
     def __init__(self):
@@ -394,6 +600,36 @@ class LoopNestingStructure:
         # convenience and auxiliary data-structures
         self.fused_loops = {}
         self.collapsed_loops = {}
+
+    def __setstate__(self, state):
+
+        # an IR compiled by another process (e.g. IccOptReportBatchCompiler workers) refers to
+        # the filename table of that process -> the filenames are interned into the table of
+        # this one and all the loop keys are formed anew; by now all the loops are unpickled
+        self.__dict__.update(state)
+
+        loops = []
+        seen_loop_ids = set()
+        pending_loops = list(self.loops.values()) + list(self.top_level_loops.values())
+        while len(pending_loops) != 0:
+            loop = pending_loops.pop()
+            if loop == None or id(loop) in seen_loop_ids:
+                continue
+            seen_loop_ids.add(id(loop))
+            loops.append(loop)
+            pending_loops.extend(loop.inner_loops.values())
+            pending_loops.extend(loop.distr_chunks.values())
+            pending_loops.extend((loop.peel, loop.remainder, loop.vector_remainder, loop.parent, loop.main))
+
+        for loop in loops:
+            loop.key = Loop.form_loop_key(loop.filename, loop.line)
+            loop.filename = FILENAMES[loop.file_id]
+            loop.classification.loop_key = loop.key
+        for loop in loops:
+            if loop._inner_loops != None:
+                loop._inner_loops = { inner_loop.key : inner_loop for inner_loop in loop._inner_loops.values() }
+        for dict_name in ( "top_level_loops", "loops", "fused_loops", "collapsed_loops" ):
+            setattr(self, dict_name, { loop.key : loop for loop in getattr(self, dict_name).values() })
  
     def get_loops(self):
         return self.loops
@@ -404,62 +640,261 @@ class LoopNestingStructure:
     def get_collapsed_loops(self):
         return self.collapsed_loops
 
-    def get_top_level_loop(self, loop_name):
-        if loop_name in self.top_level_loops:
-            return self.top_level_loops[loop_name]
+    def get_top_level_loop(self, loop_key):
+        if loop_key in self.top_level_loops:
+            return self.top_level_loops[loop_key]
         else:
             return None
    
     def add_top_level_loop(self, loop):
-        if loop.name not in self.top_level_loops:
-            self.top_level_loops[loop.name] = loop
+        if loop.key not in self.top_level_loops:
+            self.top_level_loops[loop.key] = loop
 
-            logging.debug('LoopNestStruct: => added a new top level loop Loop(' + str(loop) + ')')
-            logging.debug('LoopNestStruct: loop at ' + loop.filename + '(' + str(loop.line) + ')')
+            if IR_TRACE.debug:
+                IR_TRACE.event(TraceLevel.DEBUG, "add_top_level_loop", loop=loop.name)
 
             return True
         else:
             return False
 
-    def get_loop(self, loop_name):
-        if loop_name in self.loops:
-            return self.loops[loop_name]
+    def get_loop(self, loop_key):
+        if loop_key in self.loops:
+            return self.loops[loop_key]
         else:
             return None
     
     def add_loop(self, loop):
-        if loop.name not in self.loops:
-            self.loops[loop.name] = loop
+        if loop.key not in self.loops:
+            self.loops[loop.key] = loop
 
-            logging.debug('LoopNestStruct: => LoopNestStructure(' + str(self) + ') added a new loop Loop(' + str(loop) + ')')
-            logging.debug('LoopNestStruct: loop at ' + loop.filename + '(' + str(loop.line) + ')')
+            if IR_TRACE.debug:
+                IR_TRACE.event(TraceLevel.DEBUG, "add_loop", loop=loop.name)
 
             return True
         else:
             return False
 
     def add_fused_loop(self, loop):
-        if loop.name not in self.fused_loops:
-            self.fused_loops[loop.name] = loop
+        if loop.key not in self.fused_loops:
+            self.fused_loops[loop.key] = loop
 
-            logging.debug('LoopNestStruct: => LoopNestStructure(' + str(self) + ') added a new fused loop Loop(' + str(loop) + ')')
-            logging.debug('LoopNestStruct: fused loop at ' + loop.filename + '(' + str(loop.line) + ')')
+            if IR_TRACE.debug:
+                IR_TRACE.event(TraceLevel.DEBUG, "add_fused_loop", loop=loop.name)
 
             return True
         else:
             return False
 
     def add_collapsed_loop(self, loop):
-        if loop.name not in self.collapsed_loops:
-            self.collapsed_loops[loop.name] = loop
+        if loop.key not in self.collapsed_loops:
+            self.collapsed_loops[loop.key] = loop
 
-            logging.debug('LoopNestStruct: => LoopNestStructure(' + str(self) + ') added a new collapsed loop Loop(' + str(loop) + ')')
-            logging.debug('LoopNestStruct: collapsed loop at ' + loop.filename + '(' + str(loop.line) + ')')
+            if IR_TRACE.debug:
+                IR_TRACE.event(TraceLevel.DEBUG, "add_collapsed_loop", loop=loop.name)
 
             return True
         else:
             return False
 
+    def adopt(self, loop_nest_struct, loops=None):
+        
+        """
+        Make the loops of another LoopNestingStructure (by default all of them) refer to 
+        this one, along with the loops reachable from them, which are not kept in the 
+        dictionaries (peels, remainders, distributed chunks and their inner loops)
+        """
+
+        if loops == None:
+            loops = list(loop_nest_struct.loops.values()) + list(loop_nest_struct.top_level_loops.values())
+        seen_loop_ids = set()
+        pending_loops = list(loops)
+        while len(pending_loops) != 0:
+            loop = pending_loops.pop()
+            if loop == None or id(loop) in seen_loop_ids:
+                continue
+            seen_loop_ids.add(id(loop))
+            if loop.get_loop_nest_struct() is loop_nest_struct:
+                loop.set_loop_nest_struct(self)
+            pending_loops.extend(loop.inner_loops.values())
+            pending_loops.extend(loop.distr_chunks.values())
+            pending_loops.extend((loop.peel, loop.remainder, loop.vector_remainder))
+
+    def merge(self, loop_nest_struct):
+        
+        """ 
+        Merge loops of another LoopNestingStructure (e.g. compiled out of the report of 
+        another translation unit) into this one. Loops are identified by their keys; 
+        a loop already present in this structure takes precedence over the merged one.
+        """
+
+        if IR_TRACE.info:
+            IR_TRACE.event(TraceLevel.INFO, "merge", loops=len(self.loops), merged_loops=len(loop_nest_struct.loops))
+
+        # loops reported by more than one translation unit (e.g. loops of non-inlined header functions)
+        duplicate_loop_keys = set()
+        merged_loops = []
+        for loop_key, loop in loop_nest_struct.loops.items():
+            if self.add_loop(loop) == True:
+                merged_loops.append(loop)
+            else:
+                duplicate_loop_keys.add(loop_key)
+        # (the parts of the merged loops and their inner loops are not kept in the dictionaries)
+        self.adopt(loop_nest_struct, merged_loops)
+
+        for loop_key, loop in loop_nest_struct.top_level_loops.items():
+            if loop_key not in duplicate_loop_keys:
+                self.add_top_level_loop(loop)
+
+        for loop_key, loop in loop_nest_struct.fused_loops.items():
+            if loop_key not in duplicate_loop_keys:
+                self.add_fused_loop(loop)
+
+        for loop_key, loop in loop_nest_struct.collapsed_loops.items():
+            if loop_key not in duplicate_loop_keys:
+                self.add_collapsed_loop(loop)
+
+class FileLoopIndex:
+
+    """ Loops of a single source file, sorted by their lines """
+
+    __slots__ = ( "lines", "ends", "loops", "leaf_num", "max_ends" )
+
+    def __init__(self):
+        self.lines = []
+        # last line of the nesting extent of every loop
+        self.ends = []
+        self.loops = []
+        # segment tree of the extent ends: node i (1 -> the root) holds the maximum end 
+        # of its children 2i and 2i + 1, leaf_num + j holds the end of the loop j
+        self.leaf_num = 0
+        self.max_ends = []
+
+    def build_tree(self):
+        
+        self.leaf_num = 1
+        while self.leaf_num < len(self.ends):
+            self.leaf_num *= 2
+        self.max_ends = [-1] * self.leaf_num + self.ends + [-1] * (self.leaf_num - len(self.ends))
+        for node in range(self.leaf_num - 1, 0, -1):
+            self.max_ends[node] = max(self.max_ends[2 * node], self.max_ends[2 * node + 1])
+
+    def get_covering(self, last, line):
+
+        """ Numbers (in order) of the loops 0..last whose extents end at the line or after it """
+
+        nums = []
+        # (node, number of its first loop, number of its loops), the leftmost node on the top
+        nodes = [ (1, 0, self.leaf_num) ]
+        while len(nodes) != 0:
+            node, first, num = nodes.pop()
+            if first > last or self.max_ends[node] < line:
+                continue
+            if num == 1:
+                nums.append(first)
+            else:
+                num //= 2
+                nodes.append((2 * node + 1, first + num, num))
+                nodes.append((2 * node, first, num))
+        return nums
+
+class LoopIndex:
+
+    """
+    Per-file interval index of the loops of a LoopNestingStructure for (filename, line)
+    lookups: loops beginning at a line, loops covering a range of lines and the loops
+    enclosing a line are found by bisection instead of a scan over all the loops.
+
+    The report only states the line a loop begins at, so the nesting extent of a loop
+    spans from its line to the last line of its inner loops (in the same file) at any
+    depth. The loops enclosing a line are looked up in a segment tree of the extent ends,
+    which only descends into the subtrees holding an enclosing loop: a query takes 
+    O((k + 1) log n) for k loops found, whether the extents are properly nested or not.
+    The index is built once: it is not updated when loops are added to the IR.
+    """
+
+    def __init__(self, loop_nest_struct):
+
+        loops = loop_nest_struct.get_loops()
+
+        # nesting extents: every loop extends the ones enclosing it in the same file
+        ends = {}
+        for loop_key, loop in loops.items():
+            line = int(loop.line)
+            if ends.get(loop_key, -1) < line:
+                ends[loop_key] = line
+            # tiled loops are nested in themselves and ICC's scope interchange nests loops
+            # in each other (A -> B -> A) -> the walk stops at a loop already passed by
+            visited = { id(loop) }
+            parent = loop.parent
+            while parent != None and parent.filename == loop.filename:
+                # distributed chunks, peels, etc. stand for their main loop
+                parent = loops.get(parent.key, parent)
+                if id(parent) in visited:
+                    break
+                visited.add(id(parent))
+                if ends.get(parent.key, -1) < line:
+                    ends[parent.key] = line
+                parent = parent.parent
+
+        # filename -> FileLoopIndex
+        self.files = {}
+        for loop in sorted(loops.values(), key=lambda loop: (loop.filename, int(loop.line), loop.depth)):
+            file_index = self.files.get(loop.filename, None)
+            if file_index == None:
+                file_index = FileLoopIndex()
+                self.files[loop.filename] = file_index
+            end = ends[loop.key]
+            file_index.lines.append(int(loop.line))
+            file_index.ends.append(end)
+            file_index.loops.append(loop)
+        for file_index in self.files.values():
+            file_index.build_tree()
+
+    def get_filenames(self):
+        return self.files.keys()
+
+    def get_loops_at(self, filename, line):
+
+        """ Loops beginning at the line of the file """
+
+        file_index = self.files.get(filename, None)
+        if file_index == None:
+            return []
+        first = bisect.bisect_left(file_index.lines, line)
+        last = bisect.bisect_right(file_index.lines, line, first)
+        return file_index.loops[first:last]
+
+    def get_enclosing_loops(self, filename, line):
+
+        """ Loops whose nesting extents cover the line of the file, the outermost first """
+
+        file_index = self.files.get(filename, None)
+        if file_index == None:
+            return []
+        # the loops beginning at the line or before it, whose extents reach the line
+        last = bisect.bisect_right(file_index.lines, line) - 1
+        return [file_index.loops[num] for num in file_index.get_covering(last, line)]
+
+    def get_enclosing_loop(self, filename, line):
+
+        """ The innermost loop enclosing the line of the file (None -> no loop) """
+
+        enclosing_loops = self.get_enclosing_loops(filename, line)
+        return enclosing_loops[-1] if len(enclosing_loops) != 0 else None
+
+    def get_loops_in_range(self, filename, first_line, last_line):
+
+        """ Loops covering any of the lines first_line..last_line of the file, in the order of their lines """
+
+        file_index = self.files.get(filename, None)
+        if file_index == None:
+            return []
+        first = bisect.bisect_left(file_index.lines, first_line)
+        last = bisect.bisect_right(file_index.lines, last_line, first)
+        # loops beginning before the range, but extending into it
+        range_loops = [loop for loop in self.get_enclosing_loops(filename, first_line) if int(loop.line) < first_line]
+        return range_loops + file_index.loops[first:last]
+
 if __name__ == "__main__":
     print("Done!")
 else:
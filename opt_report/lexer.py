@@ -1,19 +1,24 @@
 #! /usr/bin/python3
 
 import sys
+import queue
+import threading
+import itertools
 
-from scanner import Scanner
-from tokeniser import Tokeniser, Token, TokenClass
+from scanner import Scanner, ScannerMode
+from tokeniser import Tokeniser, Token, TokenClass, TokenArrays, read_token_stream
 
 class Lexer:
 
     """ Intel C/C++ Compiler optimization report lexical analyser  """
 
-    def __init__(self, report_filename = ""):
+    def __init__(self, report_filename = "", scanner_mode = ScannerMode.READLINE, report_range = None, token_cache_size = 0, remark_rules = None):
         self.report_filename = report_filename
-        self.scanner = Scanner(self, self.report_filename)
-        self.tokeniser = Tokeniser(self)
+        self.scanner = Scanner(self, self.report_filename, scanner_mode, report_range)
+        self.tokeniser = Tokeniser(self, False, token_cache_size, remark_rules, self.scanner.mode == ScannerMode.BYTES)
         self.token_num = 0
+        # number of report lines passed over while skipping loop reports (inlined loops)
+        self.skipped_lexeme_num = 0
 
     def get_token_num(self):
         return self.token_num
@@ -24,6 +29,276 @@ class Lexer:
             self.token_num += 1
         return token
 
+    def skip_loop_report(self):
+        
+        """
+        Skip the rest of the current loop report (with all the loop reports nested in it)
+        without tokenising it: only the lexemes possibly opening or closing a loop report
+        are tokenised, to track the nesting depth; an end of report is left to the caller
+        """
+
+        lexeme_num = self.scanner.get_lexeme_num()
+        get_next_boundary_lexeme = self.scanner.get_next_boundary_lexeme
+        tokenise_lexeme = self.tokeniser.tokenise_lexeme
+        end_of_report = self.scanner.end_of_report
+        depth = 1
+        while depth != 0:
+            lexeme = get_next_boundary_lexeme()
+            if lexeme == end_of_report:
+                break
+            token_class = tokenise_lexeme(lexeme).token_class
+            if token_class == TokenClass.LOOP_END:
+                depth -= 1
+            elif token_class == TokenClass.LOOP_BEGIN:
+                depth += 1
+        
+        # every lexeme passed over stands for a token
+        skipped_lexeme_num = self.scanner.get_lexeme_num() - lexeme_num
+        self.token_num += skipped_lexeme_num
+        self.skipped_lexeme_num += skipped_lexeme_num
+
+    def get_skipped_lexeme_num(self):
+        return self.skipped_lexeme_num
+
+    def get_token_location(self):
+        
+        """ (report line, byte offset) of the last token; None stands for an unknown offset """
+
+        return (self.scanner.get_lexeme_num(), None)
+
+    def get_line_offsets(self, line_nums):
+        return self.scanner.get_line_offsets(line_nums)
+
+    def close(self):
+        
+        """ Release the report once parsing ends (at the end of report, early or on an error) """
+
+        self.scanner.close()
+
+    def tokenise_report(self):
+        
+        """ Tokenise the whole report block by block into columnar token arrays """
+
+        token_arrays = TokenArrays(self.tokeniser.remark_rules)
+        offset = 0
+        line_num = 0
+        for block in self.scanner.read_raw_blocks():
+            line_num = self.tokeniser.tokenise_buffer(block, token_arrays, offset, line_num)
+            offset += len(block)
+        return token_arrays
+
+class ColumnarLexer(Lexer):
+
+    """ 
+    Intel C/C++ Compiler optimization report lexical analyser, tokenising the whole
+    report up front into columnar token arrays (or replaying given ones); the Parser 
+    consumes tokens rebuilt out of the arrays through the same get_next_token() interface.
+    With a token stream file given, the tokens are replayed out of the file if it was
+    dumped for the very same report, otherwise the file is (re)written after tokenising.
+    """
+
+    def __init__(self, report_filename = "", token_cache_size = 0, token_arrays = None, remark_rules = None, token_stream_filename = None):
+        super().__init__(report_filename, ScannerMode.READLINE, None, token_cache_size, remark_rules)
+        # the report is read in raw blocks (or not at all) -> the report opened for reading 
+        # lexemes by the Scanner is never used
+        self.scanner.close()
+        self.token_stream_filename = token_stream_filename
+        self.token_stream_replayed = False
+
+        if token_arrays == None and self.token_stream_filename != None:
+            report_signature = self.scanner.get_report_signature()
+            if report_signature != None:
+                token_arrays = read_token_stream(self.token_stream_filename, report_signature, self.tokeniser.remark_rules)
+                if token_arrays != None:
+                    self.token_stream_replayed = True
+                else:
+                    token_arrays = self.tokenise_report()
+                    token_arrays.write_token_stream(self.token_stream_filename, report_signature)
+
+        if token_arrays == None:
+            token_arrays = self.tokenise_report()
+        self.token_arrays = token_arrays
+
+    def get_next_token(self):
+        token = self.token_arrays.get_token(self.token_num)
+        self.token_num += 1
+        return token
+
+    def skip_loop_report(self):
+        
+        # only the token class column is looked at
+        token_class = self.token_arrays.token_class
+        token_num = len(token_class)
+        index = self.token_num
+        depth = 1
+        while depth != 0 and index < token_num:
+            if token_class[index] == TokenClass.LOOP_END.value:
+                depth -= 1
+            elif token_class[index] == TokenClass.LOOP_BEGIN.value:
+                depth += 1
+            index += 1
+        if index > self.token_num:
+            # SKIP tokens are not stored -> the lines are counted out of the report positions
+            line_num = self.token_arrays.line_num
+            self.skipped_lexeme_num += line_num[index - 1] - line_num[self.token_num - 1]
+        self.token_num = index
+
+    def get_token_location(self):
+        index = self.token_num - 1
+        if index < 0 or index >= len(self.token_arrays):
+            return (None, None)
+        return (self.token_arrays.line_num[index], self.token_arrays.offset[index])
+
+class PipelinedLexer(Lexer):
+
+    """ 
+    Intel C/C++ Compiler optimization report lexical analyser, overlapping report 
+    reading, tokenising and parsing: a reader thread and a tokeniser thread pass batches 
+    of lexemes/tokens through bounded queues; the Parser consumes tokens through the 
+    same get_next_token() interface.
+    """
+
+    # number of lexemes (tokens) passed between pipeline stages at once
+    BATCH_SIZE = 4096
+    # capacity of a queue between two pipeline stages (in batches)
+    QUEUE_SIZE = 16
+    # time (in seconds) close() waits for the stages to finish between draining their queues
+    STOP_POLL_INTERVAL = 0.01
+
+    def __init__(self, report_filename = "", scanner_mode = ScannerMode.READLINE, report_range = None, token_cache_size = 0, remark_rules = None):
+        super().__init__(report_filename, scanner_mode, report_range, token_cache_size, remark_rules)
+        
+        self.lexeme_queue = queue.Queue(self.QUEUE_SIZE)
+        self.token_queue = queue.Queue(self.QUEUE_SIZE)
+        
+        # per queue counters: a stage blocked on a full queue (put_waits) is ahead of 
+        # the next stage (backpressure), a stage blocked on an empty one (get_waits) is
+        # starved by the previous stage -> the bottleneck
+        self.pipeline_stats = {}
+        self.pipeline_stats[self.lexeme_queue] = { "batches" : 0, "put_waits" : 0, "get_waits" : 0, "max_depth" : 0 }
+        self.pipeline_stats[self.token_queue] = { "batches" : 0, "put_waits" : 0, "get_waits" : 0, "max_depth" : 0 }
+
+        self.tokens = iter(())
+        self.eor_token = None
+
+        # set by close() -> the reader and tokeniser stages stop after their current batch
+        self.stopped = threading.Event()
+        self.reader = threading.Thread(target=self.read_lexemes, name="opt-report-reader", daemon=True)
+        self.tokeniser_stage = threading.Thread(target=self.tokenise_lexemes, name="opt-report-tokeniser", daemon=True)
+        self.reader.start()
+        self.tokeniser_stage.start()
+
+    def put_batch(self, batch_queue, batch):
+        stats = self.pipeline_stats[batch_queue]
+        try:
+            batch_queue.put_nowait(batch)
+        except queue.Full:
+            stats["put_waits"] += 1
+            batch_queue.put(batch)
+        stats["batches"] += 1
+        depth = batch_queue.qsize()
+        if depth > stats["max_depth"]:
+            stats["max_depth"] = depth
+
+    def get_batch(self, batch_queue):
+        try:
+            return batch_queue.get_nowait()
+        except queue.Empty:
+            self.pipeline_stats[batch_queue]["get_waits"] += 1
+            return batch_queue.get()
+
+    def read_lexemes(self):
+        
+        # [stage 1] read the report in batches of lexemes; an empty batch marks the end of report
+        try:
+            lexemes = iter(self.scanner.get_next_lexeme, self.scanner.end_of_report)
+            while True:
+                batch = list(itertools.islice(lexemes, self.BATCH_SIZE))
+                self.put_batch(self.lexeme_queue, batch)
+                if len(batch) == 0 or self.stopped.is_set():
+                    break
+        except BaseException as error:
+            # errors are passed down the pipeline and raised in the Parser thread
+            self.put_batch(self.lexeme_queue, error)
+
+    def tokenise_lexemes(self):
+        
+        # [stage 2] tokenise batches of lexemes; the end of report turns into the EOR token
+        tokenise_lexeme = self.tokeniser.tokenise_lexeme
+        try:
+            while True:
+                batch = self.get_batch(self.lexeme_queue)
+                if isinstance(batch, BaseException):
+                    self.put_batch(self.token_queue, batch)
+                    break
+                if len(batch) == 0 or self.stopped.is_set():
+                    self.put_batch(self.token_queue, [tokenise_lexeme(self.scanner.end_of_report)])
+                    break
+                self.put_batch(self.token_queue, [tokenise_lexeme(lexeme) for lexeme in batch])
+        except BaseException as error:
+            self.put_batch(self.token_queue, error)
+
+    def get_next_token(self):
+        
+        # [stage 3] hand tokens out to the Parser one by one
+        token = next(self.tokens, None)
+        if token == None:
+            if self.eor_token != None:
+                token = self.eor_token
+            else:
+                batch = self.get_batch(self.token_queue)
+                if isinstance(batch, BaseException):
+                    raise batch
+                self.tokens = iter(batch)
+                token = next(self.tokens)
+                if token.token_class == TokenClass.EOR:
+                    self.eor_token = token
+        self.token_num += 1
+        return token
+
+    def skip_loop_report(self):
+        
+        # the lexemes have been tokenised by the tokeniser stage already
+        depth = 1
+        while depth != 0:
+            token_class = self.get_next_token().token_class
+            self.skipped_lexeme_num += 1
+            if token_class == TokenClass.LOOP_END:
+                depth -= 1
+            elif token_class == TokenClass.LOOP_BEGIN:
+                depth += 1
+            elif token_class == TokenClass.EOR:
+                break
+
+    def get_token_location(self):
+        # the reader stage is ahead of the Parser -> a token per lexeme is counted instead
+        return (self.token_num, None)
+
+    def close(self):
+        
+        # the Parser may stop before the end of report -> the stages blocked on full queues
+        # are unblocked by draining the queues (and a stage waiting for lexemes by an empty 
+        # batch) until both have finished, then the report is closed
+        self.stopped.set()
+        while self.reader.is_alive() or self.tokeniser_stage.is_alive():
+            for batch_queue in (self.lexeme_queue, self.token_queue):
+                try:
+                    while True:
+                        batch_queue.get_nowait()
+                except queue.Empty:
+                    pass
+            try:
+                self.lexeme_queue.put_nowait([])
+            except queue.Full:
+                pass
+            self.reader.join(self.STOP_POLL_INTERVAL)
+            self.tokeniser_stage.join(self.STOP_POLL_INTERVAL)
+        super().close()
+
+    def get_pipeline_stats(self):
+        return { "lexemes" : dict(self.pipeline_stats[self.lexeme_queue]),
+                 "tokens" : dict(self.pipeline_stats[self.token_queue]) }
+
 if __name__ == "__main__":
     
     print("= Intel C/C++ Compiler optimization report Lexer =")
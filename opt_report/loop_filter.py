@@ -0,0 +1,107 @@
+#! /usr/bin/python3
+
+import sys
+import fnmatch
+
+class LoopFilter:
+
+    """
+    Intel C/C++ Compiler (ICC) optimization report loop filter, pushed down into the Parser.
+    Loop nests not selected by the filter are skipped without being tokenised, loops nested
+    deeper than the maximum depth are not materialised and parsing stops as soon as the
+    limit of top-level loops has been compiled.
+    """
+
+    def __init__(self, filename_patterns=None, line_ranges=None, max_depth=None, max_loops=None):
+        # glob patterns of the source filenames of the loop nests (a pattern matches
+        # a whole filename as well as its trailing path components, e.g. "solver/*.c")
+        self.filename_patterns = filename_patterns if filename_patterns != None else []
+        # (first, last) source line ranges the outermost loop of a nest begins in
+        self.line_ranges = line_ranges if line_ranges != None else []
+        # the deepest loop materialised (top-level loops are at depth 0)
+        self.max_depth = max_depth
+        # number of top-level loops after which the rest of the report is not read
+        self.max_loops = max_loops
+
+        # filename -> matches the patterns (the same files come up over and over again)
+        self.filename_matches = {}
+
+    def match_filename(self, filename):
+
+        if len(self.filename_patterns) == 0:
+            return True
+        filename_match = self.filename_matches.get(filename, None)
+        if filename_match == None:
+            filename_match = any(fnmatch.fnmatchcase(filename, pattern) or fnmatch.fnmatchcase(filename, "*/" + pattern) for pattern in self.filename_patterns)
+            self.filename_matches[filename] = filename_match
+        return filename_match
+
+    def match_line(self, line):
+
+        if len(self.line_ranges) == 0:
+            return True
+        line = int(line)
+        return any(first <= line and line <= last for first, last in self.line_ranges)
+
+    def match(self, filename, line):
+
+        """ Is the loop nest of the outermost loop at the source filename(line) selected """
+
+        return self.match_filename(filename) and self.match_line(line)
+
+    def match_depth(self, depth):
+        return self.max_depth == None or depth <= self.max_depth
+
+    def __str__(self):
+        return "LoopFilter(files=" + str(self.filename_patterns) + ", lines=" + str(self.line_ranges) + ", depth=" + str(self.max_depth) + ", limit=" + str(self.max_loops) + ")"
+
+def parse_loop_filter(filter_spec):
+
+    """
+    LoopFilter out of a "file=<glob>,lines=<first>-<last>,depth=<n>,limit=<n>" specification
+    (file and lines may be repeated)
+    """
+
+    loop_filter = LoopFilter()
+    for item in filter_spec.split(","):
+        if item.strip() == "":
+            continue
+        if "=" not in item:
+            sys.exit("error: loop filter: incorrect filter item " + item + " (key=value expected)")
+        key, value = item.split("=", 1)
+        key = key.strip()
+        value = value.strip()
+        try:
+            if key == "file":
+                loop_filter.filename_patterns.append(value)
+            elif key == "lines":
+                first, last = value.split("-", 1) if "-" in value else (value, value)
+                loop_filter.line_ranges.append((int(first), int(last)))
+            elif key == "depth":
+                loop_filter.max_depth = int(value)
+            elif key == "limit":
+                loop_filter.max_loops = int(value)
+            else:
+                sys.exit("error: loop filter: unknown filter key " + key)
+        except ValueError:
+            sys.exit("error: loop filter: incorrect " + key + " value " + value)
+
+    return loop_filter
+
+if __name__ == "__main__":
+
+    print("= Intel C/C++ Compiler optimization report loop filter =")
+
+    if len(sys.argv) < 2:
+        sys.exit("error: loop filter: incorrect argument list => use ./loop_filter.py filter-spec [source-filename(line) ...]")
+
+    loop_filter = parse_loop_filter(sys.argv[1])
+    print(loop_filter)
+    for loop_name in sys.argv[2:]:
+        filename, line = loop_name.rstrip(")").rsplit("(", 1)
+        print(loop_name + ": " + ("selected" if loop_filter.match(filename, line) == True else "skipped"))
+
+    sys.exit()
+
+else:
+    pass
@@ -0,0 +1,84 @@
+#! /usr/bin/python3
+
+import sys
+
+import numpy as np
+
+from ir import *
+
+# classification field name -> its PackedClassification (2 bits of LoopClassificationInfo.state)
+PACKED_FIELDS = { name : field for name, field in vars(LoopClassificationInfo).items() if isinstance(field, PackedClassification) }
+
+class LoopTable:
+
+    """
+    Columnar (struct-of-arrays) view of the loops of a LoopNestingStructure.
+    Row i describes the loop keys[i]; file_id refers to the interned source filenames 
+    of the IR (FILENAMES). Loop statistics, histograms and filters are NumPy expressions 
+    over the columns instead of loops over Loop objects:
+
+        table = LoopTable(ir)
+        vector_num = table.count("vector")
+        table.select(table.is_classified("vector", Classification.NO) & (table.depth == 0))
+
+    The table is a snapshot: it is not updated when loops are added to the IR.
+    """
+
+    def __init__(self, loop_nest_struct):
+
+        loops = loop_nest_struct.get_loops()
+        self.keys = list(loops.keys())
+        loop_objs = list(loops.values())
+        loop_num = len(loop_objs)
+        row_nums = { loop_key : row_num for row_num, loop_key in enumerate(self.keys) }
+
+        self.loop_id = np.arange(loop_num, dtype=np.int32)
+        self.file_id = np.fromiter((loop.file_id for loop in loop_objs), dtype=np.int32, count=loop_num)
+        self.line = np.fromiter((int(loop.line) for loop in loop_objs), dtype=np.int32, count=loop_num)
+        self.depth = np.fromiter((loop.depth for loop in loop_objs), dtype=np.int16, count=loop_num)
+        self.loop_type = np.fromiter((loop.loop_type.value for loop in loop_objs), dtype=np.uint8, count=loop_num)
+        # row of the parent loop (-1 -> a top-level loop)
+        self.parent = np.fromiter((row_nums.get(loop.parent.key, -1) if loop.parent != None else -1 for loop in loop_objs), dtype=np.int32, count=loop_num)
+        self.inner_loop_num = np.fromiter((len(loop.inner_loops) for loop in loop_objs), dtype=np.int32, count=loop_num)
+        self.distr_chunk_num = np.fromiter((len(loop.distr_chunks) for loop in loop_objs), dtype=np.int32, count=loop_num)
+
+        # one uint8 column of Classification codes (see CLASSIFICATIONS) per classification field,
+        # unpacked out of the packed classification states at once
+        state = np.fromiter((loop.classification.state for loop in loop_objs), dtype=np.uint32, count=loop_num)
+        self.classification = {}
+        for name, field in PACKED_FIELDS.items():
+            self.classification[name] = ((state >> field.shift) & 3).astype(np.uint8)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def get_file_id(self, filename):
+        return FILE_IDS.get(filename, -1)
+
+    def is_classified(self, field, classification=Classification.YES):
+
+        """ Row mask of the loops of the classification field set to the classification """
+
+        if field not in self.classification:
+            sys.exit("error: loop table: unknown classification field " + str(field))
+        return self.classification[field] == CLASSIFICATION_CODES[classification]
+
+    def count(self, field, classification=Classification.YES):
+        return int(np.count_nonzero(self.is_classified(field, classification)))
+
+    def get_depth_histogram(self):
+
+        """ (depths, numbers of loops) of all the loop depths present """
+
+        return np.unique(self.depth, return_counts=True)
+
+    def select(self, mask):
+
+        """ Names of the loops of the rows selected by a row mask (or row numbers) """
+
+        return [FILENAMES[file_id] + "(" + str(line) + ")" for file_id, line in zip(self.file_id[mask].tolist(), self.line[mask].tolist())]
+
+if __name__ == "__main__":
+    pass
+else:
+    pass
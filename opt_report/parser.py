@@ -2,13 +2,42 @@
 
 import re
 import sys
-import logging
+import gc
 from enum import Enum, auto
 
 from ir import *
+from tracing import TraceLevel, get_tracer
 from lexer import Lexer
 from tokeniser import *
 
+# [ script performance optimization ]
+# every trace event is guarded by a plain flag test -> with tracing disabled
+# (the default) no per-token string is ever built
+PARSER_TRACE = get_tracer("parser")
+
+class ParseDiagnostic:
+
+    """ 
+    A problem found in the optimization report (or in the IR compiled out of it), which
+    the compiler has recovered from; the location is None where it is not known
+    """
+
+    def __init__(self, report_filename="", line_num=None, offset=None, expected="", got="", message=""):
+        self.report_filename = report_filename
+        self.line_num = line_num # report line (1-based)
+        self.offset = offset # byte offset of the report line
+        self.expected = expected
+        self.got = got
+        self.message = message
+
+    def __str__(self):
+        location = str(self.report_filename)
+        if self.line_num != None:
+            location += ":" + str(self.line_num)
+        if self.offset != None:
+            location += " (offset " + str(self.offset) + ")"
+        return location + ": " + self.message + " (expected " + self.expected + ", got " + self.got + ")"
+
 class Parser:
 
     """ 
@@ -16,7 +45,7 @@ class Parser:
     The main driver, responsible for interaction between all front-end components.    
     """
 
-    def __init__(self, lexer):
+    def __init__(self, lexer, recover=False, loop_filter=None):
         
         if lexer == None:
             sys.exit("error: parser: has not been properly initialized with a non-None Lexer object")
@@ -24,80 +53,198 @@ class Parser:
 
         self.loop_nest_struct = None
 
+        # recovery mode: a problem in the report is recorded as a diagnostic and the Parser
+        # resynchronises at the next balanced LOOP END (or top-level LOOP BEGIN) instead
+        # of exiting -> the result is a partial IR plus the list of diagnostics
+        self.recover = recover
+        self.diagnostics = []
+
+        # LoopFilter selecting the loop nests (and the depth of loops) to be compiled
+        self.loop_filter = loop_filter
+        # number of top-level loop reports skipped by the filter
+        self.filtered_loop_num = 0
+
+        # token class -> handler of the token inside a loop report; a handler gets the stack
+        # of the loops with open loop reports (the innermost one, receiving the tokens, is last)
+        self.token_handlers = { TokenClass.LOOP_REMARK : self.parse_loop_remark_token,
+                                TokenClass.LOOP_BEGIN : self.parse_loop_begin_token,
+                                TokenClass.LOOP_END : self.parse_loop_end_token,
+                                TokenClass.LOOP_PART_TAG : self.parse_loop_part_tag_token }
+
+        # loop partition tag type -> loop part getter (creating the part, if needed)
+        self.tag_handlers = { LoopPartTagType.DISTR_CHUNK : self.get_distr_chunk_loop,
+                              LoopPartTagType.DISTR_CHUNK_VECTOR_REMAINDER : self.get_distr_chunk_vector_remainder_loop,
+                              LoopPartTagType.DISTR_CHUNK_REMAINDER : self.get_distr_chunk_remainder_loop,
+                              LoopPartTagType.PEEL : self.get_peel_loop,
+                              LoopPartTagType.VECTOR_REMAINDER : self.get_vector_remainder_loop,
+                              LoopPartTagType.REMAINDER : self.get_remainder_loop }
+
     def skip_loop(self):
         
-        while True:
-            token = self.lexer.get_next_token()
-            if token.token_class == TokenClass.LOOP_END:
-                break
-            elif token.token_class == TokenClass.LOOP_BEGIN:
-                self.skip_loop()
-            else:
-                continue
+        # skip the whole loop report (with all the loop reports nested in it);
+        # [ script performance optimization ]
+        # the Lexer passes the lines over without tokenising them (only the nesting 
+        # depth is tracked); a truncated report: the end of report is left to the caller
+        self.lexer.skip_loop_report()
             
         return  
 
+    def report_error(self, message, expected, got):
+        
+        if self.recover == False:
+            sys.exit("error: parser: " + message)
+
+        line_num, offset = None, None
+        if got != TokenClass.EOR.name:
+            # (the end of report has no location of its own)
+            line_num, offset = self.lexer.get_token_location()
+        diagnostic = ParseDiagnostic(self.lexer.report_filename, line_num, offset, expected, got, message)
+        self.diagnostics.append(diagnostic)
+        if PARSER_TRACE.error:
+            PARSER_TRACE.event(TraceLevel.ERROR, "recovered", line_num=line_num, expected=expected, got=got)
+
+    def locate_diagnostics(self):
+        
+        # the byte offsets not known while parsing are looked up in one more pass over the report
+        line_nums = [diagnostic.line_num for diagnostic in self.diagnostics if diagnostic.offset == None and diagnostic.line_num != None]
+        if len(line_nums) == 0:
+            return
+        offsets = self.lexer.get_line_offsets(line_nums)
+        if offsets == None:
+            return
+        for diagnostic in self.diagnostics:
+            if diagnostic.offset == None:
+                diagnostic.offset = offsets.get(diagnostic.line_num, None)
+
+    def get_diagnostics(self):
+        return self.diagnostics
+
     def parse_optimization_report(self, loop_nest_struct):
         
-        logging.debug('Parser: parse_optimization_report()')
+        if PARSER_TRACE.info:
+            PARSER_TRACE.event(TraceLevel.INFO, "parse_optimization_report")
         
         self.loop_nest_struct = loop_nest_struct
+        try:
+            return self.parse_loop_report_list()
+        finally:
+            # the Parser (bound into reference cycles by its handler tables) does not keep the IR
+            # referenced -> the IR is freed by reference counting as soon as it is dropped
+            self.loop_nest_struct = None
+            self.lexer.close()
+
+    def parse_optimization_report_stream(self, loop_nest_struct):
         
-        return self.parse_loop_report_list()
+        """
+        Incrementally parse the optimization report, yielding every top-level 
+        Loop object as soon as its loop report is closed with LOOP END. A loop 
+        reopened later in the report (peels, remainders, etc.) is yielded again.
+        """
+
+        if PARSER_TRACE.info:
+            PARSER_TRACE.event(TraceLevel.INFO, "parse_optimization_report_stream")
+        
+        self.loop_nest_struct = loop_nest_struct
+        try:
+            yield from self.parse_loop_report_stream()
+        finally:
+            self.loop_nest_struct = None
+            self.lexer.close()
 
     def parse_loop_report_list(self):
         
-        logging.debug('Parser: parse_loop_report_list()')
+        # [ script performance optimization ]
+        # the IR is built in bulk and is free of reference cycles (freed by reference counting),
+        # the cyclic garbage collector would only traverse the growing IR over and over again
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for loop in self.parse_loop_report_stream():
+                pass
+        finally:
+            if gc_enabled == True:
+                gc.enable()
+       
+        return True
+
+    def parse_loop_report_stream(self):
     
+        # (recovery mode) tokens are being skipped up to the next top-level LOOP BEGIN
+        resyncing = False
+
         while True:
 
             token = self.lexer.get_next_token()
-            token_num = '[' + str(self.lexer.get_token_num()) + ']'
            
             # loop report list must start with LOOP BEGIN
             if token.token_class == TokenClass.SKIP:
-                logging.debug('Parser: => token ' + token_num + ': skip')
                 continue
             elif token.token_class == TokenClass.LOOP_BEGIN:
                 # Skip all inlined loops in our report;
                 # Loop is considered only in its original point of definition;
-                logging.debug('Parser: => token ' + token_num + ': LOOP BEGIN at ' + token.filename + '(' + str(token.line) + ')')
+                if PARSER_TRACE.debug:
+                    PARSER_TRACE.event(TraceLevel.DEBUG, "loop_begin", token_num=self.lexer.get_token_num(), 
+                                       filename=token.filename, line=token.line, inlined=token.inlined, top_level=True)
+                resyncing = False
                 if token.inlined == True:
-                    logging.debug('Parser: skipping inlined loop')
+                    self.skip_loop()
+                    continue
+                elif self.loop_filter != None and self.loop_filter.match(token.filename, token.line) == False:
+                    # [ script performance optimization ]
+                    # the loop nest is not asked for -> its report is skipped without being tokenised
+                    self.filtered_loop_num += 1
                     self.skip_loop()
                     continue
                 else:
                     # get Loop object to fill with the information parsed out of loop report
-                    loop_name = Loop.form_main_loop_name(token.filename, token.line)
+                    loop_key = Loop.form_loop_key(token.filename, token.line)
                     
                     # check if we have ever encountered this loop before (even in inner scopes of previous loops);
                     # sometimes ICC interchanges scopes of loops
-                    loop = self.loop_nest_struct.get_loop(loop_name)
+                    loop = self.loop_nest_struct.get_loop(loop_key)
                     if loop == None:
                         # haven't seen any parts of this loop yet
                         loop_type = LoopType.MAIN
                         num = 0
                         loop_depth = 0
                         
-                        loop = Loop(token.filename, token.line, loop_depth, loop_type, num)
+                        loop = Loop(token.filename, token.line, loop_depth, loop_type, num, loop_key)
                         loop.set_loop_nest_struct(self.loop_nest_struct)
                         if self.loop_nest_struct.add_loop(loop) == False:
                             sys.exit("error: ir: could not add Loop obj " + str(loop) + " " + token.filename + "(" + str(token.line) + ")" + " to LoopNestingStructure IR.loops")
                         if self.loop_nest_struct.add_top_level_loop(loop) == False:
                             sys.exit("error: ir: could not add Loop obj " + str(loop) + " " + token.filename + "(" + str(token.line) + ")" + " to LoopNestingStructure IR.top_level_loops")
-                    elif self.loop_nest_struct.get_top_level_loop(loop_name) == None:
+                    elif self.loop_nest_struct.get_top_level_loop(loop_key) == None:
                         if self.loop_nest_struct.add_top_level_loop(loop) == False:
                             sys.exit("error: ir: could not add Loop obj " + str(loop) + " " + token.filename + "(" + str(token.line) + ")" + " to LoopNestingStructure IR.top_level_loops")
                         
-                    # parse loop
-                    self.parse_loop_report(loop)
+                    # parse loop (the garbage collector is only back on while the consumer runs)
+                    gc_enabled = gc.isenabled()
+                    gc.disable()
+                    try:
+                        self.parse_loop_report(loop)
+                    finally:
+                        if gc_enabled == True:
+                            gc.enable()
+                    yield loop
+
+                    if self.loop_filter != None and self.loop_filter.max_loops != None:
+                        if len(self.loop_nest_struct.top_level_loops) >= self.loop_filter.max_loops:
+                            # the query has been answered -> the rest of the report is not read
+                            if PARSER_TRACE.info:
+                                PARSER_TRACE.event(TraceLevel.INFO, "loop_limit_reached", token_num=self.lexer.get_token_num())
+                            if len(self.diagnostics) != 0:
+                                self.locate_diagnostics()
+                            break
             elif token.token_class == TokenClass.EOR:
-                logging.debug('Parser: => token ' + token_num + ': End Of Report (EOR)')
+                if PARSER_TRACE.info:
+                    PARSER_TRACE.event(TraceLevel.INFO, "end_of_report", token_num=self.lexer.get_token_num())
+                if len(self.diagnostics) != 0:
+                    self.locate_diagnostics()
                 break
-            else:
-                sys.exit("error: parser: got " + token.token_class.name + ", when SKIP or LOOP BEGIN tokens are expected")
-       
-        return True
+            elif resyncing == False:
+                self.report_error("got " + token.token_class.name + ", when SKIP or LOOP BEGIN tokens are expected", "SKIP or LOOP BEGIN", token.token_class.name)
+                resyncing = True
 
     def parse_loop_report(self, outer_main_loop):
        
@@ -106,76 +253,109 @@ class Parser:
         if loop == None:
             sys.exit("error: parser: parse_loop_report(): called with None Loop object")
        
-        logging.debug('Parser: => parse_loop_report( loop=' + str(loop) + ', ' + loop.filename + '(' + str(loop.line) + ') )')
+        if PARSER_TRACE.debug:
+            PARSER_TRACE.event(TraceLevel.DEBUG, "parse_loop_report", filename=loop.filename, line=loop.line, depth=0)
         
-        while True:
+        # [ script performance optimization ]
+        # nested loop reports are parsed iteratively over an explicit stack of loops 
+        # (rather than through a recursive call per nesting level) and every token is 
+        # dispatched on its class through a table -> the cost of a token does not depend 
+        # on the nesting depth and no depth approaches the recursion limit
+        loop_stack = [ loop ]
+        token_handlers = self.token_handlers
+        get_next_token = self.lexer.get_next_token
+        while len(loop_stack) != 0:
             
-            token = self.lexer.get_next_token()
-            token_num = '[' + str(self.lexer.get_token_num()) + ']'
+            token = get_next_token()
 
             if token.token_class == TokenClass.SKIP:
                 # this token type is the most frequent ->
                 # -> so it is code performance wise to have it 
-                # going first in the compound if statement
-                logging.debug('Parser: => token ' + token_num + ': skip')
+                # checked before the dispatch
                 continue
-            elif token.token_class == TokenClass.LOOP_REMARK:
-                logging.debug('Parser: => token: ' + token_num + ' loop remark')
-                self.parse_loop_remark(loop, token)
+
+            token_handler = token_handlers.get(token.token_class, None)
+            if token_handler == None:
+                self.report_error("unrecognised token has been encountered", "LOOP END", token.token_class.name)
+                if token.token_class == TokenClass.EOR:
+                    # a truncated report: the loop reports parsed so far make up a partial IR
+                    break
                 continue
-            elif token.token_class == TokenClass.LOOP_BEGIN:
-                logging.debug('Parser: => token ' + token_num + ': LOOP BEGIN at ' + token.filename + '(' + str(token.line) + ')')
-                if token.inlined == True:
-                    logging.debug('Parser: skipping inlined loop')
-                    self.skip_loop()
-                else:
-                    # get inner Loop object to fill with the information parsed out of incoming loop report
-                    loop_name = Loop.form_main_loop_name(token.filename, token.line)
+            token_handler(loop_stack, token)
+        
+        return
 
-                    if loop.filename == token.filename and loop.line == token.line:
-                        loop.classification.tiled = Classification.YES
+    def parse_loop_remark_token(self, loop_stack, token):
+        self.parse_loop_remark(loop_stack[-1], token)
 
-                    inner_loop = self.loop_nest_struct.get_loop(loop_name)
-                    if inner_loop == None:
-                        # haven't seen any parts of this loop yet
-                        # inherit the type from a parent loop
-                        loop_type = loop.loop_type
-                        num = 0 
-                        loop_depth = loop.depth + 1
-                        
-                        inner_loop = Loop(token.filename, token.line, loop_depth, loop_type, num)
-                        inner_loop.set_loop_nest_struct(self.loop_nest_struct)
- 
-                        if loop_type == LoopType.MAIN or loop_type == LoopType.DISTR:
-                            if self.loop_nest_struct.add_loop(inner_loop) == False:
-                                sys.exit("error: ir: could not add Loop obj " + str(inner_loop) + " " + token.filename + "(" + str(token.line) + ")" + " to LoopNestingStructure IR.loops")
-                       
-                        if loop.add_inner_loop(inner_loop) == False:
-                            sys.exit("error: ir: could not add Loop obj " + str(inner_loop) + " " + token.filename + "(" + str(token.line) + ")" + " to Loop.inner_loops")
-                    
-                    elif loop.get_inner_loop(loop_name) == None:
-                        if loop.add_inner_loop(inner_loop) == False:
-                            sys.exit("error: ir: could not add Loop obj " + str(inner_loop) + " " + token.filename + "(" + str(token.line) + ")" + " to Loop.inner_loops")
+    def parse_loop_begin_token(self, loop_stack, token):
 
-                    # parse loop
-                    self.parse_loop_report(inner_loop)
-                continue
-            elif token.token_class == TokenClass.LOOP_END:
-                logging.debug('Parser: => token ' + token_num + ': LOOP END')
-                # loop is done with
-                break
-            elif token.token_class == TokenClass.LOOP_PART_TAG:
-                logging.debug('Parser: => token ' + token_num + ': loop partition tag')
-                old_loop = loop
-                loop = self.parse_loop_partition_tag(loop, token)
-                if loop is old_loop:
-                    if token.tag_type != LoopPartTagType.DISTR_CHUNK or token.chunk_num != 1:
-                        sys.exit("error: parser: loop partition tag is supposed to create a new loop in a loop nesting structure")
-                continue
-            else:
-                sys.exit("error: parser: unrecognised token has been encountered")
+        if PARSER_TRACE.debug:
+            PARSER_TRACE.event(TraceLevel.DEBUG, "loop_begin", token_num=self.lexer.get_token_num(), 
+                               filename=token.filename, line=token.line, inlined=token.inlined, top_level=False)
+        if token.inlined == True:
+            self.skip_loop()
+            return
+
+        loop = loop_stack[-1]
+
+        # get inner Loop object to fill with the information parsed out of incoming loop report
+        loop_key = Loop.form_loop_key(token.filename, token.line)
+
+        if loop.filename == token.filename and loop.line == token.line:
+            loop.classification.tiled = Classification.YES
+
+        if self.loop_filter != None and self.loop_filter.match_depth(loop.depth + 1) == False:
+            # loops nested deeper than asked for are not materialised
+            self.skip_loop()
+            return
+
+        inner_loop = self.loop_nest_struct.get_loop(loop_key)
+        if inner_loop == None:
+            # haven't seen any parts of this loop yet
+            # inherit the type from a parent loop
+            loop_type = loop.loop_type
+            num = 0 
+            loop_depth = loop.depth + 1
+            
+            inner_loop = Loop(token.filename, token.line, loop_depth, loop_type, num, loop_key)
+            inner_loop.set_loop_nest_struct(self.loop_nest_struct)
+
+            if loop_type == LoopType.MAIN or loop_type == LoopType.DISTR:
+                if self.loop_nest_struct.add_loop(inner_loop) == False:
+                    sys.exit("error: ir: could not add Loop obj " + str(inner_loop) + " " + token.filename + "(" + str(token.line) + ")" + " to LoopNestingStructure IR.loops")
+           
+            if loop.add_inner_loop(inner_loop) == False:
+                sys.exit("error: ir: could not add Loop obj " + str(inner_loop) + " " + token.filename + "(" + str(token.line) + ")" + " to Loop.inner_loops")
         
-        return
+        elif loop.get_inner_loop(loop_key) == None:
+            if loop.add_inner_loop(inner_loop) == False:
+                sys.exit("error: ir: could not add Loop obj " + str(inner_loop) + " " + token.filename + "(" + str(token.line) + ")" + " to Loop.inner_loops")
+
+        # the inner loop report is open -> the following tokens relate to the inner loop
+        if PARSER_TRACE.debug:
+            PARSER_TRACE.event(TraceLevel.DEBUG, "parse_loop_report", filename=inner_loop.filename, line=inner_loop.line, depth=len(loop_stack))
+        loop_stack.append(inner_loop)
+
+    def parse_loop_end_token(self, loop_stack, token):
+        if PARSER_TRACE.debug:
+            PARSER_TRACE.event(TraceLevel.DEBUG, "loop_end", token_num=self.lexer.get_token_num(), depth=len(loop_stack) - 1)
+        # loop is done with
+        loop_stack.pop()
+
+    def parse_loop_part_tag_token(self, loop_stack, token):
+        if PARSER_TRACE.debug:
+            PARSER_TRACE.event(TraceLevel.DEBUG, "loop_part_tag", token_num=self.lexer.get_token_num(), tag_type=token.tag_type.name)
+        loop = loop_stack[-1]
+        part_loop = self.parse_loop_partition_tag(loop, token)
+        if part_loop == None or (part_loop is loop and (token.tag_type != LoopPartTagType.DISTR_CHUNK or token.chunk_num != 1)):
+            self.report_error("loop partition tag is supposed to create a new loop in a loop nesting structure", "loop part", token.tag_type.name)
+            # resynchronise at the LOOP END balancing the loop report
+            self.skip_loop()
+            loop_stack.pop()
+            return
+        # all further remarks of the loop report relate to the loop part
+        loop_stack[-1] = part_loop
             
     def parse_loop_partition_tag(self, loop, token):
 
@@ -187,147 +367,97 @@ class Parser:
         if token.token_class != TokenClass.LOOP_PART_TAG:
             sys.exit("error: parser: unrecognised token has been encountered")
 
-        logging.debug('Parser: ===> parse_loop_partition_tag(loop=' + str(loop) + ')')
-        logging.debug('Parser: loop at ' + loop.filename + '(' + str(loop.line) + ')')
+        tag_handler = self.tag_handlers.get(token.tag_type, None)
+        if tag_handler == None:
+            return None
+        return tag_handler(loop, token)
 
+    def get_distr_chunk_loop(self, loop, token):
         # <DistributedChunk([0-9]+)>
-        if token.tag_type == LoopPartTagType.DISTR_CHUNK:
-            num = token.chunk_num
-            distr_chunk_loop = loop.get_distr_chunk(num)
-            if distr_chunk_loop == None:
-                if num == 1:
-                    # distributed chunk 1 is treated as the main loop
-                    distr_chunk_loop = loop
-                    loop.add_distr_chunk(distr_chunk_loop, num)
-                else:
-                    loop_type = LoopType.DISTR
-                    distr_chunk_loop = Loop(loop.filename, loop.line, loop.depth, loop_type, num)
-                    loop.add_distr_chunk(distr_chunk_loop, num)
-            return distr_chunk_loop 
+        num = token.chunk_num
+        distr_chunk_loop = loop.get_distr_chunk(num)
+        if distr_chunk_loop == None:
+            if num == 1:
+                # distributed chunk 1 is treated as the main loop
+                distr_chunk_loop = loop
+                loop.add_distr_chunk(distr_chunk_loop, num)
+            else:
+                loop_type = LoopType.DISTR
+                distr_chunk_loop = Loop(loop.filename, loop.line, loop.depth, loop_type, num, loop.key)
+                loop.add_distr_chunk(distr_chunk_loop, num)
+        return distr_chunk_loop 
 
+    def get_distr_chunk_vector_remainder_loop(self, loop, token):
         # loop distributed chunk vector remainder
-        if token.tag_type == LoopPartTagType.DISTR_CHUNK_VECTOR_REMAINDER:
-            num = token.chunk_num
-            distr_chunk_loop = loop.get_distr_chunk(num)
-            if distr_chunk_loop == None:
-                if num == 1:
-                    # distributed chunk 1 is treated as the main loop
-                    distr_chunk_loop = loop
-                    loop.add_distr_chunk(distr_chunk_loop, num)
-                else:
-                    loop_type = LoopType.DISTR
-                    distr_chunk_loop = Loop(loop.filename, loop.line, loop.depth, loop_type, num)
-                    loop.add_distr_chunk(distr_chunk_loop, num)
-            distr_chunk_remainder_loop = distr_chunk_loop.get_vector_remainder_loop()
-            if distr_chunk_remainder_loop == None:
-                loop_type = LoopType.VECTOR_REMAINDER
-                distr_chunk_remainder_loop = Loop(loop.filename, loop.line, loop.depth, loop_type, num)
-                distr_chunk_loop.add_vector_remainder_loop(distr_chunk_remainder_loop)
-            return distr_chunk_remainder_loop 
+        num = token.chunk_num
+        distr_chunk_loop = self.get_distr_chunk_loop(loop, token)
+        distr_chunk_remainder_loop = distr_chunk_loop.get_vector_remainder_loop()
+        if distr_chunk_remainder_loop == None:
+            loop_type = LoopType.VECTOR_REMAINDER
+            distr_chunk_remainder_loop = Loop(loop.filename, loop.line, loop.depth, loop_type, num, loop.key)
+            distr_chunk_loop.add_vector_remainder_loop(distr_chunk_remainder_loop)
+        return distr_chunk_remainder_loop 
  
+    def get_distr_chunk_remainder_loop(self, loop, token):
         # loop distributed chunk remainder
-        if token.tag_type == LoopPartTagType.DISTR_CHUNK_REMAINDER:
-            num = token.chunk_num
-            distr_chunk_loop = loop.get_distr_chunk(num)
-            if distr_chunk_loop == None:
-                if num == 1:
-                    # distributed chunk 1 is treated as the main loop
-                    distr_chunk_loop = loop
-                    loop.add_distr_chunk(distr_chunk_loop, num)
-                else:
-                    loop_type = LoopType.DISTR
-                    distr_chunk_loop = Loop(loop.filename, loop.line, loop.depth, loop_type, num)
-                    loop.add_distr_chunk(distr_chunk_loop, num)
-            distr_chunk_remainder_loop = distr_chunk_loop.get_remainder_loop()
-            if distr_chunk_remainder_loop == None:
-                loop_type = LoopType.REMAINDER
-                distr_chunk_remainder_loop = Loop(loop.filename, loop.line, loop.depth, loop_type, num)
-                distr_chunk_loop.add_remainder_loop(distr_chunk_remainder_loop)
-            return distr_chunk_remainder_loop 
+        num = token.chunk_num
+        distr_chunk_loop = self.get_distr_chunk_loop(loop, token)
+        distr_chunk_remainder_loop = distr_chunk_loop.get_remainder_loop()
+        if distr_chunk_remainder_loop == None:
+            loop_type = LoopType.REMAINDER
+            distr_chunk_remainder_loop = Loop(loop.filename, loop.line, loop.depth, loop_type, num, loop.key)
+            distr_chunk_loop.add_remainder_loop(distr_chunk_remainder_loop)
+        return distr_chunk_remainder_loop 
        
+    def get_peel_loop(self, loop, token):
         # loop peel
-        if token.tag_type == LoopPartTagType.PEEL:
-            peel_loop = loop.get_peel_loop()
-            if peel_loop == None:
-                loop_type = LoopType.PEEL
-                num = 0
-                peel_loop = Loop(loop.filename, loop.line, loop.depth, loop_type, num)
-                loop.add_peel_loop(peel_loop)
-            return peel_loop
+        peel_loop = loop.get_peel_loop()
+        if peel_loop == None:
+            loop_type = LoopType.PEEL
+            num = 0
+            peel_loop = Loop(loop.filename, loop.line, loop.depth, loop_type, num, loop.key)
+            loop.add_peel_loop(peel_loop)
+        return peel_loop
 
+    def get_vector_remainder_loop(self, loop, token):
         # loop vectorization remainder
-        if token.tag_type == LoopPartTagType.VECTOR_REMAINDER:
-            remainder_loop = loop.get_vector_remainder_loop()
-            if remainder_loop == None:
-                loop_type = LoopType.VECTOR_REMAINDER
-                remainder_loop = Loop(loop.filename, loop.line, loop.depth, loop_type, 0)
-                loop.add_remainder_loop(remainder_loop)
-            return remainder_loop
+        remainder_loop = loop.get_vector_remainder_loop()
+        if remainder_loop == None:
+            loop_type = LoopType.VECTOR_REMAINDER
+            remainder_loop = Loop(loop.filename, loop.line, loop.depth, loop_type, 0, loop.key)
+            loop.add_remainder_loop(remainder_loop)
+        return remainder_loop
       
+    def get_remainder_loop(self, loop, token):
         # loop remainder
-        if token.tag_type == LoopPartTagType.REMAINDER:
-            remainder_loop = loop.get_remainder_loop()
-            if remainder_loop == None:
-                loop_type = LoopType.REMAINDER
-                remainder_loop = Loop(loop.filename, loop.line, loop.depth, loop_type, 0)
-                loop.add_remainder_loop(remainder_loop)
-            return remainder_loop
-
-        return
+        remainder_loop = loop.get_remainder_loop()
+        if remainder_loop == None:
+            loop_type = LoopType.REMAINDER
+            remainder_loop = Loop(loop.filename, loop.line, loop.depth, loop_type, 0, loop.key)
+            loop.add_remainder_loop(remainder_loop)
+        return remainder_loop
 
     def parse_loop_remark(self, loop, token):
 
         if token.token_class != TokenClass.LOOP_REMARK:
             sys.exit("error: parser: token must be of LOOP REMARK type")
 
-        logging.debug('Parser: ' + token.remark_type.name)
+        if PARSER_TRACE.debug:
+            PARSER_TRACE.event(TraceLevel.DEBUG, "loop_remark", token_num=self.lexer.get_token_num(), 
+                               remark_type=token.remark_type.name, filename=loop.filename, line=loop.line)
         
-        # parallel  
-        if token.remark_type == LoopRemarkType.PARALLEL:
-            loop.classification.set_parallel(Classification.YES)
-        elif token.remark_type == LoopRemarkType.PARALLEL_POTENTIAL:
-            loop.classification.set_parallel_potential(Classification.YES)
-        elif token.remark_type == LoopRemarkType.PARALLEL_INSUFFICIENT_WORK:
-            loop.classification.set_parallel_potential(Classification.YES)
-        # vector
-        elif token.remark_type == LoopRemarkType.VECTOR:
-            loop.classification.set_vector(Classification.YES)
-        elif token.remark_type == LoopRemarkType.VECTOR_POTENTIAL:
-            loop.classification.set_vector_potential(Classification.YES)
-        # transformed to memset or memcpy
-        elif token.remark_type == LoopRemarkType.TRANSFORMED_MEMSET:
-            loop.classification.set_memset(Classification.YES)
-        elif token.remark_type == LoopRemarkType.MEMSET_GENERATED:
-            loop.classification.set_memset(Classification.YES)
-        # dependence
-        elif token.remark_type == LoopRemarkType.PARALLEL_DEPENDENCE:
-            loop.classification.set_parallel_dependence(Classification.YES)
-        elif token.remark_type == LoopRemarkType.VECTOR_DEPENDENCE:
-            loop.classification.set_vector_dependence(Classification.YES)
-        # not a parallel candidate
-        elif token.remark_type == LoopRemarkType.PARALLEL_NOT_CANDIDATE:
-            loop.classification.set_parallel_not_candidate(Classification.YES)
-        # no loop optimizations
-        elif token.remark_type == LoopRemarkType.LOOP_NO_OPTIMIZATIONS:
-            loop.classification.no_opts = Classification.YES
-        # loop fusion
-        elif token.remark_type == LoopRemarkType.LOOP_FUSION_MAIN:
-            loop.classification.fused = Classification.YES
-            loop.classification.fused_with = token.fused_list
+        # remark we are not currently interested in
+        if token.remark_type == LoopRemarkType.SKIP:
+            return
+
+        # the remark rule which recognised the remark knows how to record it
+        rule = token.remark_rule
+        for action in rule.actions:
+            action(loop.classification, token)
+        if rule.register == "fused":
             self.loop_nest_struct.add_fused_loop(loop)
-        elif token.remark_type == LoopRemarkType.LOOP_FUSION_LOST:
-            loop.classification.fused_lost = Classification.YES
-        # loop collapsing
-        elif token.remark_type == LoopRemarkType.LOOP_COLLAPSE_MAIN:
-            loop.classification.collapsed = Classification.YES
-            loop.classification.collapsed_with = token.collapsed_with
+        elif rule.register == "collapsed":
             self.loop_nest_struct.add_collapsed_loop(loop)
-        elif token.remark_type == LoopRemarkType.LOOP_COLLAPSE_ELIMINATED:
-            loop.classification.collapse_eliminated = Classification.YES
-        # loop distribution
-        elif token.remark_type == LoopRemarkType.LOOP_DISTRIBUTION_MARK:
-            loop.classification.distr = Classification.YES
-            loop.classification.distr_parts_n = token.distr_num
 
         return
 
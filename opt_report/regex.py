@@ -7,6 +7,12 @@ LOOP_BEGIN_re = re.compile("LOOP BEGIN at (.+)\(([0-9]+),([0-9]+)\)")
 LOOP_BEGIN_INLINED_re = re.compile("LOOP BEGIN at (.+)\(([0-9]+),([0-9]+)\) inlined into (.+)\(([0-9]+),([0-9]+)\)")
 LOOP_END_re = re.compile("LOOP END$")
 LOOP_NAME_re = re.compile("(.+)\(([0-9]+)\)")
+# any line possibly opening or closing a loop report, used to skip loop reports without tokenising them
+LOOP_BOUNDARY_re = re.compile("LOOP (?:BEGIN at|END)")
+# (bytes) any line possibly opening or closing a loop report, used to pre-scan the raw report
+LOOP_BOUNDARY_bre = re.compile(b"LOOP (?:BEGIN at|END)")
+# (bytes) a whole line of a raw report block containing any keyword the Tokeniser looks for
+LEXEME_OF_INTEREST_bre = re.compile(b"^[^\n]*?(?:remark #|LOOP BEGIN at |<|LOOP END)[^\n]*", re.MULTILINE)
 
 # [2] Regular expressions matching loop partitioning tags in the ICC compiler report
 LOOP_DISTR_CHUNK_re = re.compile("<Distributed chunk([0-9]+)>")
@@ -58,6 +64,26 @@ LOOP_COLLAPSE_ELIMINATED_re = re.compile("Loop eliminated in Collapsing")
 OPENMP_CONSTRUCT_RE = re.compile("OpenMP Construct at (.*)\((.*),.+")
 OPENMP_PARALLEL_RE = re.compile("OpenMP DEFINED LOOP PARALLELIZED")
 
+# [5] bytes counterparts of the expressions above, matched directly against raw (not decoded) report lines
+# any keyword the expressions below require (a substring test is much slower on bytes than on str)
+LEXEME_KEYWORD_bre = re.compile(b"remark #|LOOP BEGIN at |<|LOOP END")
+LOOP_BEGIN_bre = re.compile(LOOP_BEGIN_re.pattern.encode())
+LOOP_BEGIN_INLINED_bre = re.compile(LOOP_BEGIN_INLINED_re.pattern.encode())
+LOOP_END_bre = re.compile(LOOP_END_re.pattern.encode())
+
+LOOP_DISTR_CHUNK_bre = re.compile(LOOP_DISTR_CHUNK_re.pattern.encode())
+LOOP_PEEL_bre = re.compile(LOOP_PEEL_re.pattern.encode())
+LOOP_VECTOR_REMAINDER_bre = re.compile(LOOP_VECTOR_REMAINDER_re.pattern.encode())
+LOOP_REMAINDER_bre = re.compile(LOOP_REMAINDER_re.pattern.encode())
+LOOP_DISTR_CHUNK_VECTOR_REMAINDER_bre = re.compile(LOOP_DISTR_CHUNK_VECTOR_REMAINDER_re.pattern.encode())
+LOOP_DISTR_CHUNK_REMAINDER_bre = re.compile(LOOP_DISTR_CHUNK_REMAINDER_re.pattern.encode())
+
+LOOP_REMARK_bre = re.compile(LOOP_REMARK_re.pattern.encode())
+
+LOOP_DISTR_bre = re.compile(LOOP_DISTR_re.pattern.encode())
+LOOP_FUSED_bre = re.compile(LOOP_FUSED_re.pattern.encode())
+LOOP_PARTIAL_bre = re.compile(LOOP_PARTIAL_re.pattern.encode())
+
 if __name__ == "__main__":
     pass
 else:
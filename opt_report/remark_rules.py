@@ -0,0 +1,354 @@
+#! /usr/bin/python3
+
+import re
+import sys
+import json
+import hashlib
+
+from regex import *
+
+from ir import Classification, LoopClassificationInfo
+
+# Intel C/C++ Compiler (ICC) loop remark rules: every rule describes a kind of remark message
+# the Tokeniser recognises and the Parser records into the loop classification.
+#   name         - remark type name (a LoopRemarkType member, or a new remark kind)
+#   remark_nums  - ICC remark numbers the message is expected under (the message is also
+#                  recognised under an unknown remark number)
+#   pattern      - regular expression searched for in the remark message (no named groups)
+#   fields       - token field -> [ pattern group number, converter ]
+#   loop_type    - the message also tells DISTRIBUTED/FUSED/PARTIAL loops apart
+#   set          - classification fields set to YES (through its set_* method, if any)
+#   copy         - classification field -> token field copied into it
+#   register     - "fused"/"collapsed": the loop is registered within the loop nesting structure
+#   track        - the remark kind is recorded in the classification remarks list
+# the order of the rules approximately corresponds to the frequency of their encounter
+# in the ICC report; an earlier rule wins if several of them match the remark message
+DEFAULT_REMARK_RULES = [
+    # [3.1] loop parallelizability status
+    { "name" : "PARALLEL", "remark_nums" : [ "17109" ], "pattern" : LOOP_PARALLEL_re.pattern,
+      "loop_type" : True, "set" : [ "parallel" ] },
+    # [3.2] vectorized loops
+    { "name" : "VECTOR", "remark_nums" : [ "15300", "15301", "15302", "15303", "15304" ], "pattern" : LOOP_VECTOR_re.pattern,
+      "loop_type" : True, "set" : [ "vector" ] },
+    { "name" : "PARALLEL_POTENTIAL", "pattern" : LOOP_PARALLEL_POTENTIAL_re.pattern,
+      "set" : [ "parallel_potential" ] },
+    { "name" : "PARALLEL_INSUFFICIENT_WORK", "remark_nums" : [ "17108" ], "pattern" : LOOP_PARALLEL_INSUFFICIENT_WORK_re.pattern,
+      "set" : [ "parallel_potential" ] },
+    { "name" : "VECTOR_POTENTIAL", "remark_nums" : [ "15542" ], "pattern" : LOOP_VECTOR_POTENTIAL_re.pattern,
+      "set" : [ "vector_potential" ] },
+    # [3.3] simplified/eliminated loops
+    { "name" : "TRANSFORMED_MEMSET", "remark_nums" : [ "15398" ], "pattern" : LOOP_TRANSFORMED_MEMSET_re.pattern,
+      "set" : [ "memset" ] },
+    { "name" : "MEMSET_GENERATED", "remark_nums" : [ "25408" ], "pattern" : LOOP_MEMSET_GENERATED_re.pattern,
+      "set" : [ "memset" ] },
+    # [3.4] dependencies present in loops
+    { "name" : "PARALLEL_DEPENDENCE", "remark_nums" : [ "17104" ], "pattern" : LOOP_PARALLEL_DEPENCENCE_re.pattern,
+      "set" : [ "parallel_dependence" ] },
+    { "name" : "PARALLEL_NOT_CANDIDATE", "remark_nums" : [ "17102" ], "pattern" : LOOP_PARALLEL_NOT_CANDIDATE_re.pattern,
+      "set" : [ "parallel_not_candidate" ] },
+    { "name" : "VECTOR_DEPENDENCE", "remark_nums" : [ "15344" ], "pattern" : LOOP_VECTOR_DEPENDENCE_re.pattern,
+      "set" : [ "vector_dependence" ] },
+    # [3.5] applied loop transformations
+    { "name" : "LOOP_FUSION_MAIN", "remark_nums" : [ "25045", "25046" ], "pattern" : LOOP_FUSION_MAIN_re.pattern,
+      "fields" : { "fused_list" : [ 1, "int_list" ] },
+      "set" : [ "fused" ], "copy" : { "fused_with" : "fused_list" }, "register" : "fused" },
+    { "name" : "LOOP_FUSION_LOST", "remark_nums" : [ "25045", "25046" ], "pattern" : LOOP_FUSION_LOST_re.pattern,
+      "set" : [ "fused_lost" ] },
+    { "name" : "LOOP_COLLAPSE_MAIN", "pattern" : LOOP_COLLAPSE_MAIN_re.pattern,
+      "fields" : { "collapsed_with" : [ 1, "int" ] },
+      "set" : [ "collapsed" ], "copy" : { "collapsed_with" : "collapsed_with" }, "register" : "collapsed" },
+    { "name" : "LOOP_COLLAPSE_ELIMINATED", "pattern" : LOOP_COLLAPSE_ELIMINATED_re.pattern,
+      "set" : [ "collapse_eliminated" ] },
+    { "name" : "LOOP_DISTRIBUTION_MARK", "remark_nums" : [ "25426" ], "pattern" : LOOP_DISTRIBUTION_MARK_re.pattern,
+      "fields" : { "distr_num" : [ 1, "str" ] },
+      "set" : [ "distr" ], "copy" : { "distr_parts_n" : "distr_num" } },
+    { "name" : "LOOP_NO_OPTIMIZATIONS", "remark_nums" : [ "25460" ], "pattern" : LOOP_NO_OPTIMIZATIONS_re.pattern,
+      "set" : [ "no_opts" ] },
+]
+
+# frequent remarks carrying no loop classification information (skipped by their number alone)
+DEFAULT_SKIP_REMARK_NUMS = [
+    "15305", # vectorization support: vector length
+    "15309", # vectorization support: normalized vectorization overhead
+    "15355", # vectorization support: ... is double type reduction
+    "15381", # vectorization support: unaligned access used inside loop body
+    "15388", # vectorization support: reference ... has aligned access
+    "15389", # vectorization support: reference ... has unaligned access
+    "15399", # vectorization support: unroll factor set to
+    "15449", # unmasked aligned unit stride stores
+    "15450", # unmasked unaligned unit stride loads
+    "15451", # unmasked unaligned unit stride stores
+    "15475", # --- begin vector cost summary ---
+    "15476", # scalar cost
+    "15477", # vector cost
+    "15478", # estimated potential speedup
+    "15488", # --- end vector cost summary ---
+    "15346", # vector dependence: assumed ... dependence between
+    "17106", # parallel dependence: assumed ... dependence between
+    "25015", # Estimate of max trip count of loop
+    "25436", # completely unrolled by
+    "25438", # unrolled without remainder by
+    "25439", # unrolled with remainder by
+    "25456", # Number of Array Refs Scalar Replaced In Loop
+    "25457", # Number of partial sums replaced
+]
+
+# token fields a remark rule can fill in out of the remark message
+REMARK_TOKEN_FIELDS = [ "fused_list", "collapsed_with", "distr_num" ]
+
+# converters of captured remark message parts into token field values
+REMARK_FIELD_CONVERTERS = {
+    "str" : str,
+    "int" : int,
+    "int_list" : lambda s: [int(n) for n in s.split() if n.isdigit()],
+}
+
+def rule_error(rule_name, error):
+    sys.exit("error: remark rules: rule " + str(rule_name) + ": " + error)
+
+class RemarkRule:
+
+    """ Intel C/C++ Compiler (ICC) loop remark rule """
+
+    def __init__(self, rule_id, spec):
+
+        self.rule_id = rule_id
+        self.spec = spec
+        self.name = spec.get("name", None)
+        if not isinstance(self.name, str) or self.name == "":
+            rule_error(self.name, "no remark type name given")
+        self.remark_nums = [str(remark_num) for remark_num in spec.get("remark_nums", [])]
+
+        self.pattern = spec.get("pattern", None)
+        if not isinstance(self.pattern, str):
+            rule_error(self.name, "no pattern given")
+        try:
+            pattern_re = re.compile(self.pattern)
+        except re.error as error:
+            rule_error(self.name, "incorrect pattern (" + str(error) + ")")
+        # the pattern becomes a part of a combined expression -> its groups are only known by number
+        if len(pattern_re.groupindex) != 0:
+            rule_error(self.name, "named groups are not supported in patterns, use group numbers")
+        self.group_num = pattern_re.groups
+
+        self.fields = []
+        for field, (group, converter) in spec.get("fields", {}).items():
+            if field not in REMARK_TOKEN_FIELDS:
+                rule_error(self.name, "unknown token field " + str(field))
+            if group < 1 or group > self.group_num:
+                rule_error(self.name, "no group " + str(group) + " in the pattern")
+            if converter not in REMARK_FIELD_CONVERTERS:
+                rule_error(self.name, "unknown field converter " + str(converter))
+            self.fields.append((field, group, REMARK_FIELD_CONVERTERS[converter]))
+        self.loop_type = spec.get("loop_type", False)
+
+        # Parser actions: bound once into plain functions of (classification, token)
+        classification_fields = LoopClassificationInfo.FIELDS
+        self.actions = []
+        for field in spec.get("set", []):
+            if field not in classification_fields:
+                rule_error(self.name, "unknown classification field " + str(field))
+            setter = getattr(LoopClassificationInfo, "set_" + field, None)
+            if setter != None:
+                self.actions.append(lambda classification, token, setter=setter: setter(classification, Classification.YES))
+            else:
+                self.actions.append(lambda classification, token, field=field: setattr(classification, field, Classification.YES))
+        for field, token_field in spec.get("copy", {}).items():
+            if field not in classification_fields:
+                rule_error(self.name, "unknown classification field " + str(field))
+            self.actions.append(lambda classification, token, field=field, token_field=token_field:
+                                setattr(classification, field, getattr(token, token_field)))
+
+        self.register = spec.get("register", None)
+        if self.register not in [None, "fused", "collapsed"]:
+            rule_error(self.name, "unknown loop registration " + str(self.register))
+
+        # a new remark kind without any effect on the classification is at least tracked
+        self.track = spec.get("track", len(self.actions) == 0 and self.register == None)
+        if self.track == True:
+            self.actions.append(lambda classification, token, name=self.name: classification.add_remark(name))
+
+class RemarkMatcher:
+
+    """
+    A set of remark rules compiled into one alternation of their patterns: a single search
+    of the combined expression finds the rule matching the remark message and the rule is 
+    dispatched on by the name of its group. The rules keep the priority of their order, 
+    whatever the positions of their matches in the message: the first rule matching 
+    anywhere in the message wins, just as if the rules were searched for one by one.
+    """
+
+    def __init__(self, rules):
+
+        self.rules = rules
+        # group name -> (rule, its fields, expression of the preceding rules); the raw
+        # expressions matched against raw (not decoded) remark messages are dispatched on in bytes_dispatch
+        self.dispatch = {}
+        self.bytes_dispatch = {}
+        alternatives = []
+        group = 0
+        for rule in rules:
+            group_name = "r" + str(rule.rule_id)
+            preceding_re = None
+            preceding_bre = None
+            if len(alternatives) != 0:
+                preceding_pattern = self.combine_patterns(rules[:len(alternatives)], alternatives)
+                preceding_re = re.compile(preceding_pattern)
+                preceding_bre = re.compile(preceding_pattern.encode())
+            alternatives.append("(?P<" + group_name + ">" + rule.pattern + ")")
+            fields = tuple((field, group + 1 + field_group, converter) for field, field_group, converter in rule.fields)
+            self.dispatch[group_name] = (rule, fields, preceding_re)
+            self.bytes_dispatch[group_name] = (rule, fields, preceding_bre)
+            group += 1 + rule.group_num
+        combined_pattern = self.combine_patterns(rules, alternatives)
+        self.combined_re = re.compile(combined_pattern)
+        self.combined_bre = re.compile(combined_pattern.encode())
+
+    def combine_patterns(self, rules, alternatives):
+        
+        combined_pattern = "|".join(alternatives)
+        
+        # [ script performance optimization ]
+        # a leading lookahead over the first characters of all the patterns lets the regular
+        # expression engine skip straight to the positions where any rule can start matching
+        # (it does not for a plain alternation, which is then slower than separate searches)
+        first_chars = set()
+        for rule in rules:
+            if rule.pattern[:1].isalnum() or rule.pattern[:1] == " ":
+                first_chars.add(rule.pattern[0])
+            else:
+                first_chars = None
+                break
+        if first_chars != None:
+            combined_pattern = "(?=[" + "".join(sorted(first_chars)) + "])(?:" + combined_pattern + ")"
+        return combined_pattern
+
+    def match(self, remark):
+
+        """ The rule matching the remark message and its field values (or None) """
+
+        re_match = self.combined_re.search(remark)
+        if re_match == None:
+            return None
+        rule, fields, preceding_re = self.dispatch[re_match.lastgroup]
+        # the combined search finds the earliest match (of the first rule matching at its position);
+        # a preceding rule can then only match further in the message -> the rules preceding
+        # the last found one are searched for past its match, until none of them matches
+        while preceding_re != None:
+            preceding_match = preceding_re.search(remark, re_match.start() + 1)
+            if preceding_match == None:
+                break
+            re_match = preceding_match
+            rule, fields, preceding_re = self.dispatch[re_match.lastgroup]
+        if len(fields) == 0:
+            return rule, fields
+        return rule, [(field, converter(re_match.group(group))) for field, group, converter in fields]
+
+    def match_bytes(self, remark):
+
+        """ The rule matching the raw remark message and its field values (or None) """
+
+        re_match = self.combined_bre.search(remark)
+        if re_match == None:
+            return None
+        rule, fields, preceding_bre = self.bytes_dispatch[re_match.lastgroup]
+        while preceding_bre != None:
+            preceding_match = preceding_bre.search(remark, re_match.start() + 1)
+            if preceding_match == None:
+                break
+            re_match = preceding_match
+            rule, fields, preceding_bre = self.bytes_dispatch[re_match.lastgroup]
+        if len(fields) == 0:
+            return rule, fields
+        # only the captured parts of the message are decoded
+        return rule, [(field, converter(str(re_match.group(group), "utf-8", "replace"))) for field, group, converter in fields]
+
+class RemarkRuleRegistry:
+
+    """ Intel C/C++ Compiler (ICC) loop remark rules compiled into matchers """
+
+    def __init__(self, rule_specs=DEFAULT_REMARK_RULES, skip_remark_nums=DEFAULT_SKIP_REMARK_NUMS):
+
+        self.rules = []
+        for spec in rule_specs:
+            rule = RemarkRule(len(self.rules), spec)
+            self.rules.append(rule)
+        # a remark number some rule expects is never skipped
+        rule_remark_nums = set(remark_num for rule in self.rules for remark_num in rule.remark_nums)
+        self.skip_remark_nums = set(str(remark_num) for remark_num in skip_remark_nums) - rule_remark_nums
+
+        # all the rules: a remark under an unknown number (or with a message
+        # unexpected for the number) is matched against every rule
+        self.matcher = RemarkMatcher(self.rules)
+
+        # remark number -> matcher of the rules expected under the number; None marks a remark to skip
+        self.remark_num_matchers = {}
+        for remark_num in self.skip_remark_nums:
+            self.remark_num_matchers[remark_num] = None
+        for remark_num in rule_remark_nums:
+            self.remark_num_matchers[remark_num] = RemarkMatcher([rule for rule in self.rules if remark_num in rule.remark_nums])
+
+    def get_fingerprint(self):
+        
+        """ Digest of the rules, identifying the meaning of remark type codes and rule ids """
+
+        rules_repr = repr([ sorted(rule.spec.items()) for rule in self.rules ] + sorted(self.skip_remark_nums))
+        return hashlib.sha1(rules_repr.encode()).digest()
+
+    def get_rule(self, rule_name):
+        for rule in self.rules:
+            if rule.name == rule_name:
+                return rule
+        return None
+
+def load_remark_rules(rules_filename, extend_defaults=True):
+
+    """
+    Build remark rules out of a JSON configuration file: { "rules" : [ rule, ... ],
+    "skip_remark_nums" : [ remark number, ... ] }; a rule named after a default rule replaces it.
+    """
+
+    try:
+        with open(rules_filename, "r") as rules_file:
+            config = json.load(rules_file)
+    except (OSError, ValueError) as error:
+        sys.exit("error: remark rules: could not load remark rules file " + str(rules_filename) + " (" + str(error) + ")")
+
+    rule_specs = []
+    skip_remark_nums = []
+    if extend_defaults == True:
+        rule_specs = list(DEFAULT_REMARK_RULES)
+        skip_remark_nums = list(DEFAULT_SKIP_REMARK_NUMS)
+
+    for spec in config.get("rules", []):
+        replaced = False
+        for i in range(len(rule_specs)):
+            if rule_specs[i]["name"] == spec.get("name", None):
+                rule_specs[i] = spec
+                replaced = True
+        if replaced == False:
+            rule_specs.append(spec)
+    skip_remark_nums += config.get("skip_remark_nums", [])
+
+    return RemarkRuleRegistry(rule_specs, skip_remark_nums)
+
+if __name__ == "__main__":
+
+    print("= Intel C/C++ Compiler optimization report remark rules =")
+
+    if len(sys.argv) != 1 and len(sys.argv) != 2:
+        sys.exit("error: remark rules: incorrect argument list => use ./remark_rules.py [remark-rules-file]")
+
+    if len(sys.argv) == 2:
+        registry = load_remark_rules(sys.argv[1])
+    else:
+        registry = RemarkRuleRegistry()
+
+    for rule in registry.rules:
+        print(str(rule.rule_id) + ": " + rule.name + " " + str(rule.remark_nums) + " " + rule.pattern)
+    print("skipped remark numbers: " + str(sorted(registry.skip_remark_nums)))
+    print("combined expression: " + registry.matcher.combined_re.pattern)
+    sys.exit()
+
+else:
+    pass
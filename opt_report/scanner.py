@@ -3,6 +3,28 @@
 import re
 import sys
 import os
+import io
+import time
+import mmap
+import gzip
+import lzma
+import bz2
+import hashlib
+import operator
+import functools
+import itertools
+from enum import Enum, auto
+
+from regex import LOOP_BOUNDARY_re, LOOP_BOUNDARY_bre
+
+class ScannerMode(Enum):
+
+    """ Intel C/C++ Compiler (ICC) optimization report Scanner input mode """
+
+    READLINE = auto() # line by line reading through a text-mode file object (works for pipes)
+    MMAP = auto() # memory-mapped (or, if compressed, block-decompressed) report file, lexemes are cut out of large decoded blocks
+    FOLLOW = auto() # line by line reading of a report file that is still being written (tail -f style)
+    BYTES = auto() # raw (not decoded) lexemes cut out of large blocks of a mapped/compressed/piped report
 
 class Scanner:
 
@@ -10,19 +32,135 @@ class Scanner:
     Intel C/C++ Compiler (ICC) optimization report Scanner.
     """
     
-    def __init__(self, lexer=None, report_filename=""):
+    # size of a report block decoded (MMAP mode) or decompressed (compressed reports) at once
+    BLOCK_SIZE = 4 * 1024 * 1024
+    # compressed report file extensions and the corresponding binary stream openers
+    COMPRESSED_REPORT_OPENERS = { ".gz" : gzip.open, ".xz" : lzma.open, ".bz2" : bz2.open }
+    # report filename standing for the standard input stream
+    STDIN_REPORT_FILENAME = "-"
+    # FOLLOW mode: delay between checks for new report data and the time (in seconds) 
+    # without any new data after which the report is treated as complete
+    FOLLOW_POLL_INTERVAL = 0.25
+    FOLLOW_IDLE_TIMEOUT = 10.0
+    # line boundaries recognised by str.splitlines(), but not by a text-mode readline()
+    EXTRA_LINE_SEPARATORS = ("\v", "\f", "\x1c", "\x1d", "\x1e", "\x85", "\u2028", "\u2029")
+
+    def __init__(self, lexer=None, report_filename="", mode=ScannerMode.READLINE, report_range=None):
         
         self.lexer = lexer # lexer reference
         self.report_filename = report_filename
+        self.mode = mode
+        # (start, end) byte offsets of the only part of the report to scan
+        self.report_range = report_range
         
         self.lexeme_num = 0
+        # (MMAP, BYTES modes) the report mapping and the generator of the blocks of lexemes
+        self.report_map = None
+        self.blocks = None
+        # lexeme marking the end of the report
+        self.end_of_report = b"" if self.mode == ScannerMode.BYTES else ""
+
+        if self.report_filename == self.STDIN_REPORT_FILENAME:
+            self.report_opener = None
+            if self.mode == ScannerMode.BYTES:
+                self.report = sys.stdin.buffer
+                self.start_block_lexemes(self.read_byte_blocks(self.read_stream_chunks(self.report)))
+                return
+            # a pipe can only be read line by line, until its writer closes it
+            self.mode = ScannerMode.READLINE
+            self.report = sys.stdin
+            return
 
         if not os.path.exists(self.report_filename):
             error_str = "error: "
             error_str += "scanner: "
             error_str += "could not find provided Intel C/C++ Compiler optimization report file (" + str(self.report_filename) + ")"
             sys.exit(error_str)
-        self.report = open(self.report_filename, "r")
+
+        # compressed reports are decompressed on the fly, without unpacking them anywhere
+        report_ext = os.path.splitext(self.report_filename)[1].lower()
+        self.report_opener = self.COMPRESSED_REPORT_OPENERS.get(report_ext, None)
+
+        if self.mode == ScannerMode.FOLLOW:
+            if self.report_opener != None:
+                sys.exit("error: scanner: a compressed report file (" + str(self.report_filename) + ") can not be followed")
+            self.report = open(self.report_filename, "r")
+            self.get_next_lexeme = self.get_next_followed_lexeme
+            self.get_next_boundary_lexeme = self.get_next_followed_boundary_lexeme
+            return
+
+        if self.report_range != None:
+            # only a mapped plain report file can be scanned starting at an arbitrary byte offset
+            if self.report_opener != None or not os.path.isfile(self.report_filename):
+                sys.exit("error: scanner: a byte range can only be scanned out of a plain report file (" + str(self.report_filename) + ")")
+            if self.mode != ScannerMode.BYTES:
+                self.mode = ScannerMode.MMAP
+        elif self.mode == ScannerMode.MMAP:
+            # empty files and non-regular files (pipes, FIFOs) can not be mapped
+            if not os.path.isfile(self.report_filename) or os.path.getsize(self.report_filename) == 0:
+                self.mode = ScannerMode.READLINE
+
+        if self.mode == ScannerMode.MMAP or self.mode == ScannerMode.BYTES:
+            if self.report_opener != None:
+                # a compressed report can not be mapped -> the same block splitting 
+                # is applied to the stream of decompressed blocks instead
+                self.report = self.report_opener(self.report_filename, "rb")
+                chunks = self.read_stream_chunks(self.report)
+            elif not os.path.isfile(self.report_filename) or os.path.getsize(self.report_filename) == 0:
+                # (BYTES mode) a FIFO or an empty file is read as a stream of blocks
+                self.report = open(self.report_filename, "rb")
+                chunks = self.read_stream_chunks(self.report)
+            else:
+                self.report = open(self.report_filename, "rb")
+                self.report_map = mmap.mmap(self.report.fileno(), 0, access=mmap.ACCESS_READ)
+                chunks = self.read_mapped_chunks()
+            if self.mode == ScannerMode.MMAP:
+                self.start_block_lexemes(self.read_blocks(chunks))
+            else:
+                self.start_block_lexemes(self.read_byte_blocks(chunks))
+        elif self.report_opener != None:
+            decompressed = io.BufferedReader(self.report_opener(self.report_filename, "rb"), self.BLOCK_SIZE)
+            self.report = io.TextIOWrapper(decompressed)
+        else:
+            self.report = open(self.report_filename, "r")
+
+    def is_mappable(report_filename):
+        
+        """ Whether the report can be mapped (and scanned by byte ranges): a non-empty plain regular file """
+
+        if report_filename == Scanner.STDIN_REPORT_FILENAME:
+            return False
+        if os.path.splitext(report_filename)[1].lower() in Scanner.COMPRESSED_REPORT_OPENERS:
+            return False
+        return os.path.isfile(report_filename) and os.path.getsize(report_filename) != 0
+
+    def start_block_lexemes(self, blocks):
+        
+        self.blocks = blocks
+        # lexemes of the currently processed block of the report
+        self.block_lexemes = iter(())
+        self.block_lexeme_num = 0
+        # lexemes are handed out straight by the C-level iterator machinery, without
+        # a Python-level call per line; lexeme_num accounts for the fully consumed blocks only
+        lexemes = itertools.chain.from_iterable(blocks)
+        self.get_next_lexeme = functools.partial(next, lexemes, self.end_of_report)
+        # the lexemes passed over by get_next_boundary_lexeme() are filtered out of the very
+        # same iterator at the C level too (filter() does not read ahead)
+        loop_boundary_re = LOOP_BOUNDARY_bre if self.mode == ScannerMode.BYTES else LOOP_BOUNDARY_re
+        self.get_next_boundary_lexeme = functools.partial(next, filter(loop_boundary_re.search, lexemes), self.end_of_report)
+
+    def close(self):
+        
+        """ Close the report, even if its end has not been reached (e.g. the Parser stopped early) """
+
+        if self.report == sys.stdin or self.report == sys.stdin.buffer:
+            return
+        if self.blocks != None:
+            # the suspended block generators hold views of the mapping -> they are finished first
+            self.blocks.close()
+        if self.report_map != None:
+            self.report_map.close()
+        self.report.close()
 
     def get_next_lexeme(self):
         lexeme = self.report.readline()
@@ -30,7 +168,219 @@ class Scanner:
             self.lexeme_num += 1
         return lexeme 
     
+    def get_next_boundary_lexeme(self):
+        
+        """ 
+        The next lexeme possibly opening or closing a loop report (or the end of report); 
+        all the lexemes in between are passed over (but counted) without being handed out
+        """
+
+        search = LOOP_BOUNDARY_re.search
+        for lexeme in iter(self.report.readline, ""):
+            self.lexeme_num += 1
+            if search(lexeme) != None:
+                return lexeme
+        return ""
+
+    def get_next_followed_boundary_lexeme(self):
+        lexeme = self.get_next_followed_lexeme()
+        while lexeme != "" and LOOP_BOUNDARY_re.search(lexeme) == None:
+            lexeme = self.get_next_followed_lexeme()
+        return lexeme
+
+    def get_next_followed_lexeme(self):
+        lexeme = self.report.readline()
+        idle_time = 0.0
+        # wait for the report writer to append a new line (or finish the current one);
+        # the writer is idle only as long as no data at all is appended
+        while lexeme == "" or lexeme[-1] != "\n":
+            if idle_time >= self.FOLLOW_IDLE_TIMEOUT:
+                break
+            time.sleep(self.FOLLOW_POLL_INTERVAL)
+            data = self.report.readline()
+            if data != "":
+                lexeme += data
+                idle_time = 0.0
+            else:
+                idle_time += self.FOLLOW_POLL_INTERVAL
+        if lexeme != "":
+            self.lexeme_num += 1
+        return lexeme
+
+    def read_mapped_chunks(self):
+        
+        # cut the mapped report into chunks at line boundaries, so that no lexeme
+        # spans two chunks; a newline byte never occurs inside a multi-byte UTF-8 sequence
+        start = 0
+        size = len(self.report_map)
+        if self.report_range != None:
+            start, size = self.report_range
+        while start < size:
+            end = start + self.BLOCK_SIZE
+            if end < size:
+                newline = self.report_map.rfind(b"\n", start, end)
+                if newline != -1:
+                    end = newline + 1
+                else:
+                    # a single lexeme is longer than a block
+                    newline = self.report_map.find(b"\n", end)
+                    end = newline + 1 if newline != -1 else size
+            else:
+                end = size
+
+            # hand out the mapping itself without an intermediate bytes copy
+            view = memoryview(self.report_map)[start:end]
+            yield view
+            view.release()
+            start = end
+
+        self.report_map.close()
+
+    def read_stream_chunks(self, stream):
+        
+        # read (decompress) the report in large blocks and cut them at line 
+        # boundaries, carrying an incomplete last line over into the next chunk
+        tail = b""
+        while True:
+            data = stream.read(self.BLOCK_SIZE)
+            if not data:
+                break
+            newline = data.rfind(b"\n")
+            if newline == -1:
+                tail += data
+                continue
+            yield tail + data[:newline + 1]
+            tail = data[newline + 1:]
+        if tail:
+            yield tail
+
+    def read_raw_blocks(self):
+        
+        """
+        Read the whole report as a sequence of raw (not decoded) line-aligned blocks
+        of bytes, independently of the lexeme by lexeme interface.
+        """
+
+        if self.report_filename == self.STDIN_REPORT_FILENAME:
+            for chunk in self.read_stream_chunks(sys.stdin.buffer):
+                yield chunk
+            return
+
+        if self.report_opener != None:
+            stream = self.report_opener(self.report_filename, "rb")
+        else:
+            stream = open(self.report_filename, "rb")
+        with stream:
+            for chunk in self.read_stream_chunks(stream):
+                yield chunk
+
+    def get_line_offsets(self, line_nums):
+        
+        """
+        Byte offsets of the starts of the given (1-based) report lines, found by reading 
+        the report once more; lines of a scanned byte range are numbered from the start 
+        of the range. None if the report can not be read again (the standard input).
+        """
+
+        if self.report_filename == self.STDIN_REPORT_FILENAME:
+            return None
+
+        base_offset = 0 if self.report_range == None else self.report_range[0]
+        targets = sorted(set(line_nums))
+        target_index = 0
+        offsets = {}
+        line_num = 1 # number of the report line starting at the position
+        block_start = 0
+        for block in self.read_raw_blocks():
+            block_end = block_start + len(block)
+            if block_end <= base_offset:
+                block_start = block_end
+                continue
+            position = max(base_offset - block_start, 0)
+            while target_index < len(targets):
+                target = targets[target_index]
+                if block.count(b"\n", position) < target - line_num:
+                    # the line starts in one of the following blocks
+                    line_num += block.count(b"\n", position)
+                    break
+                while line_num < target:
+                    position = block.index(b"\n", position) + 1
+                    line_num += 1
+                offsets[target] = block_start + position
+                target_index += 1
+            if target_index == len(targets):
+                break
+            block_start = block_end
+
+        return offsets
+
+    def get_report_signature(self):
+        
+        """
+        The (size, modification time, content hash) signature of the report file,
+        None if the report is not a regular file (e.g. the standard input)
+        """
+
+        if self.report_filename == self.STDIN_REPORT_FILENAME or not os.path.isfile(self.report_filename):
+            return None
+        report_stat = os.stat(self.report_filename)
+        report_hash = hashlib.sha1()
+        with open(self.report_filename, "rb") as report:
+            for block in iter(functools.partial(report.read, self.BLOCK_SIZE), b""):
+                report_hash.update(block)
+        return (report_stat.st_size, report_stat.st_mtime_ns, report_hash.digest())
+
+    def read_blocks(self, chunks):
+        
+        for chunk in chunks:
+            block = str(chunk, "utf-8")
+            # keep the universal newlines semantics of the text-mode READLINE path
+            if "\r" in block:
+                block = block.replace("\r\n", "\n").replace("\r", "\n")
+            
+            # split the whole block in one go; str.splitlines() also breaks at a few rare
+            # separators readline() does not, so such blocks are split at newlines only
+            if any(separator in block for separator in self.EXTRA_LINE_SEPARATORS):
+                lexemes = [lexeme + "\n" for lexeme in block.split("\n")]
+                if lexemes[-1] == "\n":
+                    lexemes.pop()
+                else:
+                    lexemes[-1] = lexemes[-1][:-1]
+            else:
+                lexemes = block.splitlines(True)
+
+            self.block_lexemes = iter(lexemes)
+            self.block_lexeme_num = len(lexemes)
+            yield self.block_lexemes
+            self.lexeme_num += self.block_lexeme_num
+
+        self.block_lexeme_num = 0
+        self.report.close()
+
+    def read_byte_blocks(self, chunks):
+        
+        for chunk in chunks:
+            # lexemes are never decoded -> no decoding cost (or failure on invalid bytes)
+            # for the majority of lines, which are skipped anyway
+            block = bytes(chunk)
+            # keep the universal newlines semantics of the text-mode READLINE path;
+            # bytes.splitlines() only breaks at "\n", "\r" and "\r\n", just like readline()
+            if b"\r" in block:
+                block = block.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+            lexemes = block.splitlines(True)
+
+            self.block_lexemes = iter(lexemes)
+            self.block_lexeme_num = len(lexemes)
+            yield self.block_lexemes
+            self.lexeme_num += self.block_lexeme_num
+
+        self.block_lexeme_num = 0
+        if self.report != sys.stdin.buffer:
+            self.report.close()
+
     def get_lexeme_num(self):
+        if self.mode == ScannerMode.MMAP or self.mode == ScannerMode.BYTES:
+            return self.lexeme_num + self.block_lexeme_num - operator.length_hint(self.block_lexemes)
         return self.lexeme_num
 
 if __name__ == "__main__":
@@ -40,18 +390,26 @@ if __name__ == "__main__":
 
     print("=> intel_compiler.opt_report.scanner DEBUG mode")
 
-    if len(sys.argv) != 2:
+    if len(sys.argv) != 2 and len(sys.argv) != 3:
         error_str = "error: "
         error_str += "scanner: "
-        error_str += "incorrect argument list => use ./scanner opt-report-filename"
+        error_str += "incorrect argument list => use ./scanner opt-report-filename [readline|mmap|follow|bytes]"
         sys.exit(error_str)
 
-    scanner = Scanner(None, sys.argv[1])
+    mode = ScannerMode.READLINE
+    if len(sys.argv) == 3:
+        if sys.argv[2].upper() not in ScannerMode.__members__:
+            sys.exit("error: scanner: unknown scanner mode " + sys.argv[2])
+        mode = ScannerMode[sys.argv[2].upper()]
+
+    scanner = Scanner(None, sys.argv[1], mode)
 
     while True:
         lexeme = scanner.get_next_lexeme()
         
-        if lexeme != "":
+        if lexeme != scanner.end_of_report:
+            if scanner.mode == ScannerMode.BYTES:
+                lexeme = str(lexeme, "utf-8", "replace")
             print(str(scanner.get_lexeme_num()) + ": " + lexeme)
         else:
             break
@@ -1,6 +1,11 @@
 #! /usr/bin/python3
 
+import os
 import sys
+import array
+import zlib
+import struct
+import collections
 from enum import Enum, auto
 
 from scanner import Scanner
@@ -9,6 +14,8 @@ from regex import *
 
 from ir import LoopType
 
+from remark_rules import RemarkRuleRegistry
+
 class TokenClass(Enum):
     
     """ Intel C/C++ Compiler (ICC) optimization report token class """
@@ -53,11 +60,22 @@ class LoopRemarkType(Enum):
     LOOP_COLLAPSE_ELIMINATED = auto()
     LOOP_DISTRIBUTION_MARK = auto()
     LOOP_NO_OPTIMIZATIONS = auto()
+    OTHER = auto() # remark kind recognised by a remark rule without a remark type of its own
 
 class Token:
 
     """ Intel C/C++ Compiler (ICC) optimization report token """
 
+    # fixed token schema (no per token __dict__); the fields
+    # not relevant for the token class are left unset
+    __slots__ = ( "token_class", "lexeme",
+                  # LOOP_REMARK
+                  "remark_num", "remark", "remark_type", "remark_rule", "loop_type", "fused_list", "collapsed_with", "distr_num",
+                  # LOOP_BEGIN
+                  "filename", "line", "inlined", "inlined_filename", "inlined_line",
+                  # LOOP_PART_TAG
+                  "tag_type", "chunk_num" )
+
     def __init__(self, token_class=TokenClass.UNDEFINED, lexeme=""):
         self.token_class = token_class
         self.lexeme = lexeme
@@ -68,12 +86,281 @@ class Token:
     def get_lexeme(self):
         return self.lexeme
 
+# tokens carrying nothing but their class are shared by all the lexemes of the class
+# (unless lexemes are retained), sparing an allocation for the most frequent lexemes
+SKIP_TOKEN = Token(TokenClass.SKIP)
+LOOP_END_TOKEN = Token(TokenClass.LOOP_END)
+EOR_TOKEN = Token(TokenClass.EOR)
+
+class TokenArrays:
+
+    """ 
+    Intel C/C++ Compiler (ICC) optimization report tokens stored column by column
+    (one typed array per token field, SKIP tokens left out), as produced by the
+    whole-buffer Tokeniser pass. Enumerations are stored as their values (0/-1 -> not
+    applicable), filenames as ids into a table of interned filename strings.
+    """
+
+    # the columns: the fixed size token fields (in the order of get_token_fields()) and the report position
+    COLUMN_NAMES = ( "token_class", "remark_type", "remark_rule", "loop_type", "tag_type", "remark_num",
+                     "filename_id", "line", "inlined", "inlined_filename_id", "inlined_line", "number",
+                     "line_num", "offset" )
+    # number of fixed size token fields stored in the columns (besides the report position)
+    FIELD_NUM = 12
+
+    # binary token stream file: header (magic, format version, byte order, report 
+    # signature, remark rules fingerprint), then the string table of filenames,
+    # the fused loop lists and the contents of the columns (each one zlib compressed,
+    # the columns are highly repetitive)
+    STREAM_MAGIC = b"ICCOPTTK"
+    STREAM_VERSION = 1
+    STREAM_HEADER = struct.Struct("<8sIcQq20s20s")
+    STREAM_COUNT = struct.Struct("<Q")
+    STREAM_COLUMN = struct.Struct("<cBQQ")
+    STREAM_COMPRESSION_LEVEL = 1
+
+    def __init__(self, remark_rules=None):
+        self.token_class = array.array("B")
+        self.remark_type = array.array("B")
+        self.remark_rule = array.array("h") # remark rule id, -1 if not applicable
+        self.loop_type = array.array("b") # LoopType.MAIN is 0 -> -1 if not applicable
+        self.tag_type = array.array("B")
+        self.remark_num = array.array("i")
+        self.line_num = array.array("q") # report line of the token (1-based)
+        self.offset = array.array("q") # report byte offset of the token's line
+        self.filename_id = array.array("i")
+        self.line = array.array("i")
+        self.inlined = array.array("b") # -1 if not applicable
+        self.inlined_filename_id = array.array("i")
+        self.inlined_line = array.array("i")
+        self.number = array.array("i") # chunk_num, collapsed_with or distr_num
+        # the only variable length field: token index -> fused loop numbers
+        self.fused_lists = {}
+
+        self.filenames = []
+        self.filename_ids = {}
+        # remark rules the remark rule ids refer to
+        self.remark_rules = remark_rules if remark_rules != None else RemarkRuleRegistry()
+        # (indentation stripped) raw line -> column values of its token, () for SKIP
+        self.field_cache = {}
+
+    def __len__(self):
+        return len(self.token_class)
+
+    def intern_filename(self, filename):
+        filename_id = self.filename_ids.get(filename, None)
+        if filename_id == None:
+            filename_id = len(self.filenames)
+            self.filename_ids[filename] = filename_id
+            self.filenames.append(filename)
+        return filename_id
+
+    def get_token_fields(self, token):
+        
+        """ Column values of a (non SKIP) token, except for its report position """
+
+        token_class = token.token_class
+        remark_type = 0
+        remark_rule = -1
+        loop_type = -1
+        tag_type = 0
+        remark_num = 0
+        filename_id = -1
+        line = 0
+        inlined = -1
+        inlined_filename_id = -1
+        inlined_line = 0
+        number = 0
+
+        if token_class == TokenClass.LOOP_REMARK:
+            remark_type = token.remark_type.value
+            remark_num = int(token.remark_num)
+            if token.remark_type != LoopRemarkType.SKIP:
+                remark_rule = token.remark_rule.rule_id
+            if remark_type == LoopRemarkType.PARALLEL.value or remark_type == LoopRemarkType.VECTOR.value:
+                loop_type = token.loop_type.value
+            elif remark_type == LoopRemarkType.LOOP_COLLAPSE_MAIN.value:
+                number = token.collapsed_with
+            elif remark_type == LoopRemarkType.LOOP_DISTRIBUTION_MARK.value:
+                number = int(token.distr_num)
+        elif token_class == TokenClass.LOOP_BEGIN:
+            filename_id = self.intern_filename(token.filename)
+            line = int(token.line)
+            inlined = int(token.inlined)
+            if token.inlined == True:
+                inlined_filename_id = self.intern_filename(token.inlined_filename)
+                inlined_line = int(token.inlined_line)
+        elif token_class == TokenClass.LOOP_PART_TAG:
+            tag_type = token.tag_type.value
+            if token.tag_type in (LoopPartTagType.DISTR_CHUNK, LoopPartTagType.DISTR_CHUNK_VECTOR_REMAINDER, LoopPartTagType.DISTR_CHUNK_REMAINDER):
+                number = token.chunk_num
+
+        return (token_class.value, remark_type, remark_rule, loop_type, tag_type, remark_num, 
+                filename_id, line, inlined, inlined_filename_id, inlined_line, number)
+
+    def append_rows(self, rows, line_nums, offsets):
+        
+        # rows of token fields are transposed into the columns a whole block at once
+        if len(rows) == 0:
+            return
+        for column_name, values in zip(self.COLUMN_NAMES[:self.FIELD_NUM], zip(*rows)):
+            getattr(self, column_name).extend(values)
+        self.line_num.extend(line_nums)
+        self.offset.extend(offsets)
+
+    def append_token(self, token, line_num, offset):
+        if token.token_class == TokenClass.LOOP_REMARK and token.remark_type == LoopRemarkType.LOOP_FUSION_MAIN:
+            self.fused_lists[len(self.token_class)] = token.fused_list
+        self.append_rows([self.get_token_fields(token)], [line_num], [offset])
+
+    def write_token_stream(self, stream_filename, report_signature):
+        
+        """ 
+        Dump the tokens into a binary token stream file, valid for the report 
+        of the given (size, mtime, hash) signature
+        """
+
+        report_size, report_mtime, report_hash = report_signature
+        # filenames are the only strings left in the tokens
+        encoded_filenames = [filename.encode("utf-8", "surrogateescape") for filename in self.filenames]
+        fused_index = array.array("q", sorted(self.fused_lists))
+        fused_len = array.array("q", (len(self.fused_lists[i]) for i in fused_index))
+        fused_values = array.array("q", (n for i in fused_index for n in self.fused_lists[i]))
+
+        # the file is written aside and renamed, so a reader never sees a partial stream
+        temp_filename = stream_filename + ".tmp" + str(os.getpid())
+        with open(temp_filename, "wb") as stream:
+            stream.write(self.STREAM_HEADER.pack(self.STREAM_MAGIC, self.STREAM_VERSION, sys.byteorder[0].encode(),
+                                                 report_size, report_mtime, report_hash, self.remark_rules.get_fingerprint()))
+            stream.write(self.STREAM_COUNT.pack(len(encoded_filenames)))
+            for encoded_filename in encoded_filenames:
+                stream.write(self.STREAM_COUNT.pack(len(encoded_filename)))
+                stream.write(encoded_filename)
+            columns = [ fused_index, fused_len, fused_values ] + [ getattr(self, name) for name in self.COLUMN_NAMES ]
+            for column in columns:
+                data = zlib.compress(column.tobytes(), self.STREAM_COMPRESSION_LEVEL)
+                stream.write(self.STREAM_COLUMN.pack(column.typecode.encode(), column.itemsize, len(column), len(data)))
+                stream.write(data)
+        os.replace(temp_filename, stream_filename)
+
+    def get_token(self, index):
+        
+        """ Rebuild the token stored at the index (EOR past the last token) """
+
+        if index >= len(self.token_class):
+            return EOR_TOKEN
+
+        token_class = TokenClass(self.token_class[index])
+        if token_class == TokenClass.LOOP_END:
+            return LOOP_END_TOKEN
+
+        token = Token(token_class)
+        if token_class == TokenClass.LOOP_REMARK:
+            token.remark_num = str(self.remark_num[index])
+            token.remark = "" # the message itself is not retained
+            token.remark_type = LoopRemarkType(self.remark_type[index])
+            if self.remark_rule[index] != -1:
+                token.remark_rule = self.remark_rules.rules[self.remark_rule[index]]
+            if self.loop_type[index] != -1:
+                token.loop_type = LoopType(self.loop_type[index])
+            if token.remark_type == LoopRemarkType.LOOP_FUSION_MAIN:
+                token.fused_list = self.fused_lists[index]
+            elif token.remark_type == LoopRemarkType.LOOP_COLLAPSE_MAIN:
+                token.collapsed_with = self.number[index]
+            elif token.remark_type == LoopRemarkType.LOOP_DISTRIBUTION_MARK:
+                token.distr_num = str(self.number[index])
+        elif token_class == TokenClass.LOOP_BEGIN:
+            token.filename = self.filenames[self.filename_id[index]]
+            token.line = str(self.line[index])
+            token.inlined = self.inlined[index] == 1
+            if token.inlined == True:
+                token.inlined_filename = self.filenames[self.inlined_filename_id[index]]
+                token.inlined_line = str(self.inlined_line[index])
+        elif token_class == TokenClass.LOOP_PART_TAG:
+            token.tag_type = LoopPartTagType(self.tag_type[index])
+            token.chunk_num = self.number[index]
+        return token
+
+def read_token_stream(stream_filename, report_signature, remark_rules=None):
+    
+    """ 
+    Load tokens out of a binary token stream file; None if there is no such file, or
+    it is not valid for the report of the given signature (or for the remark rules)
+    """
+
+    token_arrays = TokenArrays(remark_rules)
+    report_size, report_mtime, report_hash = report_signature
+    try:
+        with open(stream_filename, "rb") as stream:
+            header = stream.read(TokenArrays.STREAM_HEADER.size)
+            magic, version, byteorder, size, mtime, digest, rules_fingerprint = TokenArrays.STREAM_HEADER.unpack(header)
+            if magic != TokenArrays.STREAM_MAGIC or version != TokenArrays.STREAM_VERSION:
+                return None
+            if byteorder != sys.byteorder[0].encode():
+                return None
+            if size != report_size or mtime != report_mtime or digest != report_hash:
+                return None
+            if rules_fingerprint != token_arrays.remark_rules.get_fingerprint():
+                return None
+
+            filename_num = TokenArrays.STREAM_COUNT.unpack(stream.read(TokenArrays.STREAM_COUNT.size))[0]
+            for i in range(filename_num):
+                length = TokenArrays.STREAM_COUNT.unpack(stream.read(TokenArrays.STREAM_COUNT.size))[0]
+                token_arrays.intern_filename(stream.read(length).decode("utf-8", "surrogateescape"))
+
+            columns = []
+            for i in range(3 + len(TokenArrays.COLUMN_NAMES)):
+                typecode, itemsize, length, data_size = TokenArrays.STREAM_COLUMN.unpack(stream.read(TokenArrays.STREAM_COLUMN.size))
+                column = array.array(typecode.decode())
+                if column.itemsize != itemsize:
+                    return None
+                column.frombytes(zlib.decompress(stream.read(data_size)))
+                if len(column) != length:
+                    return None
+                columns.append(column)
+    except (OSError, EOFError, struct.error, ValueError, zlib.error):
+        return None
+
+    fused_index, fused_len, fused_values = columns[:3]
+    position = 0
+    for i, n in zip(fused_index, fused_len):
+        token_arrays.fused_lists[i] = fused_values[position:position + n].tolist()
+        position += n
+    for name, column in zip(TokenArrays.COLUMN_NAMES, columns[3:]):
+        setattr(token_arrays, name, column)
+    return token_arrays
+
 class Tokeniser:
 
     """ Intel C/C++ Compiler (ICC) optimization report Tokeniser """
 
-    def __init__(self, lexer=None):
+    def __init__(self, lexer=None, keep_lexemes=False, token_cache_size=0, remark_rules=None, byte_lexemes=False):
         self.lexer = lexer # lexer reference
+        # retain the whole lexeme in every token (debugging)
+        self.keep_lexemes = keep_lexemes
+        # lexemes are raw (not decoded) report lines
+        self.byte_lexemes = byte_lexemes
+        if self.byte_lexemes == True:
+            self.tokenise_lexeme = self.tokenise_bytes_lexeme
+
+        # bounded LRU cache of tokens of already seen (indentation stripped) lexemes;
+        # ICC reports repeat the same remarks over and over again at different depths
+        self.token_cache_size = token_cache_size
+        self.token_cache = collections.OrderedDict()
+        self.token_cache_hits = 0
+        self.token_cache_misses = 0
+        if self.token_cache_size > 0 and self.keep_lexemes == False:
+            if self.byte_lexemes == True:
+                self.tokenise_lexeme = self.tokenise_cached_bytes_lexeme
+            else:
+                self.tokenise_lexeme = self.tokenise_cached_lexeme
+
+        # remark rules compiled into matchers (the default rules unless given)
+        self.remark_rules = remark_rules if remark_rules != None else RemarkRuleRegistry()
+        # remark rule -> remark type of the tokens it produces
+        self.remark_rule_types = {}
+        for rule in self.remark_rules.rules:
+            self.remark_rule_types[rule] = LoopRemarkType.__members__.get(rule.name, LoopRemarkType.OTHER)
 
     def print_token(self, token):
 
@@ -116,244 +403,415 @@ class Tokeniser:
         
         print("}")
 
-    def tokenise_lexeme(self, lexeme):
- 
-        re_match = None
-        token = None
-
+    def tokenise_remark(self, token):
+        
         # [ script performance optimization ]
-        # the order of matching checks in the code below approximately
-        # corresponds to the frequency of their encounter in the ICC report 
+        # ICC remark number identifies the kind of the message -> only the combined 
+        # expression of the relevant rules is tried; an unknown remark number (or a message
+        # unexpected for the number) falls back to the combined expression of all the rules
+        remark_num_matchers = self.remark_rules.remark_num_matchers
+        rule_match = None
+        if token.remark_num in remark_num_matchers:
+            matcher = remark_num_matchers[token.remark_num]
+            if matcher == None:
+                # remark we are not currently interested in
+                token.remark_type = LoopRemarkType.SKIP
+                return token
+            rule_match = matcher.match(token.remark)
+        if rule_match == None:
+            rule_match = self.remark_rules.matcher.match(token.remark)
+        if rule_match == None:
+            # remark we are not currently interested in
+            token.remark_type = LoopRemarkType.SKIP
+            return token
+
+        rule, fields = rule_match
+        token.remark_type = self.remark_rule_types[rule]
+        token.remark_rule = rule
+        for field, value in fields:
+            setattr(token, field, value)
+        if rule.loop_type == True:
+            self.match_loop_type(token)
+        return token
+
+    def match_loop_type(self, token):
         
-        # [3] Check if the current lexeme is a loop remark
-        re_match = LOOP_REMARK_re.search(lexeme)
+        re_match = LOOP_DISTR_re.search(token.remark)
         if re_match != None:
-            token = Token(TokenClass.LOOP_REMARK, lexeme)
-            token.remark_num = re_match.group(1)
-            token.remark = re_match.group(2)
-            
-            # loop was auto-parallelized
-            re_match = LOOP_PARALLEL_re.search(token.remark)
-            if re_match != None:
-                token.remark_type = LoopRemarkType.PARALLEL
+            token.loop_type = LoopType.DISTR
+            return
 
-                re_match = LOOP_DISTR_re.search(token.remark)
-                if re_match != None:
-                    token.loop_type = LoopType.DISTR
-                    return token
+        re_match = LOOP_FUSED_re.search(token.remark)
+        if re_match != None:
+            token.loop_type = LoopType.FUSED
+            return
 
-                re_match = LOOP_FUSED_re.search(token.remark)
-                if re_match != None:
-                    token.loop_type = LoopType.FUSED
-                    return token
+        re_match = LOOP_PARTIAL_re.search(token.remark)
+        if re_match != None:
+            token.loop_type = LoopType.PARTIAL
+            return
 
-                re_match = LOOP_PARTIAL_re.search(token.remark)
-                if re_match != None:
-                    token.loop_type = LoopType.PARTIAL
-                    return token
+        token.loop_type = LoopType.MAIN
 
-                token.loop_type = LoopType.MAIN
+    def tokenise_bytes_remark(self, token):
+        
+        # the same as tokenise_remark(), for a raw remark message
+        remark_num_matchers = self.remark_rules.remark_num_matchers
+        rule_match = None
+        if token.remark_num in remark_num_matchers:
+            matcher = remark_num_matchers[token.remark_num]
+            if matcher == None:
+                token.remark_type = LoopRemarkType.SKIP
                 return token
+            rule_match = matcher.match_bytes(token.remark)
+        if rule_match == None:
+            rule_match = self.remark_rules.matcher.match_bytes(token.remark)
+        if rule_match == None:
+            token.remark_type = LoopRemarkType.SKIP
+            return token
 
-            # loop was vectorized
-            re_match = LOOP_VECTOR_re.search(token.remark)
-            if re_match != None:
-                token.remark_type = LoopRemarkType.VECTOR
+        rule, fields = rule_match
+        token.remark_type = self.remark_rule_types[rule]
+        token.remark_rule = rule
+        for field, value in fields:
+            setattr(token, field, value)
+        if rule.loop_type == True:
+            self.match_bytes_loop_type(token)
+        return token
 
-                re_match = LOOP_DISTR_re.search(token.remark)
-                if re_match != None:
-                    token.loop_type = LoopType.DISTR
-                    return token
+    def match_bytes_loop_type(self, token):
+        
+        re_match = LOOP_DISTR_bre.search(token.remark)
+        if re_match != None:
+            token.loop_type = LoopType.DISTR
+            return
 
-                re_match = LOOP_FUSED_re.search(token.remark)
-                if re_match != None:
-                    token.loop_type = LoopType.FUSED
-                    return token
+        re_match = LOOP_FUSED_bre.search(token.remark)
+        if re_match != None:
+            token.loop_type = LoopType.FUSED
+            return
 
-                re_match = LOOP_PARTIAL_re.search(token.remark)
-                if re_match != None:
-                    token.loop_type = LoopType.PARTIAL
-                    return token
+        re_match = LOOP_PARTIAL_bre.search(token.remark)
+        if re_match != None:
+            token.loop_type = LoopType.PARTIAL
+            return
 
-                token.loop_type = LoopType.MAIN
-                return token
+        token.loop_type = LoopType.MAIN
 
-            # loop was not parallelized: inner loop
-            re_match = LOOP_PARALLEL_POTENTIAL_re.search(token.remark)
-            if re_match != None:
-                token.remark_type = LoopRemarkType.PARALLEL_POTENTIAL
-                return token
+    def tokenise_cached_lexeme(self, lexeme):
+        
+        # lexemes which can only turn into SKIP/EOR tokens are cheaper 
+        # to classify directly than to look up in the cache
+        if "remark #" not in lexeme and "LOOP " not in lexeme and "<" not in lexeme:
+            return Tokeniser.tokenise_lexeme(self, lexeme)
+
+        # only the leading indentation is stripped: trailing characters 
+        # matter to regular expressions anchored at the end of a lexeme
+        key = lexeme.lstrip()
+        token = self.token_cache.get(key, None)
+        if token != None:
+            self.token_cache_hits += 1
+            self.token_cache.move_to_end(key)
+            return token
+
+        self.token_cache_misses += 1
+        token = Tokeniser.tokenise_lexeme(self, lexeme)
+        self.token_cache[key] = token
+        if len(self.token_cache) > self.token_cache_size:
+            self.token_cache.popitem(last=False)
+        return token
+
+    def tokenise_cached_bytes_lexeme(self, lexeme):
+        
+        # the same as tokenise_cached_lexeme(), for a raw lexeme
+        if b"remark #" not in lexeme and b"LOOP " not in lexeme and b"<" not in lexeme:
+            return Tokeniser.tokenise_bytes_lexeme(self, lexeme)
+
+        key = lexeme.lstrip()
+        token = self.token_cache.get(key, None)
+        if token != None:
+            self.token_cache_hits += 1
+            self.token_cache.move_to_end(key)
+            return token
+
+        self.token_cache_misses += 1
+        token = Tokeniser.tokenise_bytes_lexeme(self, lexeme)
+        self.token_cache[key] = token
+        if len(self.token_cache) > self.token_cache_size:
+            self.token_cache.popitem(last=False)
+        return token
+
+    def get_token_cache_stats(self):
+        return { "size" : len(self.token_cache), "hits" : self.token_cache_hits, "misses" : self.token_cache_misses }
 
-            # loop was not parallelized: insufficient computational work
-            re_match = LOOP_PARALLEL_INSUFFICIENT_WORK_re.search(token.remark)
+    def tokenise_buffer(self, buffer, token_arrays, base_offset=0, base_line_num=0):
+        
+        """
+        Tokenise a whole line-aligned block of the raw report at once, appending the 
+        tokens to the columns of token_arrays; returns the number of report lines 
+        up to the end of the block.
+        """
+
+        # [ script performance optimization ]
+        # a single multiline regular expression pass finds only the lines containing 
+        # any keyword of interest -> lines to skip are never cut out or tokenised, and
+        # the lines of interest are tokenised without being decoded;
+        # remark and tag lines repeat over and over again (at different indentation) -> 
+        # their column values are computed once per distinct line
+        field_cache = token_arrays.field_cache
+        rows = []
+        line_nums = []
+        offsets = []
+        fused_list_base = len(token_arrays)
+        count = buffer.count
+        newline_num = base_line_num # number of report lines preceding the position
+        position = 0
+        for re_match in LEXEME_OF_INTEREST_bre.finditer(buffer):
+            start = re_match.start()
+            newline_num += count(b"\n", position, start)
+            position = start
+            
+            key = re_match.group().lstrip()
+            fields = field_cache.get(key, None)
+            if fields == None:
+                lexeme = key[:-1] if key[-1:] == b"\r" else key
+                token = Tokeniser.tokenise_bytes_lexeme(self, lexeme + b"\n")
+                if token.token_class == TokenClass.SKIP:
+                    fields = ()
+                else:
+                    fields = token_arrays.get_token_fields(token)
+                    if token.token_class == TokenClass.LOOP_REMARK and token.remark_type == LoopRemarkType.LOOP_FUSION_MAIN:
+                        token_arrays.fused_lists[fused_list_base + len(rows)] = token.fused_list
+                        fields = fields + (token.fused_list,)
+                if token.token_class != TokenClass.LOOP_BEGIN:
+                    field_cache[key] = fields
+            elif len(fields) > TokenArrays.FIELD_NUM:
+                token_arrays.fused_lists[fused_list_base + len(rows)] = fields[-1]
+            
+            if len(fields) != 0:
+                rows.append(fields)
+                line_nums.append(newline_num + 1)
+                offsets.append(base_offset + start)
+
+        token_arrays.append_rows(rows, line_nums, offsets)
+        return newline_num + count(b"\n", position)
+
+    def tokenise_lexeme(self, lexeme):
+ 
+        re_match = None
+        token = None
+
+        # [ script performance optimization ]
+        # the order of matching checks in the code below approximately
+        # corresponds to the frequency of their encounter in the ICC report; 
+        # every regular expression below requires a keyword to be present in the lexeme,
+        # so a cheap substring check routes the lexeme to the only group of expressions
+        # able to match it -> blank lines, banners, report headers and free text
+        # are classified as SKIP without evaluating any regular expression
+        
+        token_lexeme = lexeme if self.keep_lexemes == True else ""
+
+        # [3] Check if the current lexeme is a loop remark
+        if "remark #" in lexeme:
+            re_match = LOOP_REMARK_re.search(lexeme)
             if re_match != None:
-                token.remark_type = LoopRemarkType.PARALLEL_INSUFFICIENT_WORK
-                return token
+                token = Token(TokenClass.LOOP_REMARK, token_lexeme)
+                token.remark_num = re_match.group(1)
+                token.remark = re_match.group(2)
+                return self.tokenise_remark(token)
 
-            # loop was not vectorized: inner loop was already vectorized 
-            re_match = LOOP_VECTOR_POTENTIAL_re.search(token.remark)
+        # [1] Check if the current lexeme signifies beginning of a loop report
+        if "LOOP BEGIN at " in lexeme:
+            # loop begin inlined into
+            re_match = LOOP_BEGIN_INLINED_re.search(lexeme)
             if re_match != None:
-                token.remark_type = LoopRemarkType.VECTOR_POTENTIAL
+                token = Token(TokenClass.LOOP_BEGIN, token_lexeme)
+                token.filename = re_match.group(1)
+                token.line = re_match.group(2)
+                token.inlined = True
+                token.inlined_filename = re_match.group(4)
+                token.inlined_line = re_match.group(5)
                 return token
 
-            # loop was not vectorized: loop was transformed to memset or memcpy 
-            re_match = LOOP_TRANSFORMED_MEMSET_re.search(token.remark)
+            # loop begin
+            re_match = LOOP_BEGIN_re.search(lexeme)
             if re_match != None:
-                token.remark_type = LoopRemarkType.TRANSFORMED_MEMSET
+                token = Token(TokenClass.LOOP_BEGIN, token_lexeme)
+                token.filename = re_match.group(1)
+                token.line = re_match.group(2)
+                token.inlined = False
                 return token
 
-            # memset generated 
-            re_match = LOOP_MEMSET_GENERATED_re.search(token.remark)
+        # [2] Check if a current lexeme tags a loop as a loop partition
+        if "<" in lexeme:
+            # <DistributedChunk([0-9]+)>
+            re_match = LOOP_DISTR_CHUNK_re.search(lexeme)
             if re_match != None:
-                token.remark_type = LoopRemarkType.MEMSET_GENERATED
+                token = Token(TokenClass.LOOP_PART_TAG, token_lexeme)
+                token.tag_type = LoopPartTagType.DISTR_CHUNK
+                token.chunk_num = int(re_match.group(1))
                 return token
-
-            # loop parallel dependence
-            re_match = LOOP_PARALLEL_DEPENCENCE_re.search(token.remark)
+        
+            # loop distributed chunk vector remainder
+            re_match = LOOP_DISTR_CHUNK_VECTOR_REMAINDER_re.search(lexeme)
             if re_match != None:
-                token.remark_type = LoopRemarkType.PARALLEL_DEPENDENCE
+                token = Token(TokenClass.LOOP_PART_TAG, token_lexeme)
+                token.tag_type = LoopPartTagType.DISTR_CHUNK_VECTOR_REMAINDER
+                token.chunk_num = int(re_match.group(1))
                 return token
 
-            # loop not a parallel candidate
-            re_match = LOOP_PARALLEL_NOT_CANDIDATE_re.search(token.remark)
+            # loop distributed chunk remainder
+            re_match = LOOP_DISTR_CHUNK_REMAINDER_re.search(lexeme)
             if re_match != None:
-                token.remark_type = LoopRemarkType.PARALLEL_NOT_CANDIDATE
+                token = Token(TokenClass.LOOP_PART_TAG, token_lexeme)
+                token.tag_type = LoopPartTagType.DISTR_CHUNK_REMAINDER
+                token.chunk_num = int(re_match.group(1))
                 return token
 
-            # loop vector dependence
-            re_match = LOOP_VECTOR_DEPENDENCE_re.search(token.remark)
+            # loop peel
+            re_match = LOOP_PEEL_re.search(lexeme)
             if re_match != None:
-                token.remark_type = LoopRemarkType.VECTOR_DEPENDENCE
+                token = Token(TokenClass.LOOP_PART_TAG, token_lexeme)
+                token.tag_type = LoopPartTagType.PEEL
                 return token
-
-            # loop fusion optimization
-            re_match = LOOP_FUSION_MAIN_re.search(token.remark)
+ 
+            # loop vectorization remainder
+            re_match = LOOP_VECTOR_REMAINDER_re.search(lexeme)
             if re_match != None:
-                token.remark_type = LoopRemarkType.LOOP_FUSION_MAIN
-                fused_loops_str = re_match.group(1)
-                token.fused_list =  [int(s) for s in fused_loops_str.split() if s.isdigit()]
+                token = Token(TokenClass.LOOP_PART_TAG, token_lexeme)
+                token.tag_type = LoopPartTagType.VECTOR_REMAINDER
                 return token
-
-            re_match = LOOP_FUSION_LOST_re.search(token.remark)
+       
+            # loop remainder
+            re_match = LOOP_REMAINDER_re.search(lexeme)
             if re_match != None:
-                token.remark_type = LoopRemarkType.LOOP_FUSION_LOST
+                token = Token(TokenClass.LOOP_PART_TAG, token_lexeme)
+                token.tag_type = LoopPartTagType.REMAINDER
                 return token
 
-            # loop collapse optimization
-            re_match = LOOP_COLLAPSE_MAIN_re.search(token.remark)
+        # [4] Check if the current lexeme signifies the end of a loop report or the whole report
+        if "LOOP END" in lexeme:
+
+            # loop report end
+            re_match = LOOP_END_re.search(lexeme)
             if re_match != None:
-                token.remark_type = LoopRemarkType.LOOP_COLLAPSE_MAIN
-                token.collapsed_with = int(re_match.group(1))
-                return token
+                if self.keep_lexemes == True:
+                    return Token(TokenClass.LOOP_END, lexeme)
+                return LOOP_END_TOKEN
+
+        # report end
+        if lexeme == "":
+            return EOR_TOKEN
+
+        # current lexeme has not triggered a match against any of 
+        # the types we are interested in -> return token to skip
+        if self.keep_lexemes == True:
+            return Token(TokenClass.SKIP, lexeme)
+        return SKIP_TOKEN
+
+    def tokenise_bytes_lexeme(self, lexeme):
+
+        # the same as tokenise_lexeme(), for a raw (not decoded) lexeme: the lexeme is 
+        # matched as it is and only the parts of it kept in the token are decoded;
+        # undecodable bytes in a filename are replaced rather than aborting the scan
 
-            re_match = LOOP_COLLAPSE_ELIMINATED_re.search(token.remark)
+        token_lexeme = lexeme if self.keep_lexemes == True else b""
+
+        # [ script performance optimization ]
+        # a substring test is much slower on bytes than on str -> all the keywords present
+        # in the lexeme are found by a single (C-level) search and the checks below only 
+        # look them up in the (mostly one element) list; a lexeme without any keyword is skipped
+        keywords = LEXEME_KEYWORD_bre.findall(lexeme)
+        if len(keywords) == 0:
+            if lexeme == b"":
+                return EOR_TOKEN
+            if self.keep_lexemes == True:
+                return Token(TokenClass.SKIP, lexeme)
+            return SKIP_TOKEN
+
+        # [3] Check if the current lexeme is a loop remark
+        if b"remark #" in keywords:
+            re_match = LOOP_REMARK_bre.search(lexeme)
             if re_match != None:
-                token.remark_type = LoopRemarkType.LOOP_COLLAPSE_ELIMINATED
-                return token
+                token = Token(TokenClass.LOOP_REMARK, token_lexeme)
+                token.remark_num = str(re_match.group(1), "ascii")
+                token.remark = re_match.group(2)
+                return self.tokenise_bytes_remark(token)
 
-            # loop distribution optimization
-            re_match = LOOP_DISTRIBUTION_MARK_re.search(token.remark)
+        # [1] Check if the current lexeme signifies beginning of a loop report
+        if b"LOOP BEGIN at " in keywords:
+            # loop begin inlined into
+            re_match = LOOP_BEGIN_INLINED_bre.search(lexeme)
             if re_match != None:
-                token.remark_type = LoopRemarkType.LOOP_DISTRIBUTION_MARK
-                token.distr_num = re_match.group(1)
+                token = Token(TokenClass.LOOP_BEGIN, token_lexeme)
+                token.filename = str(re_match.group(1), "utf-8", "replace")
+                token.line = str(re_match.group(2), "ascii")
+                token.inlined = True
+                token.inlined_filename = str(re_match.group(4), "utf-8", "replace")
+                token.inlined_line = str(re_match.group(5), "ascii")
                 return token
 
-            # loop distribution optimization
-            re_match = LOOP_NO_OPTIMIZATIONS_re.search(token.remark)
+            # loop begin
+            re_match = LOOP_BEGIN_bre.search(lexeme)
             if re_match != None:
-                token.remark_type = LoopRemarkType.LOOP_NO_OPTIMIZATIONS
+                token = Token(TokenClass.LOOP_BEGIN, token_lexeme)
+                token.filename = str(re_match.group(1), "utf-8", "replace")
+                token.line = str(re_match.group(2), "ascii")
+                token.inlined = False
                 return token
 
-            # remark we are not currently interested in
-            token.remark_type = LoopRemarkType.SKIP
-            return token
-
-        # [1] Check if the current lexeme signifies beginning of a loop report
-
-        # loop begin inlined into
-        re_match = LOOP_BEGIN_INLINED_re.search(lexeme)
-        if re_match != None:
-            token = Token(TokenClass.LOOP_BEGIN, lexeme)
-            token.filename = re_match.group(1)
-            token.line = re_match.group(2)
-            token.inlined = True
-            token.inlined_filename = re_match.group(4)
-            token.inlined_line = re_match.group(5)
-            return token
-
-        # loop begin
-        re_match = LOOP_BEGIN_re.search(lexeme)
-        if re_match != None:
-            token = Token(TokenClass.LOOP_BEGIN, lexeme)
-            token.filename = re_match.group(1)
-            token.line = re_match.group(2)
-            token.inlined = False
-            return token
-
         # [2] Check if a current lexeme tags a loop as a loop partition
+        if b"<" in keywords:
+            re_match = LOOP_DISTR_CHUNK_bre.search(lexeme)
+            if re_match != None:
+                token = Token(TokenClass.LOOP_PART_TAG, token_lexeme)
+                token.tag_type = LoopPartTagType.DISTR_CHUNK
+                token.chunk_num = int(re_match.group(1))
+                return token
         
-        # <DistributedChunk([0-9]+)>
-        re_match = LOOP_DISTR_CHUNK_re.search(lexeme)
-        if re_match != None:
-            token = Token(TokenClass.LOOP_PART_TAG, lexeme)
-            token.tag_type = LoopPartTagType.DISTR_CHUNK
-            token.chunk_num = int(re_match.group(1))
-            return token
-        
-        # loop distributed chunk vector remainder
-        re_match = LOOP_DISTR_CHUNK_VECTOR_REMAINDER_re.search(lexeme)
-        if re_match != None:
-            token = Token(TokenClass.LOOP_PART_TAG, lexeme)
-            token.tag_type = LoopPartTagType.DISTR_CHUNK_VECTOR_REMAINDER
-            token.chunk_num = int(re_match.group(1))
-            return token
+            re_match = LOOP_DISTR_CHUNK_VECTOR_REMAINDER_bre.search(lexeme)
+            if re_match != None:
+                token = Token(TokenClass.LOOP_PART_TAG, token_lexeme)
+                token.tag_type = LoopPartTagType.DISTR_CHUNK_VECTOR_REMAINDER
+                token.chunk_num = int(re_match.group(1))
+                return token
 
-        # loop distributed chunk remainder
-        re_match = LOOP_DISTR_CHUNK_REMAINDER_re.search(lexeme)
-        if re_match != None:
-            token = Token(TokenClass.LOOP_PART_TAG, lexeme)
-            token.tag_type = LoopPartTagType.DISTR_CHUNK_REMAINDER
-            token.chunk_num = int(re_match.group(1))
-            return token
+            re_match = LOOP_DISTR_CHUNK_REMAINDER_bre.search(lexeme)
+            if re_match != None:
+                token = Token(TokenClass.LOOP_PART_TAG, token_lexeme)
+                token.tag_type = LoopPartTagType.DISTR_CHUNK_REMAINDER
+                token.chunk_num = int(re_match.group(1))
+                return token
 
-        # loop peel
-        re_match = LOOP_PEEL_re.search(lexeme)
-        if re_match != None:
-            token = Token(TokenClass.LOOP_PART_TAG, lexeme)
-            token.tag_type = LoopPartTagType.PEEL
-            return token
+            re_match = LOOP_PEEL_bre.search(lexeme)
+            if re_match != None:
+                token = Token(TokenClass.LOOP_PART_TAG, token_lexeme)
+                token.tag_type = LoopPartTagType.PEEL
+                return token
  
-        # loop vectorization remainder
-        re_match = LOOP_VECTOR_REMAINDER_re.search(lexeme)
-        if re_match != None:
-            token = Token(TokenClass.LOOP_PART_TAG, lexeme)
-            token.tag_type = LoopPartTagType.VECTOR_REMAINDER
-            return token
+            re_match = LOOP_VECTOR_REMAINDER_bre.search(lexeme)
+            if re_match != None:
+                token = Token(TokenClass.LOOP_PART_TAG, token_lexeme)
+                token.tag_type = LoopPartTagType.VECTOR_REMAINDER
+                return token
        
-        # loop remainder
-        re_match = LOOP_REMAINDER_re.search(lexeme)
-        if re_match != None:
-            token = Token(TokenClass.LOOP_PART_TAG, lexeme)
-            token.tag_type = LoopPartTagType.REMAINDER
-            return token
+            re_match = LOOP_REMAINDER_bre.search(lexeme)
+            if re_match != None:
+                token = Token(TokenClass.LOOP_PART_TAG, token_lexeme)
+                token.tag_type = LoopPartTagType.REMAINDER
+                return token
 
         # [4] Check if the current lexeme signifies the end of a loop report or the whole report
+        if b"LOOP END" in keywords:
+            re_match = LOOP_END_bre.search(lexeme)
+            if re_match != None:
+                if self.keep_lexemes == True:
+                    return Token(TokenClass.LOOP_END, lexeme)
+                return LOOP_END_TOKEN
 
-        # loop report end
-        re_match = LOOP_END_re.search(lexeme)
-        if re_match != None:
-            token = Token(TokenClass.LOOP_END, lexeme)
-            return token
-        
-        # report end
-        if lexeme == "":
-            token = Token(TokenClass.EOR, lexeme)
-            return token
-
-        # current lexeme has not triggered a match against any of 
-        # the types we are interested in -> return token to skip
-        token = Token(TokenClass.SKIP, lexeme)
-        return token
+        if self.keep_lexemes == True:
+            return Token(TokenClass.SKIP, lexeme)
+        return SKIP_TOKEN
 
 if __name__ == "__main__":
     
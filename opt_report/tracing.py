@@ -0,0 +1,157 @@
+#! /usr/bin/python3
+
+import os
+import sys
+import time
+import logging
+import collections
+from enum import IntEnum
+
+class TraceLevel(IntEnum):
+
+    """ Intel C/C++ Compiler (ICC) optimization report compiler trace level """
+
+    OFF = 0
+    ERROR = 1
+    INFO = 2
+    DEBUG = 3
+
+# trace level -> logging module level of the events passed on to logging
+LOGGING_LEVELS = { TraceLevel.ERROR : logging.ERROR, TraceLevel.INFO : logging.INFO, TraceLevel.DEBUG : logging.DEBUG }
+
+# compiler subsystems traced separately
+SUBSYSTEMS = ( "scanner", "lexer", "tokeniser", "parser", "ir", "compiler" )
+
+# environment variables configuring tracing of the command line tools:
+# OPT_REPORT_TRACE="parser=debug,ir=info" (or "debug" for all the subsystems),
+# OPT_REPORT_TRACE_BUFFER=<number of the last events kept in memory>
+TRACE_ENV = "OPT_REPORT_TRACE"
+TRACE_BUFFER_ENV = "OPT_REPORT_TRACE_BUFFER"
+
+class Tracer:
+
+    """
+    Tracer of a compiler subsystem. Call sites check the level flag first and only
+    then build an event, so a disabled tracer costs a single attribute test:
+
+        if PARSER_TRACE.debug:
+            PARSER_TRACE.event(TraceLevel.DEBUG, "loop_end", token_num=...)
+    """
+
+    def __init__(self, subsystem):
+        self.subsystem = subsystem
+        self.set_level(TraceLevel.OFF)
+
+    def set_level(self, level):
+        self.level = level
+        # fast path flags
+        self.error = level >= TraceLevel.ERROR
+        self.info = level >= TraceLevel.INFO
+        self.debug = level >= TraceLevel.DEBUG
+
+    def event(self, level, event, **fields):
+
+        # a structured event: nothing is formatted unless the event is logged or dumped
+        record = (time.perf_counter(), self.subsystem, level, event, fields)
+        if event_buffer != None:
+            event_buffer.append(record)
+        if log_events == True:
+            logger.log(LOGGING_LEVELS[level], "%s", EventFormatter(record))
+
+class EventFormatter:
+
+    """ Formats an event record lazily, only once logging decides to emit it """
+
+    __slots__ = ( "record", )
+
+    def __init__(self, record):
+        self.record = record
+
+    def __str__(self):
+        return format_event(self.record)
+
+TRACERS = {}
+for subsystem in SUBSYSTEMS:
+    TRACERS[subsystem] = Tracer(subsystem)
+
+# in-memory ring buffer of the last events (None -> events are not kept)
+event_buffer = None
+# events are passed on to the logging module
+log_events = True
+logger = logging.getLogger("opt_report")
+
+def get_tracer(subsystem):
+    return TRACERS[subsystem]
+
+def configure(levels={}, buffer_size=0, log=True):
+
+    """
+    Set the trace levels (subsystem -> TraceLevel or its name; "*" stands for all
+    the subsystems), the size of the ring buffer of events (0 -> no buffer) and
+    whether events are passed on to the logging module.
+    """
+
+    global event_buffer, log_events
+
+    for subsystem, level in levels.items():
+        if isinstance(level, str):
+            if level.upper() not in TraceLevel.__members__:
+                sys.exit("error: tracing: unknown trace level " + level)
+            level = TraceLevel[level.upper()]
+        if subsystem == "*":
+            for tracer in TRACERS.values():
+                tracer.set_level(level)
+        elif subsystem in TRACERS:
+            TRACERS[subsystem].set_level(level)
+        else:
+            sys.exit("error: tracing: unknown subsystem " + subsystem)
+
+    event_buffer = collections.deque(maxlen=buffer_size) if buffer_size > 0 else None
+    log_events = log
+
+def configure_from_environment():
+
+    """ 
+    Configure tracing out of the OPT_REPORT_TRACE(_BUFFER) environment variables;
+    events kept in the ring buffer are not logged, but dumped on an error only
+    """
+
+    levels = {}
+    for spec in os.environ.get(TRACE_ENV, "").split(","):
+        if spec.strip() == "":
+            continue
+        if "=" in spec:
+            subsystem, level = spec.split("=", 1)
+            levels[subsystem.strip()] = level.strip()
+        else:
+            levels["*"] = spec.strip()
+    buffer_size = os.environ.get(TRACE_BUFFER_ENV, "0")
+    if not buffer_size.isdigit():
+        sys.exit("error: tracing: incorrect " + TRACE_BUFFER_ENV + " value " + buffer_size)
+    configure(levels, int(buffer_size), int(buffer_size) == 0)
+
+def is_enabled():
+    return any(tracer.level != TraceLevel.OFF for tracer in TRACERS.values())
+
+def format_event(record):
+    timestamp, subsystem, level, event, fields = record
+    fields_str = " ".join(name + "=" + str(value) for name, value in fields.items())
+    return "{:.6f}".format(timestamp) + " " + subsystem + " " + level.name + " " + event + " " + fields_str
+
+def get_events():
+    return list(event_buffer) if event_buffer != None else []
+
+def dump_events(file=sys.stderr):
+
+    """ Print the events kept in the ring buffer (e.g. on an error) """
+
+    if event_buffer == None or len(event_buffer) == 0:
+        return
+    print("=== last " + str(len(event_buffer)) + " trace events ===", file=file)
+    for record in event_buffer:
+        print(format_event(record), file=file)
+
+if __name__ == "__main__":
+    pass
+else:
+    pass
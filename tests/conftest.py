@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the compiler modules import each other by their plain names
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "opt_report"))
@@ -0,0 +1,111 @@
+import pytest
+
+from compiler import IccOptReportCompiler, IccOptReportIncrementalCompiler
+
+def loop_report(line, remarks=(), inner_lines=(), tag=None):
+    lines = [ "LOOP BEGIN at /src/a.c(" + str(line) + ",3)" ]
+    if tag != None:
+        lines += [ "   " + tag ]
+    lines += [ "   remark #" + remark for remark in remarks ]
+    for inner_line in inner_lines:
+        lines += [ "   LOOP BEGIN at /src/a.c(" + str(inner_line) + ",5)", "   LOOP END" ]
+    lines += [ "LOOP END" ]
+    return "\n".join(lines) + "\n"
+
+A = loop_report(10, [ "15300: LOOP WAS VECTORIZED" ])
+B = loop_report(20, [ "17109: LOOP WAS AUTO-PARALLELIZED" ], [ 21 ])
+C = loop_report(30)
+D = loop_report(40)
+# E is fused with F
+E = loop_report(50, [ "25045: Fused Loops: ( 50 60 )" ])
+F = loop_report(60)
+# P is vectorized with a peel and a remainder, all of them with an inner loop
+P = (loop_report(90, [], [ 91 ], "<Peeled loop for vectorization>") + loop_report(90, [ "15300: LOOP WAS VECTORIZED" ], [ 91 ]) +
+     loop_report(90, [], [ 91 ], "<Remainder loop for vectorization>"))
+# G is collapsed with H
+G = loop_report(70, [ "25474: Collapsed with loop at line 80" ])
+H = loop_report(80)
+
+def get_reachable_loops(ir):
+    
+    # the loops of the IR along with their peels, remainders, etc. and the inner loops of all of them
+    loops = []
+    pending_loops = list(ir.loops.values())
+    while len(pending_loops) != 0:
+        loop = pending_loops.pop()
+        if loop == None or any(loop is seen_loop for seen_loop in loops):
+            continue
+        loops.append(loop)
+        pending_loops.extend(loop.inner_loops.values())
+        pending_loops.extend(loop.distr_chunks.values())
+        pending_loops.extend((loop.peel, loop.remainder, loop.vector_remainder))
+    return loops
+
+def dump_ir(ir):
+    
+    # the IR dictionaries in their order, along with the classification of every loop
+    dump = []
+    for dict_name in IccOptReportIncrementalCompiler.IR_DICTS:
+        loops = getattr(ir, dict_name)
+        dump.append([ (loop.name, loop.classification.state, [ inner_loop.name for inner_loop in loop.inner_loops.values() ])
+                      for loop in loops.values() ])
+    # the loops referring to the IR (the parts of loops, such as peels, do not refer to any)
+    dump.append([ (loop.name, loop.loop_type, loop.get_loop_nest_struct() is ir) for loop in get_reachable_loops(ir) ])
+    return dump
+
+def full_compile(report_filename):
+    compiler = IccOptReportCompiler(report_filename)
+    compiler.compile()
+    return dump_ir(compiler.get_ir())
+
+def check_recompiles(tmp_path, reports, failing_report=None):
+
+    """ 
+    Every recompile of the incremental compiler has to give the IR of a fresh full compile
+    (and fail just like the full compile on the failing report, if any)
+    """
+
+    report_filename = str(tmp_path / "report.optrpt")
+    compiler = IccOptReportIncrementalCompiler(report_filename)
+    for report in reports:
+        with open(report_filename, "w") as report_file:
+            report_file.write(report)
+        compiler.compile()
+        assert dump_ir(compiler.get_ir()) == full_compile(report_filename)
+    if failing_report != None:
+        with open(report_filename, "w") as report_file:
+            report_file.write(failing_report)
+        with pytest.raises(SystemExit) as full_error:
+            full_compile(report_filename)
+        with pytest.raises(SystemExit) as error:
+            compiler.compile()
+        assert str(error.value) == str(full_error.value)
+
+def test_unchanged(tmp_path):
+    check_recompiles(tmp_path, [ A + B + C + D, A + B + C + D ])
+
+def test_moved_region(tmp_path):
+    check_recompiles(tmp_path, [ A + B + C + D, A + C + D + B, B + A + C + D ])
+
+def test_swapped_regions(tmp_path):
+    check_recompiles(tmp_path, [ A + B + C, A + C + B, C + B + A ])
+
+def test_duplicated_earlier_region(tmp_path):
+    check_recompiles(tmp_path, [ A + B + C, B + A + B + C, A + B + C ])
+
+def test_duplicated_fused_region(tmp_path):
+    check_recompiles(tmp_path, [ A + E + F, E + A + E + F, A + F + E, F + B + E ])
+
+def test_edited_region(tmp_path):
+    check_recompiles(tmp_path, [ A + B + C + D, A + loop_report(20) + C + D, A + C + D ])
+
+def test_dropped_collapsed_loop(tmp_path):
+    check_recompiles(tmp_path, [ G + H, A + H + G, G + H ], A + G)
+
+def test_dropped_fused_loop(tmp_path):
+    check_recompiles(tmp_path, [ E + F + A ], E + A)
+
+def test_loop_parts(tmp_path):
+    # (the regions of P are re-parsed once one of them is edited)
+    edited_P = P.replace("LOOP WAS VECTORIZED", "LOOP WAS AUTO-PARALLELIZED")
+    check_recompiles(tmp_path, [ A + P, A + edited_P, edited_P + A, B + P + A, B + A ])
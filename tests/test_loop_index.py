@@ -0,0 +1,43 @@
+from compiler import IccOptReportCompiler
+
+def compile_report(tmp_path, lines):
+    report_filename = str(tmp_path / "report.optrpt")
+    with open(report_filename, "w") as report_file:
+        report_file.write("\n".join(lines) + "\n")
+    compiler = IccOptReportCompiler(report_filename)
+    compiler.compile()
+    return compiler
+
+def get_names(loops):
+    return [ loop.name for loop in loops ]
+
+def test_nested_loops(tmp_path):
+    compiler = compile_report(tmp_path, [ "LOOP BEGIN at /s/k.c(10,3)", "   LOOP BEGIN at /s/k.c(12,5)", "   LOOP END",
+                                          "   LOOP BEGIN at /s/k.c(20,5)", "   LOOP END", "LOOP END",
+                                          "LOOP BEGIN at /s/k.c(30,3)", "LOOP END" ])
+    loop_index = compiler.get_loop_index()
+    assert get_names(loop_index.get_enclosing_loops("/s/k.c", 12)) == [ "/s/k.c(10)", "/s/k.c(12)" ]
+    assert get_names(loop_index.get_enclosing_loops("/s/k.c", 15)) == [ "/s/k.c(10)" ]
+    assert get_names(loop_index.get_enclosing_loops("/s/k.c", 25)) == []
+    assert loop_index.get_enclosing_loop("/s/k.c", 20).name == "/s/k.c(20)"
+    assert get_names(loop_index.get_loops_in_range("/s/k.c", 19, 30)) == [ "/s/k.c(10)", "/s/k.c(20)", "/s/k.c(30)" ]
+
+def test_tiled_loop(tmp_path):
+    
+    # a tiled loop is nested in itself
+    compiler = compile_report(tmp_path, [ "LOOP BEGIN at /s/k.c(10,3)", "   LOOP BEGIN at /s/k.c(10,3)", "   LOOP END", "LOOP END" ])
+    loop = compiler.get_ir().get_loops()[next(iter(compiler.get_ir().get_loops()))]
+    assert loop.parent is loop
+    loop_index = compiler.get_loop_index()
+    assert get_names(loop_index.get_loops_at("/s/k.c", 10)) == [ "/s/k.c(10)" ]
+    assert get_names(loop_index.get_enclosing_loops("/s/k.c", 10)) == [ "/s/k.c(10)" ]
+
+def test_interchanged_loops(tmp_path):
+    
+    # scope interchange nests two loops in each other (A -> B -> A)
+    compiler = compile_report(tmp_path, [ "LOOP BEGIN at /s/k.c(10,3)", "   LOOP BEGIN at /s/k.c(20,5)", "   LOOP END", "LOOP END",
+                                          "LOOP BEGIN at /s/k.c(20,5)", "   LOOP BEGIN at /s/k.c(10,3)", "   LOOP END", "LOOP END" ])
+    loops = compiler.get_ir().get_loops()
+    assert len(loops) == 2
+    loop_index = compiler.get_loop_index()
+    assert get_names(loop_index.get_enclosing_loops("/s/k.c", 20)) == [ "/s/k.c(10)", "/s/k.c(20)" ]
@@ -0,0 +1,35 @@
+from compiler import IccOptReportCompiler, IccOptReportBatchCompiler, IccOptReportParallelCompiler
+
+# a loop vectorized with a peel and a remainder, all of them with an inner loop
+REPORT = "".join("LOOP BEGIN at /src/a.c(90,3)\n" + tag + "   LOOP BEGIN at /src/a.c(91,5)\n   LOOP END\nLOOP END\n"
+                 for tag in ("   <Peeled loop for vectorization>\n", "   remark #15300: LOOP WAS VECTORIZED\n",
+                             "   <Remainder loop for vectorization>\n"))
+OTHER_REPORT = "LOOP BEGIN at /src/b.c(10,3)\nLOOP END\n"
+
+def get_nest_structs(ir):
+
+    # whether the loops reachable from the IR (peels, remainders and their inner loops included) refer to it
+    nest_structs = []
+    for loop in ir.loops.values():
+        parts = [ part for part in (loop.peel, loop.remainder, loop.vector_remainder) if part != None ]
+        for part in [ loop ] + parts:
+            nest_structs.append((part.name, part.loop_type, part.get_loop_nest_struct() is ir,
+                                 [ inner_loop.get_loop_nest_struct() is ir for inner_loop in part.inner_loops.values() ]))
+    return sorted(nest_structs, key=str)
+
+def compile_report(compiler):
+    compiler.compile()
+    return get_nest_structs(compiler.get_ir())
+
+def test_batch_compile(tmp_path):
+    (tmp_path / "a.optrpt").write_text(REPORT)
+    (tmp_path / "b.optrpt").write_text(OTHER_REPORT)
+    (tmp_path / "all.txt").write_text(REPORT + OTHER_REPORT)
+    expected = compile_report(IccOptReportCompiler(str(tmp_path / "all.txt")))
+    assert compile_report(IccOptReportBatchCompiler(str(tmp_path), max_workers=2)) == expected
+
+def test_parallel_compile(tmp_path):
+    report_filename = str(tmp_path / "a.optrpt")
+    (tmp_path / "a.optrpt").write_text(REPORT + OTHER_REPORT)
+    expected = compile_report(IccOptReportCompiler(report_filename))
+    assert compile_report(IccOptReportParallelCompiler(report_filename, max_workers=2)) == expected
@@ -0,0 +1,63 @@
+import re
+import itertools
+
+from remark_rules import RemarkRuleRegistry
+
+# a message matched by every default rule
+RULE_MESSAGES = [
+    "LOOP WAS AUTO-PARALLELIZED",
+    "LOOP WAS VECTORIZED",
+    "loop was not parallelized: inner loop",
+    "loop was not parallelized: insufficient computational work",
+    "loop was not vectorized: inner loop was already vectorized",
+    "loop was not vectorized: loop was transformed to memset or memcpy",
+    "memset generated",
+    "loop was not parallelized: existence of parallel dependence",
+    "loop was not parallelized: not a parallelization candidate",
+    "loop was not vectorized: vector dependence prevents vectorization",
+    "Fused Loops: ( 115 119 )",
+    "Loop lost in Fusion",
+    "Collapsed with loop at line 12",
+    "Loop eliminated in Collapsing",
+    "Loop Distributed (2 way)",
+    "No loop optimizations reported",
+]
+
+def cascade_match(rules, message):
+    
+    # the rules searched for one by one in their order
+    for rule in rules:
+        if re.search(rule.pattern, message) != None:
+            return rule
+    return None
+
+def test_rule_messages():
+    registry = RemarkRuleRegistry()
+    assert len(RULE_MESSAGES) == len(registry.rules)
+    for rule, message in zip(registry.rules, RULE_MESSAGES):
+        assert registry.matcher.match(message)[0] is rule
+        assert registry.matcher.match_bytes(message.encode())[0] is rule
+
+def test_two_phrase_message_keeps_rule_priority():
+    
+    # the earlier rule wins, even though the later one matches first in the message
+    registry = RemarkRuleRegistry()
+    rule, fields = registry.matcher.match("memset generated; loop was not parallelized: inner loop")
+    assert rule.name == "PARALLEL_POTENTIAL"
+    rule, fields = registry.matcher.match("Loop Distributed (4 way), Collapsed with loop at line 7")
+    assert rule.name == "LOOP_COLLAPSE_MAIN"
+    assert fields == [ ("collapsed_with", 7) ]
+    rule, fields = registry.matcher.match_bytes(b"Loop Distributed (4 way), Collapsed with loop at line 7")
+    assert fields == [ ("collapsed_with", 7) ]
+
+def test_message_pairs_match_as_cascade():
+    registry = RemarkRuleRegistry()
+    matchers = [ registry.matcher ] + [ matcher for matcher in registry.remark_num_matchers.values() if matcher != None ]
+    for first, second in itertools.permutations(RULE_MESSAGES, 2):
+        for message in (first + " " + second, first + ": " + second.lower(), second[:-1] + first):
+            for matcher in matchers:
+                expected_rule = cascade_match(matcher.rules, message)
+                rule_match = matcher.match(message)
+                assert (rule_match[0] if rule_match != None else None) is expected_rule
+                rule_match = matcher.match_bytes(message.encode())
+                assert (rule_match[0] if rule_match != None else None) is expected_rule